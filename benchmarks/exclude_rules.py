@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+"""Measure how the cost of checking an entry against the exclude rules grows with the rules.
+
+Each run checks the same synthetic paths against a growing number of rules, which are a mix of
+names, absolute paths, globs and regular expressions, as the compiled `ScanFilter` and as a loop
+over each rule in turn.
+
+    python benchmarks/exclude_rules.py --rules 0 10 100 500
+"""
+
+import argparse
+import fnmatch
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import diskspaced
+
+# pylint: enable=wrong-import-position
+
+
+def make_paths(count: int, seed: int) -> list[tuple[str, str]]:
+    """Make (name, path) pairs which look like the entries of a real tree."""
+
+    generator = random.Random(seed)
+    words = ["src", "lib", "home", "user", "var", "data", "build", "cache", "docs", "test"]
+    extensions = [".py", ".txt", ".json", ".so", ".log", ""]
+    paths = []
+
+    for _ in range(count):
+        folders = [generator.choice(words) for _ in range(generator.randint(1, 8))]
+        name = f"{generator.choice(words)}_{generator.randint(0, 9999)}"
+        name += generator.choice(extensions)
+        paths.append((name, "/" + "/".join(folders + [name])))
+
+    return paths
+
+
+def make_rules(count: int) -> tuple[list[str], list[str]]:
+    """Make globs and regular expressions of every kind the filter handles, none of which match
+    the synthetic paths, so every rule has to be checked."""
+
+    globs = []
+    regexes = []
+
+    for index in range(count):
+        kind = index % 5
+
+        if kind == 0:
+            globs.append(f"excluded_name_{index}")
+        elif kind == 1:
+            globs.append(f"/mnt/excluded_{index}")
+        elif kind == 2:
+            globs.append(f"*.excluded{index}")
+        elif kind == 3:
+            globs.append(f"/srv/*/excluded_{index}/**")
+        else:
+            regexes.append(f"/excluded_{index}[0-9]+/")
+
+    return globs, regexes
+
+
+def one_by_one_checker(globs: list[str], regexes: list[str]):
+    """Make a check which tries each rule in turn, to compare with."""
+
+    compiled_regexes = [re.compile(regex) for regex in regexes]
+
+    def check(name: str, path: str) -> bool:
+        for glob in globs:
+            if fnmatch.fnmatchcase(name if "/" not in glob else path, glob):
+                return True
+
+        return any(regex.search(path) for regex in compiled_regexes)
+
+    return check
+
+
+def time_per_entry(check, paths: list[tuple[str, str]]) -> float:
+    """Time how long the check takes per entry, in nanoseconds."""
+
+    start = time.perf_counter_ns()
+
+    for name, path in paths:
+        check(name, path)
+
+    return (time.perf_counter_ns() - start) / len(paths)
+
+
+def main() -> None:
+    """Run the benchmark."""
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", maxsplit=1)[0])
+    parser.add_argument("--rules", type=int, nargs="+", default=[0, 10, 100, 300, 1000])
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    paths = make_paths(args.entries, args.seed)
+
+    print(f"{'rules':>8} {'compiled ns/entry':>18} {'one by one ns/entry':>20}")
+
+    for rule_count in args.rules:
+        globs, regexes = make_rules(rule_count)
+        scan_filter = diskspaced.ScanFilter(globs, regexes)
+
+        compiled = time_per_entry(scan_filter.excludes, paths)
+        one_by_one = time_per_entry(one_by_one_checker(globs, regexes), paths)
+
+        print(f"{rule_count:>8} {compiled:>18.0f} {one_by_one:>20.0f}")
+
+
+if __name__ == "__main__":
+    main()
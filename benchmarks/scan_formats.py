@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+
+"""Benchmark scanning synthetic trees into every output format.
+
+Each tree is generated from a fixed seed, with fixed sizes and times, so the same arguments
+always give the same trees and the same output sizes. They are generated in memory backed
+storage where there is some, so the benchmark measures the scanner rather than the disk.
+
+Every scan runs in a process of its own, so that its peak memory is its own, and the results
+are saved as JSON to compare against later runs:
+
+    python benchmarks/scan_formats.py --output before.json
+    python benchmarks/scan_formats.py --output after.json --compare before.json
+
+`--scale 20` gives around a million files in each of the wide and tiny_files trees.
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from typing import Callable
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import diskspaced
+
+# pylint: enable=wrong-import-position
+
+FIXED_TIME_NS = 1_700_000_000_000_000_000
+
+MEMORY_BACKED_FOLDER = "/dev/shm"
+
+# Names longer than this many characters of three byte UTF-8 would go past the 255 byte limit
+UNICODE_NAME_LENGTH = 80
+UNICODE_ALPHABETS = [
+    "αβγδεζηθικλμνξοπρστυφχψω",
+    "абвгдеёжзийклмнопрстуфхцчшщъыьэюя",
+    "あいうえおかきくけこさしすせそたちつてとなにぬねの",
+    "가나다라마바사아자차카타파하",
+]
+
+
+class TreeBuilder:
+    """Creates the entries of a synthetic tree, with fixed contents and times."""
+
+    root: str
+    generator: random.Random
+    entries: int
+
+    def __init__(self, root: str, seed: int) -> None:
+        self.root = root
+        self.generator = random.Random(seed)
+        self.entries = 0
+
+    def folder(self, path: str) -> str:
+        """Create a folder, whose times are fixed once the tree is complete."""
+
+        os.makedirs(path)
+        self.entries += 1
+        return path
+
+    def file(self, path: str, max_size: int) -> None:
+        """Create a file with a size picked from the seed and fixed times."""
+
+        with open(path, "wb") as f:
+            f.write(b"x" * self.generator.randint(0, max_size))
+
+        os.utime(path, ns=(FIXED_TIME_NS, FIXED_TIME_NS))
+        self.entries += 1
+
+    def finish(self) -> None:
+        """Fix the times of the folders, which adding entries to them moved."""
+
+        for folder_path, _, _ in os.walk(self.root):
+            os.utime(folder_path, ns=(FIXED_TIME_NS, FIXED_TIME_NS))
+
+
+def build_wide(builder: TreeBuilder, scale: float) -> None:
+    """A few folders, each with thousands of files."""
+
+    for folder_index in range(max(1, int(10 * scale))):
+        folder = builder.folder(os.path.join(builder.root, f"wide_{folder_index}"))
+
+        for file_index in range(5_000):
+            builder.file(os.path.join(folder, f"file_{file_index:05}.dat"), 1 << 20)
+
+
+def build_deep(builder: TreeBuilder, scale: float) -> None:
+    """Chains of folders hundreds deep, with a few files in each."""
+
+    for chain_index in range(max(1, int(10 * scale))):
+        folder = builder.folder(os.path.join(builder.root, f"chain_{chain_index}"))
+
+        for depth in range(300):
+            folder = builder.folder(os.path.join(folder, f"level_{depth}"))
+
+            for file_index in range(3):
+                builder.file(os.path.join(folder, f"file_{file_index}.txt"), 4096)
+
+
+def build_tiny_files(builder: TreeBuilder, scale: float) -> None:
+    """Lots of small folders full of files of a few bytes, like a source tree or a mail spool."""
+
+    for outer_index in range(max(1, int(50 * scale))):
+        outer = builder.folder(os.path.join(builder.root, f"{outer_index:04}"))
+
+        for inner_index in range(10):
+            inner = builder.folder(os.path.join(outer, f"{inner_index:02}"))
+
+            for file_index in range(100):
+                builder.file(os.path.join(inner, f"{file_index:03}"), 16)
+
+
+def build_unicode(builder: TreeBuilder, scale: float) -> None:
+    """Long names in several scripts, which are the most expensive to encode."""
+
+    def name() -> str:
+        alphabet = builder.generator.choice(UNICODE_ALPHABETS)
+        return "".join(builder.generator.choice(alphabet) for _ in range(UNICODE_NAME_LENGTH))
+
+    for folder_index in range(max(1, int(50 * scale))):
+        folder = builder.folder(os.path.join(builder.root, f"{folder_index}_{name()}"))
+
+        for file_index in range(200):
+            builder.file(os.path.join(folder, f"{file_index}_{name()}"), 65536)
+
+
+TREES: dict[str, Callable[[TreeBuilder, float], None]] = {
+    "wide": build_wide,
+    "deep": build_deep,
+    "tiny_files": build_tiny_files,
+    "unicode": build_unicode,
+}
+
+
+def generate_tree(tree_name: str, parent_folder: str, scale: float, seed: int) -> dict:
+    """Generate one of the trees, returning its details."""
+
+    root = os.path.join(parent_folder, tree_name)
+    builder = TreeBuilder(root, seed)
+    builder.folder(root)
+
+    start = time.perf_counter()
+    TREES[tree_name](builder, scale)
+    builder.finish()
+
+    return {
+        "path": root,
+        "entries": builder.entries,
+        "generate_seconds": time.perf_counter() - start,
+    }
+
+
+def peak_rss_bytes() -> int:
+    """Get the most memory this process has used so far."""
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Linux reports kilobytes, and macOS bytes
+    return peak if platform.system() == "Darwin" else peak * 1024
+
+
+def run_scan(
+    root: str, output_path: str, output_format: str, alphabetical: bool, pretty_print: bool
+) -> dict:
+    """Scan a tree and measure it. This runs in a process of its own."""
+
+    start = time.perf_counter()
+    stats = diskspaced.scan(
+        root,
+        output_path,
+        diskspaced.OutputFormat(output_format),
+        0,
+        alphabetical,
+        pretty_print,
+    )
+    seconds = time.perf_counter() - start
+
+    output_bytes = os.path.getsize(output_path)
+    os.remove(output_path)
+    entries = stats.folders + stats.files
+
+    return {
+        "seconds": seconds,
+        "files_per_second": stats.files / seconds,
+        "entries_per_second": entries / seconds,
+        "peak_rss_bytes": peak_rss_bytes(),
+        "output_bytes": output_bytes,
+        "output_bytes_per_entry": output_bytes / entries,
+        "syscalls_per_entry": stats.syscalls / entries,
+        "folders": stats.folders,
+        "files": stats.files,
+    }
+
+
+def run_key(run: dict) -> tuple:
+    """Identify a run, to match it with the same run from another set of results."""
+    return (run["tree"], run["format"], run["alphabetical"], run["pretty_print"])
+
+
+def print_runs(runs: list[dict], previous_runs: list[dict]) -> None:
+    """Print a table of the runs, with the change in speed since the previous results if any."""
+
+    previous = {run_key(run): run for run in previous_runs}
+
+    print(
+        f"{'tree':<11} {'format':<17} {'alpha':<5} {'pretty':<6} {'files/s':>10} "
+        + f"{'change':>7} {'peak MB':>8} {'bytes/entry':>11} {'syscalls/entry':>14}"
+    )
+
+    for run in runs:
+        previous_run = previous.get(run_key(run))
+        change = ""
+
+        if previous_run is not None:
+            change = f"{run['files_per_second'] / previous_run['files_per_second'] - 1:+.0%}"
+
+        print(
+            f"{run['tree']:<11} {run['format']:<17} {str(run['alphabetical']):<5} "
+            + f"{str(run['pretty_print']):<6} {run['files_per_second']:>10,.0f} {change:>7} "
+            + f"{run['peak_rss_bytes'] / 1024 / 1024:>8.1f} "
+            + f"{run['output_bytes_per_entry']:>11.1f} {run['syscalls_per_entry']:>14.2f}"
+        )
+
+
+def main() -> None:
+    """Run the benchmark."""
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", maxsplit=1)[0])
+    parser.add_argument("--trees", nargs="+", choices=list(TREES), default=list(TREES))
+    parser.add_argument(
+        "--formats",
+        nargs="+",
+        choices=[item.value for item in diskspaced.OutputFormat],
+        default=[item.value for item in diskspaced.OutputFormat],
+    )
+    parser.add_argument("--scale", type=float, default=1.0, help="How big to make the trees")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--folder",
+        default=MEMORY_BACKED_FOLDER if os.path.isdir(MEMORY_BACKED_FOLDER) else None,
+        help="Where to generate the trees. Defaults to /dev/shm if it exists.",
+    )
+    parser.add_argument("--output", help="Save the results as JSON to this path")
+    parser.add_argument("--compare", help="Show the change since the results at this path")
+    args = parser.parse_args()
+
+    results: dict = {
+        "python": sys.version,
+        "platform": platform.platform(),
+        "scale": args.scale,
+        "seed": args.seed,
+        "trees": {},
+        "runs": [],
+    }
+
+    # Each scan gets a fresh process, so its peak memory isn't anything left by the last
+    context = multiprocessing.get_context("spawn")
+
+    with tempfile.TemporaryDirectory(prefix="diskspaced-benchmark-", dir=args.folder) as folder:
+        for tree_name in args.trees:
+            tree = generate_tree(tree_name, folder, args.scale, args.seed)
+            results["trees"][tree_name] = tree
+
+            for output_format, alphabetical, pretty_print in itertools.product(
+                args.formats, [False, True], [False, True]
+            ):
+                output_path = os.path.join(folder, "output")
+
+                with context.Pool(1) as pool:
+                    run = pool.apply(
+                        run_scan,
+                        (tree["path"], output_path, output_format, alphabetical, pretty_print),
+                    )
+
+                run.update(
+                    {
+                        "tree": tree_name,
+                        "format": output_format,
+                        "alphabetical": alphabetical,
+                        "pretty_print": pretty_print,
+                    }
+                )
+                results["runs"].append(run)
+
+            shutil.rmtree(tree["path"])
+
+    previous_runs = []
+
+    if args.compare:
+        with open(args.compare, "rb") as f:
+            previous_runs = json.load(f)["runs"]
+
+    print_runs(results["runs"], previous_runs)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
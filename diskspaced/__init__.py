@@ -1,27 +1,62 @@
 """A CLI tool for checking disk space."""
 
+import asyncio
+from concurrent.futures import Executor
+from contextlib import aclosing
 import enum
+import json
 import os
 import platform
 import shutil
-
-from diskspaced.constants import ACCEPTABLE_OS_ERRORS, MAX_RECURSION_LIMIT
-from diskspaced.defer import defer
+from typing import AsyncGenerator, Iterator
+
+from diskspaced.analytics import ScanColumns
+from diskspaced.async_scan import AsyncFolderLister, walk_tree_async
+from diskspaced.scan_estimate import ScanEstimator, estimate_report
+from diskspaced.events import FILES, FOLDER_END, FOLDER_START, ScanEvent
+from diskspaced.indexed_lister import IndexedFolderLister
+from diskspaced.metrics import ScanReporter
+from diskspaced.output import STDOUT_PATH, Compression, open_input, open_output
+from diskspaced.profiling import ScanProfiler
+from diskspaced.scan_filter import ScanFilter
+from diskspaced.scan_stats import ScanStats
+from diskspaced.scanner import FolderLister, scan_tree, walk_tree
+from diskspaced.sharding import sharded_scan
+from diskspaced.threaded_lister import ThreadedFolderLister
+from diskspaced.tree import ScanTree, TreeWriter
+from diskspaced.watcher import TreeWatcher
 from diskspaced.writer import Writer
 from diskspaced.json_writer import JSONWriter
 from diskspaced.grand_perspective_writer import GrandPerspectiveWriter
-from diskspaced.temporary_recursion_limit import TemporaryRecursionLimit
+from diskspaced.binary_reader import BinaryReader
+from diskspaced.binary_writer import BinaryWriter
+from diskspaced.top_writer import TopWriter
+from diskspaced.ndjson_writer import NDJSONWriter
+from diskspaced.sqlite_writer import SQLiteWriter
+from diskspaced.json_reader import JSONReader
+from diskspaced.grand_perspective_reader import GrandPerspectiveReader
+from diskspaced.ndjson_reader import NDJSONReader
+from diskspaced.scan_diff import DiffStats, ScanDiff
+from diskspaced import binary_format
 
 
 if platform.system() == "Windows":
     raise NotImplementedError("Windows is not supported by this tool.")
 
 
+# A reader of a scan in any of the formats which can be read
+ScanReader = BinaryReader | JSONReader | GrandPerspectiveReader | NDJSONReader
+
+
 class OutputFormat(enum.Enum):
     """Represents the output format for the scan results."""
 
     JSON = "json"
     GRAND_PERSPECTIVE = "grandperspective"
+    BINARY = "binary"
+    TOP = "top"
+    NDJSON = "ndjson"
+    SQLITE = "sqlite"
 
 
 def _get_block_size(path: str) -> int:
@@ -42,79 +77,188 @@ def _get_block_size(path: str) -> int:
     raise NotImplementedError(f"Unsupported platform: {platform.system()}")
 
 
-def _scan(folder_path: str, writer: Writer, process_in_order: bool) -> None:
+def _create_writer(
+    output_path: str,
+    output_format: OutputFormat,
+    file_print_count: int,
+    pretty_print: bool,
+    compression: Compression | None,
+    top_count: int = 100,
+    records_per_file: int = 0,
+    flush_interval: float = 0,
+) -> Writer:
+    """Create the writer for the output format.
 
-    if os.path.islink(folder_path):
-        return
+    :param output_path: The path to write the results to
+    :param output_format: The format to write the results in
+    :param file_print_count: The number of files to print after. Zero disables printing.
+    :param pretty_print: Whether to pretty print the output (if supported by the format)
+    :param compression: The compression to apply to the output, if any
+    :param top_count: The number of the largest files and folders to report, for the top format
+    :param records_per_file: The most records to write to each file, for the NDJSON format, or 0
+                             to write them all to one file
+    :param flush_interval: The longest time in seconds to go without flushing the output, for
+                           the NDJSON format, or 0 to only flush it when it is closed
+
+    :returns: The writer
+    """
 
-    try:
-        folder_details = os.stat(folder_path)
-    except FileNotFoundError:
+    if output_format == OutputFormat.JSON:
+        return JSONWriter(output_path, file_print_count, pretty_print, compression)
+
+    if output_format == OutputFormat.GRAND_PERSPECTIVE:
+        return GrandPerspectiveWriter(output_path, file_print_count, pretty_print, compression)
+
+    if output_format == OutputFormat.BINARY:
+        return BinaryWriter(output_path, file_print_count, pretty_print, compression)
+
+    if output_format == OutputFormat.TOP:
+        return TopWriter(output_path, file_print_count, pretty_print, compression, top_count)
+
+    if output_format == OutputFormat.NDJSON:
+        return NDJSONWriter(
+            output_path,
+            file_print_count,
+            pretty_print,
+            compression,
+            records_per_file,
+            flush_interval,
+        )
+
+    if output_format == OutputFormat.SQLITE:
+        return SQLiteWriter(output_path, file_print_count, pretty_print, compression)
+
+    raise ValueError(f"Unknown output format: {output_format}")
+
+
+def _create_lister(
+    folder_path: str,
+    stats: ScanStats,
+    alphabetical: bool,
+    workers: int,
+    lookahead: int,
+    index_path: str | None,
+    scan_filter: ScanFilter | None,
+) -> FolderLister:
+    """Create the lister for a scan on a single process.
+
+    :param folder_path: The path to scan
+    :param stats: The statistics to update
+    :param alphabetical: Whether to process the files in alphabetical order
+    :param workers: The number of threads to list folders on
+    :param lookahead: The most folders to list ahead of the output when using several workers
+    :param index_path: The path of an index of folder listings to keep, if any
+    :param scan_filter: The rules for which entries to skip, if any
+
+    :returns: The lister
+    """
+
+    if index_path is not None:
+        return IndexedFolderLister(alphabetical, stats, index_path, folder_path, scan_filter)
+
+    if workers > 1:
+        return ThreadedFolderLister(alphabetical, stats, workers, lookahead, scan_filter)
+
+    return FolderLister(alphabetical, stats, scan_filter)
+
+
+def _scan_tree(
+    folder_path: str, writer: Writer, lister: FolderLister, profiler: ScanProfiler | None
+) -> None:
+    """Scan the folder tree on this process, timing it if there is a profiler.
+
+    :param folder_path: The path to scan
+    :param writer: The writer to give the results to
+    :param lister: The lister to get the contents of each folder from
+    :param profiler: The profiler to time the scan with, if any
+    """
+
+    if profiler is None:
+        scan_tree(folder_path, writer, lister)
         return
-    except OSError as e:
-        if e.errno in ACCEPTABLE_OS_ERRORS:
-            return
-        raise
 
-    writer.write_folder_start(
-        os.path.basename(folder_path),
-        int(folder_details.st_atime),
-        int(folder_details.st_mtime),
-        int(folder_details.st_ctime),
-    )
+    events = walk_tree(folder_path, profiler.wrap_lister(lister), writer)
+    writer.write_events(profiler.time_events(events))
 
-    with defer() as d:
-        d(writer.write_folder_end)
 
-        files = []
-        folders = []
+# pylint: disable=too-many-arguments
+def _scan(
+    folder_path: str,
+    writer: Writer,
+    alphabetical: bool,
+    workers: int,
+    lookahead: int,
+    processes: int,
+    index_path: str | None,
+    scan_filter: ScanFilter | None,
+    reporter: ScanReporter | None = None,
+    profiler: ScanProfiler | None = None,
+) -> ScanStats:
+    """Scan the folder with the writer.
 
-        try:
-            items = os.listdir(folder_path)
-        except FileNotFoundError:
-            return
-        except OSError as e:
-            if e.errno in ACCEPTABLE_OS_ERRORS:
-                return
-            raise
-
-        for item in items:
-            full_path = os.path.join(folder_path, item)
-
-            if os.path.isdir(full_path):
-                folders.append(full_path)
-            else:
-                files.append((full_path, item))
-
-        if process_in_order:
-            folders.sort()
-            files.sort(key=lambda x: x[1])
-
-        for folder in folders:
-            _scan(folder, writer, process_in_order)
-
-        for file_path, file_name in files:
-
-            if os.path.islink(file_path):
-                continue
-
-            try:
-                file_details = os.stat(file_path)
-            except FileNotFoundError:
-                # It could have been deleted in between scanning and processing
-                continue
-            except OSError as e:
-                if e.errno in ACCEPTABLE_OS_ERRORS:
-                    continue
-                raise
-
-            writer.write_file(
-                file_name,
-                file_details.st_size,
-                int(file_details.st_atime),
-                int(file_details.st_mtime),
-                int(file_details.st_ctime),
+    :param folder_path: The path to scan
+    :param writer: The writer to give the results to, which hasn't been started yet
+    :param alphabetical: Whether to process the files in alphabetical order
+    :param workers: The number of threads to list folders on
+    :param lookahead: The most folders to list ahead of the output when using several workers
+    :param processes: The number of processes to scan on
+    :param index_path: The path of an index of folder listings to keep, if any
+    :param scan_filter: The rules for which entries to skip, if any
+    :param reporter: The reporter to report the progress of the scan to, if any
+    :param profiler: The profiler to time the scan with, if any
+
+    :returns: The statistics for the scan
+    """
+
+    if index_path is not None and (workers > 1 or processes > 1):
+        raise ValueError("An index can't be used with several workers or processes")
+
+    if profiler is not None and processes > 1:
+        raise ValueError("A scan on several processes can't be profiled")
+
+    disk_usage = shutil.disk_usage(folder_path)
+    block_size = _get_block_size(folder_path)
+
+    stats = ScanStats()
+
+    if scan_filter is not None:
+        scan_filter.set_root(folder_path)
+
+    if profiler is not None:
+        profiler.start()
+        profiler.wrap_output(writer)
+
+    writer.write_start(folder_path, disk_usage.total, disk_usage.used, disk_usage.free, block_size)
+
+    if reporter is not None:
+        reporter.start(stats, writer, disk_usage.used)
+
+    finished = False
+
+    try:
+        if processes > 1:
+            sharded_scan(
+                folder_path, writer, stats, alphabetical, processes, workers, lookahead, scan_filter
             )
+        else:
+            with _create_lister(
+                folder_path, stats, alphabetical, workers, lookahead, index_path, scan_filter
+            ) as lister:
+                _scan_tree(folder_path, writer, lister, profiler)
+
+        if writer.depth != 0:
+            raise ValueError(f"Depth is not zero at end of scan: {writer.depth}")
+
+        writer.write_end()
+        finished = True
+    finally:
+        if profiler is not None:
+            profiler.stop()
+
+        if reporter is not None:
+            reporter.stop(finished)
+
+    return stats
 
 
 def scan(
@@ -124,37 +268,506 @@ def scan(
     file_print_count: int,
     alphabetical: bool,
     pretty_print: bool = False,
-) -> None:
+    *,
+    workers: int = 1,
+    lookahead: int = 256,
+    processes: int = 1,
+    compression: Compression | None = None,
+    index_path: str | None = None,
+    top_count: int = 100,
+    scan_filter: ScanFilter | None = None,
+    reporter: ScanReporter | None = None,
+    profiler: ScanProfiler | None = None,
+    records_per_file: int = 0,
+    flush_interval: float = 0,
+) -> ScanStats:
     """Scan the folder and write the results to the output path.
 
     :param folder_path: The path to scan
-    :param output_path: The path to write the results to
+    :param output_path: The path to write the results to, or `-` to write them to stdout
     :param output_format: The format to write the results in
     :param file_print_count: The number of files to print after. Zero disables printing.
     :param alphabetical: Whether to process the files in alphabetical order
+    :param pretty_print: Whether to pretty print the output (if supported by the format)
+    :param workers: The number of threads to list folders on
+    :param lookahead: The most folders to list ahead of the output when using several workers
+    :param processes: The number of processes to scan on
+    :param compression: The compression to apply to the output, if any
+    :param index_path: The path of an index of folder listings to keep, so that only folders
+                       which changed since the last scan with it are listed again
+    :param top_count: The number of the largest files and folders to report, for the top format
+    :param scan_filter: The rules for which entries to skip, if any
+    :param reporter: The reporter to report the progress of the scan to as it goes, if any
+    :param profiler: The profiler to time each phase of the scan with, if any, which can only
+                     be used on a single process
+    :param records_per_file: The most records to write to each file, for the NDJSON format, or 0
+                             to write them all to one file
+    :param flush_interval: The longest time in seconds to go without flushing the output, for
+                           the NDJSON format, or 0 to only flush it when it is closed
+
+    :returns: The statistics for the scan
     """
 
-    writer: Writer
+    writer = _create_writer(
+        output_path,
+        output_format,
+        file_print_count,
+        pretty_print,
+        compression,
+        top_count,
+        records_per_file,
+        flush_interval,
+    )
+
+    return _scan(
+        folder_path,
+        writer,
+        alphabetical,
+        workers,
+        lookahead,
+        processes,
+        index_path,
+        scan_filter,
+        reporter,
+        profiler,
+    )
 
-    if output_format == OutputFormat.JSON:
-        writer = JSONWriter(output_path, file_print_count)
-    elif output_format == OutputFormat.GRAND_PERSPECTIVE:
-        writer = GrandPerspectiveWriter(output_path, file_print_count)
-    else:
-        raise ValueError(f"Unknown output format: {output_format}")
+
+# pylint: enable=too-many-arguments
+
+
+# pylint: disable=too-many-arguments
+def estimate(
+    folder_path: str,
+    output_path: str,
+    sample_size: int = 8,
+    confidence: float = 0.95,
+    seed: int | None = None,
+    pretty_print: bool = False,
+    compression: Compression | None = None,
+    scan_filter: ScanFilter | None = None,
+) -> dict:
+    """Estimate the size and counts of the folder tree from a random sample of it, and write a
+    report of the estimates to the output path as JSON.
+
+    Each folder directly in the folder is walked, and below them at most `sample_size` sub-folders
+    of each folder are picked at random and walked, with what they hold scaled up to stand for
+    the ones which weren't. The report has an estimate of the size, number of files and number of
+    folders, with a confidence interval, for the whole tree and each folder directly in it. The
+    used space on the disk is an upper bound on every size, so a tree which spans other file
+    systems can be underestimated unless `scan_filter` keeps to one file system.
+
+    :param folder_path: The path to estimate
+    :param output_path: The path to write the report to, or `-` to write it to stdout
+    :param sample_size: The most sub-folders of each folder to walk, at least 2
+    :param confidence: How likely the real totals are to be inside the intervals
+    :param seed: The seed for picking sub-folders, for the same sample each time, if any
+    :param pretty_print: Whether to pretty print the report
+    :param compression: The compression to apply to the output, if any
+    :param scan_filter: The rules for which entries to skip, if any
+
+    :returns: The report
+    """
+
+    if not 0 < confidence < 1:
+        raise ValueError(f"The confidence must be between 0 and 1: {confidence}")
 
     disk_usage = shutil.disk_usage(folder_path)
-    block_size = _get_block_size(folder_path)
+    stats = ScanStats()
+
+    if scan_filter is not None:
+        scan_filter.set_root(folder_path)
+
+    # The order of a listing can change from one to the next, so the sample only depends on the
+    # seed if the sub-folders are picked from them in order
+    with FolderLister(seed is not None, stats, scan_filter) as lister:
+        total, top_level = ScanEstimator(lister, sample_size, seed).estimate(folder_path)
+
+    report = estimate_report(
+        folder_path,
+        disk_usage.total,
+        disk_usage.used,
+        disk_usage.free,
+        total,
+        top_level,
+        confidence,
+        sample_size,
+        stats.folders,
+    )
+
+    with open_output(output_path, compression) as output:
+        output.write(json.dumps(report, indent=2 if pretty_print else None).encode("utf-8"))
+        output.write(b"\n")
+
+    return report
+
+
+# pylint: enable=too-many-arguments
+
+
+def build_tree(
+    folder_path: str,
+    alphabetical: bool = False,
+    workers: int = 1,
+    lookahead: int = 256,
+    index_path: str | None = None,
+    scan_filter: ScanFilter | None = None,
+) -> ScanTree:
+    """Scan the folder into a tree in memory, which can be asked how big each folder is.
+
+    :param folder_path: The path to scan
+    :param alphabetical: Whether to process the files in alphabetical order
+    :param workers: The number of threads to list folders on
+    :param lookahead: The most folders to list ahead of the output when using several workers
+    :param index_path: The path of an index of folder listings to keep, so that only folders
+                       which changed since the last scan with it are listed again
+    :param scan_filter: The rules for which entries to skip, if any
+
+    :returns: The tree
+    """
+
+    writer = TreeWriter()
+    _scan(folder_path, writer, alphabetical, workers, lookahead, 1, index_path, scan_filter)
+
+    return writer.tree
+
+
+def iter_scan(
+    folder_path: str,
+    alphabetical: bool = False,
+    workers: int = 1,
+    lookahead: int = 256,
+    index_path: str | None = None,
+    scan_filter: ScanFilter | None = None,
+    stats: ScanStats | None = None,
+) -> Iterator[ScanEvent]:
+    """Scan the folder, yielding the folders and files in it as they are reached.
+
+    Each event is a tuple starting with `FOLDER_START`, `FILES` or `FOLDER_END`, which are
+    described in `diskspaced.events`. The files in a folder come as a single batch, after its
+    sub-folders. Nothing is listed ahead of what has been taken from the iterator, apart from by
+    the workers, so the scan can be stopped at any point by no longer taking from it.
+
+    Any writer can consume the events with `Writer.write_events`.
+
+    :param folder_path: The path to scan
+    :param alphabetical: Whether to process the files in alphabetical order
+    :param workers: The number of threads to list folders on
+    :param lookahead: The most folders to list ahead of the output when using several workers
+    :param index_path: The path of an index of folder listings to keep, so that only folders
+                       which changed since the last scan with it are listed again
+    :param scan_filter: The rules for which entries to skip, if any
+    :param stats: The statistics to update as the scan goes, if any
+
+    :returns: An iterator over the events
+    """
+
+    if index_path is not None and workers > 1:
+        raise ValueError("An index can't be used with several workers")
+
+    if stats is None:
+        stats = ScanStats()
+
+    if scan_filter is not None:
+        scan_filter.set_root(folder_path)
+
+    with _create_lister(
+        folder_path, stats, alphabetical, workers, lookahead, index_path, scan_filter
+    ) as lister:
+        yield from walk_tree(folder_path, lister)
+
+
+async def aiter_scan(
+    folder_path: str,
+    alphabetical: bool = False,
+    max_in_flight: int = 4,
+    lookahead: int = 256,
+    executor: Executor | None = None,
+    scan_filter: ScanFilter | None = None,
+    stats: ScanStats | None = None,
+) -> AsyncGenerator[ScanEvent, None]:
+    """Scan the folder from asyncio, yielding the same events as `iter_scan`.
+
+    Folders are listed on an executor, so the event loop is never blocked on the disk, and any
+    number of scans can run on the same loop at once. Cancelling the task iterating over the
+    events cancels the listings which haven't started yet.
+
+    :param folder_path: The path to scan
+    :param alphabetical: Whether to process the files in alphabetical order
+    :param max_in_flight: The most folders to be listing on the executor at once for this scan
+    :param lookahead: The most folders to list ahead of what has been taken from the iterator
+    :param executor: The executor to list folders on, or None for the loop's default one
+    :param scan_filter: The rules for which entries to skip, if any
+    :param stats: The statistics to update as the scan goes, if any
+
+    :returns: An asynchronous iterator over the events
+    """
+
+    if stats is None:
+        stats = ScanStats()
+
+    if scan_filter is not None:
+        await asyncio.get_running_loop().run_in_executor(
+            executor, scan_filter.set_root, folder_path
+        )
+
+    lister = AsyncFolderLister(alphabetical, stats, max_in_flight, lookahead, executor, scan_filter)
+
+    try:
+        async with aclosing(walk_tree_async(folder_path, lister)) as events:
+            async for event in events:
+                yield event
+    finally:
+        lister.close()
+
+
+# pylint: disable=too-many-arguments
+async def scan_async(
+    folder_path: str,
+    output_path: str,
+    output_format: OutputFormat,
+    alphabetical: bool = False,
+    pretty_print: bool = False,
+    compression: Compression | None = None,
+    max_in_flight: int = 4,
+    lookahead: int = 256,
+    executor: Executor | None = None,
+    scan_filter: ScanFilter | None = None,
+) -> ScanStats:
+    """Scan the folder from asyncio and write the results to the output path.
+
+    The output is finished even if the task is cancelled or the scan fails, with the folders
+    which were open ended, so it is always well formed, though it only has what was scanned.
+
+    :param folder_path: The path to scan
+    :param output_path: The path to write the results to, or `-` to write them to stdout
+    :param output_format: The format to write the results in
+    :param alphabetical: Whether to process the files in alphabetical order
+    :param pretty_print: Whether to pretty print the output (if supported by the format)
+    :param compression: The compression to apply to the output, if any
+    :param max_in_flight: The most folders to be listing on the executor at once for this scan
+    :param lookahead: The most folders to list ahead of the output
+    :param executor: The executor to list folders on, or None for the loop's default one
+    :param scan_filter: The rules for which entries to skip, if any
+
+    :returns: The statistics for the scan
+    """
+
+    loop = asyncio.get_running_loop()
+    writer = _create_writer(output_path, output_format, 0, pretty_print, compression)
+
+    disk_usage = await loop.run_in_executor(executor, shutil.disk_usage, folder_path)
+    block_size = await loop.run_in_executor(executor, _get_block_size, folder_path)
+
+    stats = ScanStats()
 
     writer.write_start(folder_path, disk_usage.total, disk_usage.used, disk_usage.free, block_size)
 
-    with TemporaryRecursionLimit(10000):
-        _scan(folder_path, writer, alphabetical)
+    try:
+        async with aclosing(
+            aiter_scan(
+                folder_path,
+                alphabetical,
+                max_in_flight,
+                lookahead,
+                executor,
+                scan_filter,
+                stats,
+            )
+        ) as events:
+            await writer.write_events_async(events)
+    finally:
+        writer.write_end()
+
+    return stats
+
+
+# pylint: enable=too-many-arguments
+
+
+def detect_format(input_path: str) -> OutputFormat:
+    """Work out which format a scan was written in from the start of it.
+
+    :param input_path: The path of the scan, which can be compressed
+
+    :returns: The format of the scan
+    """
+
+    with open_input(input_path) as f:
+        start = f.read(64)
+
+    if start.startswith(binary_format.MAGIC):
+        return OutputFormat.BINARY
+
+    start = start.lstrip()
+
+    if start.startswith(b'{"type":"scan"'):
+        return OutputFormat.NDJSON
+
+    if start.startswith(b"{"):
+        return OutputFormat.JSON
+
+    if start.startswith(b"<"):
+        return OutputFormat.GRAND_PERSPECTIVE
+
+    raise ValueError(f"Unknown scan format: {input_path}")
+
+
+def open_scan(input_path: str, input_format: OutputFormat | None = None) -> ScanReader:
+    """Open a scan to read, in any format but `TOP`.
 
-    if writer.depth != 0:
-        raise ValueError(f"Depth is not zero at end of scan: {writer.depth}")
+    :param input_path: The path of the scan, which can be compressed, other than a binary scan
+    :param input_format: The format of the scan, which is worked out from the start of it if
+                         this isn't set
+
+    :returns: A reader for the scan, which gives its entries as events with `events`, or writes
+              them to a writer with `replay`
+    """
+
+    if input_format is None:
+        input_format = detect_format(input_path)
+
+    if input_format == OutputFormat.BINARY:
+        return BinaryReader(input_path)
+
+    if input_format == OutputFormat.JSON:
+        return JSONReader(input_path)
+
+    if input_format == OutputFormat.GRAND_PERSPECTIVE:
+        return GrandPerspectiveReader(input_path)
+
+    if input_format == OutputFormat.NDJSON:
+        return NDJSONReader(input_path)
+
+    raise ValueError(f"Scans in the {input_format.value} format can't be read")
+
+
+def convert(
+    input_path: str,
+    output_path: str,
+    output_format: OutputFormat,
+    pretty_print: bool = False,
+    compression: Compression | None = None,
+    input_format: OutputFormat | None = None,
+) -> None:
+    """Convert a scan to another format, without scanning the folder again.
+
+    The scan is read as a stream and written out as it is read, so the memory used doesn't
+    depend on its size. Only the binary format keeps the sizes of files as they were before
+    they were rounded up to the block size, so only binary scans come out exactly the same as
+    scanning the folder to the other format would have.
+
+    :param input_path: The path of the scan, which can be compressed, other than a binary scan
+    :param output_path: The path to write the converted scan to, or `-` to write it to stdout
+    :param output_format: The format to convert the scan to
+    :param pretty_print: Whether to pretty print the output (if supported by the format)
+    :param compression: The compression to apply to the output, if any
+    :param input_format: The format of the scan, which is worked out from the start of it if
+                         this isn't set
+    """
+
+    with open_scan(input_path, input_format) as reader:
+        writer = _create_writer(output_path, output_format, 0, pretty_print, compression)
+        reader.replay(writer)
+
+
+def diff(
+    old_path: str,
+    new_path: str,
+    output_path: str,
+    min_change: int = 0,
+    compression: Compression | None = None,
+) -> DiffStats:
+    """Write what changed between two scans, without loading either of them into memory.
+
+    Both scans have to have been written with `alphabetical` set, but they can be in different
+    formats, other than GrandPerspective scans, which only keep sizes up to the block size and
+    can only be compared with each other. The changes are written as described in `ScanDiff`.
+
+    :param old_path: The path of the older scan, which can be compressed
+    :param new_path: The path of the newer scan, which can be compressed
+    :param output_path: The path to write the changes to, or `-` to write them to stdout
+    :param min_change: The smallest change in bytes to write
+    :param compression: The compression to apply to the output, if any
+
+    :returns: Counts of what changed
+    """
+
+    with open_scan(old_path) as old_reader, open_scan(new_path) as new_reader:
+        return ScanDiff(output_path, min_change, compression).compare(
+            old_reader.events(),
+            new_reader.events(),
+            old_reader.block_size,
+            new_reader.block_size,
+        )
+
+
+def analyze(input_path: str, input_format: OutputFormat | None = None) -> ScanColumns:
+    """Load a scan into NumPy columns, to report on with whole column operations.
+
+    This needs the numpy package to be installed. Only binary scans keep the sizes of files as
+    they were before they were rounded up to the block size.
+
+    :param input_path: The path of the scan, which can be compressed, other than a binary scan
+    :param input_format: The format of the scan, which is worked out from the start of it if
+                         this isn't set
+
+    :returns: The columns, which have methods for each of the reports
+    """
+
+    with open_scan(input_path, input_format) as reader:
+        return ScanColumns.from_events(reader.events())
+
+
+def write_snapshot(
+    watcher: TreeWatcher,
+    output_path: str,
+    output_format: OutputFormat,
+    pretty_print: bool = False,
+    compression: Compression | None = None,
+) -> None:
+    """Write the tree a watcher is keeping current, without scanning the folder again.
+
+    Anything reading the output never sees it half written, as it is written next to the output
+    and then moved over it. If writing it fails, what was written is removed, and the output is
+    left as it was.
+
+    :param watcher: The watcher, which must have been started
+    :param output_path: The path to write the results to, or `-` to write them to stdout
+    :param output_format: The format to write the results in
+    :param pretty_print: Whether to pretty print the output (if supported by the format)
+    :param compression: The compression to apply to the output, if any
+    """
+
+    if output_path == STDOUT_PATH:
+        temporary_path = output_path
+    else:
+        temporary_path = f"{output_path}.{os.getpid()}.tmp"
+
+    writer = _create_writer(temporary_path, output_format, 0, pretty_print, compression)
+
+    disk_usage = shutil.disk_usage(watcher.root_path)
+    block_size = _get_block_size(watcher.root_path)
+
+    writer.write_start(
+        watcher.root_path, disk_usage.total, disk_usage.used, disk_usage.free, block_size
+    )
+
+    try:
+        watcher.write_tree(writer)
+    except BaseException:
+        # Ending a half written document could fail as well, and hide why it stopped
+        try:
+            writer.close_output()
+        except OSError:
+            pass
+
+        if temporary_path != output_path and os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+        raise
 
     writer.write_end()
 
-    if pretty_print:
-        writer.pretty_print()
+    if temporary_path != output_path:
+        os.replace(temporary_path, output_path)
@@ -0,0 +1,473 @@
+"""Reports over the results of a scan, worked out on NumPy columns instead of in Python loops."""
+
+from array import array
+import os
+import time
+from typing import Any, Iterable
+
+from diskspaced.events import FILES, FOLDER_END, FOLDER_START, ScanEvent
+from diskspaced.tree import ScanTree
+
+# NumPy is only imported once columns are made, so that importing the package doesn't pay for it
+np: Any = None
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# The time columns which the age of entries can be worked out from
+TIME_COLUMNS = {
+    "accessed": "accessed_times",
+    "modified": "modified_times",
+    "created": "created_times",
+}
+
+
+def _require_numpy() -> None:
+    global np  # pylint: disable=global-statement
+
+    if np is not None:
+        return
+
+    try:
+        import numpy  # pylint: disable=import-outside-toplevel
+    except ImportError as ex:
+        raise ValueError("Analytics require the numpy package to be installed") from ex
+
+    np = numpy
+
+
+def _extension(name: str) -> str:
+    """Get the extension of a name, in lower case, or an empty string if it doesn't have one."""
+    return os.path.splitext(name)[1].lower()
+
+
+class ScanColumns:
+    """The folders and files from a scan, as a NumPy column for each of their details.
+
+    Entries are numbered in the order the scan wrote them, starting with the root at 0, as in
+    `ScanTree`. `parents` has the number of each entry's parent, or -1 for the root, `depths`
+    how many folders each entry is in, and `extension_codes` the position of each file's
+    extension in `extensions`, or -1 for folders. Files without an extension have the extension
+    "". Sizes are as they were on disk, before being rounded up to the block size.
+
+    Every report is worked out with whole column operations. Totals for each folder are added up
+    one level of the tree at a time with `np.add.at` over the parent numbers, starting from the
+    deepest, so the work is a handful of passes over the columns however big the tree is.
+    """
+
+    root_path: str
+    names: list[str]
+    parents: Any
+    depths: Any
+    is_folder: Any
+    sizes: Any
+    accessed_times: Any
+    modified_times: Any
+    created_times: Any
+    extension_codes: Any
+    extensions: list[str]
+    _levels: list[Any] | None
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        root_path: str,
+        names: list[str],
+        parents: Any,
+        depths: Any,
+        is_folder: Any,
+        sizes: Any,
+        accessed_times: Any,
+        modified_times: Any,
+        created_times: Any,
+        extension_codes: Any,
+        extensions: list[str],
+    ) -> None:
+        _require_numpy()
+
+        self.root_path = root_path
+        self.names = names
+        self.parents = np.asarray(parents, dtype=np.int64)
+        self.depths = np.asarray(depths, dtype=np.int32)
+        self.is_folder = np.asarray(is_folder, dtype=np.bool_)
+        self.sizes = np.asarray(sizes, dtype=np.int64)
+        self.accessed_times = np.asarray(accessed_times, dtype=np.int64)
+        self.modified_times = np.asarray(modified_times, dtype=np.int64)
+        self.created_times = np.asarray(created_times, dtype=np.int64)
+        self.extension_codes = np.asarray(extension_codes, dtype=np.int32)
+        self.extensions = extensions
+        self._levels = None
+
+    # pylint: enable=too-many-arguments
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @staticmethod
+    def from_events(events: Iterable[ScanEvent]) -> "ScanColumns":
+        """Load the columns from the events of a scan, such as those from `iter_scan` or
+        `open_scan(...).events()`.
+
+        :param events: The events of the scan
+
+        :returns: The columns
+        """
+
+        _require_numpy()
+
+        root_path = ""
+        names: list[str] = []
+        parents = array("q")
+        depths = array("i")
+        is_folder = bytearray()
+        sizes = array("q")
+        accessed_times = array("q")
+        modified_times = array("q")
+        created_times = array("q")
+        extension_codes = array("i")
+        extension_numbers: dict[str, int] = {}
+        open_folders = [-1]
+
+        for event in events:
+            kind = event[0]
+
+            if kind == FOLDER_START:
+                _, name, path, accessed_time, modified_time, created_time = event
+
+                if not names:
+                    root_path = path
+
+                open_folders.append(len(names))
+                names.append(name)
+                parents.append(open_folders[-2])
+                depths.append(len(open_folders) - 2)
+                is_folder.append(True)
+                sizes.append(0)
+                accessed_times.append(accessed_time)
+                modified_times.append(modified_time)
+                created_times.append(created_time)
+                extension_codes.append(-1)
+            elif kind == FILES:
+                parent = open_folders[-1]
+                depth = len(open_folders) - 1
+
+                for file_name, size, accessed_time, modified_time, created_time in event[1]:
+                    extension = _extension(file_name)
+                    code = extension_numbers.setdefault(extension, len(extension_numbers))
+
+                    names.append(file_name)
+                    parents.append(parent)
+                    depths.append(depth)
+                    is_folder.append(False)
+                    sizes.append(size)
+                    accessed_times.append(accessed_time)
+                    modified_times.append(modified_time)
+                    created_times.append(created_time)
+                    extension_codes.append(code)
+            elif kind == FOLDER_END:
+                open_folders.pop()
+
+        return ScanColumns(
+            root_path,
+            names,
+            np.frombuffer(parents, dtype=np.int64),
+            np.frombuffer(depths, dtype=np.int32),
+            np.frombuffer(is_folder, dtype=np.bool_),
+            np.frombuffer(sizes, dtype=np.int64),
+            np.frombuffer(accessed_times, dtype=np.int64),
+            np.frombuffer(modified_times, dtype=np.int64),
+            np.frombuffer(created_times, dtype=np.int64),
+            np.frombuffer(extension_codes, dtype=np.int32),
+            list(extension_numbers),
+        )
+
+    @staticmethod
+    def from_tree(tree: ScanTree) -> "ScanColumns":
+        """Load the columns from a tree built by `build_tree` or kept by `TreeWatcher`.
+
+        The numbers of the tree are copied as they are, only the names are looked at one by one.
+
+        :param tree: The tree
+
+        :returns: The columns
+        """
+
+        _require_numpy()
+
+        names = [tree.name(index) for index in range(len(tree))]
+        is_folder = np.frombuffer(bytes(tree.is_folder), dtype=np.bool_)
+        parents = np.array(tree.parents, dtype=np.int64)
+
+        extension_numbers: dict[str, int] = {}
+        extension_codes = np.array(
+            [
+                (
+                    -1
+                    if folder
+                    else extension_numbers.setdefault(_extension(name), len(extension_numbers))
+                )
+                for name, folder in zip(names, tree.is_folder)
+            ],
+            dtype=np.int32,
+        )
+
+        # Each pass moves every entry's ancestor up a level, so there is a pass for each level
+        depths = np.zeros(len(names), dtype=np.int32)
+
+        if len(names) > 0:
+            ancestors = parents.copy()
+            ancestors[0] = -1
+
+            while (ancestors >= 0).any():
+                has_ancestor = ancestors >= 0
+                depths += has_ancestor
+                ancestors = np.where(has_ancestor, parents[np.maximum(ancestors, 0)], -1)
+
+        return ScanColumns(
+            tree.root_path,
+            names,
+            parents,
+            depths,
+            is_folder,
+            np.array(tree.sizes, dtype=np.int64),
+            np.array(tree.accessed_times, dtype=np.int64),
+            np.array(tree.modified_times, dtype=np.int64),
+            np.array(tree.created_times, dtype=np.int64),
+            extension_codes,
+            list(extension_numbers),
+        )
+
+    def path(self, index: int) -> str:
+        """Get the path of an entry.
+
+        :param index: The number of the entry
+
+        :returns: The path, starting with the path of the root
+        """
+
+        names = []
+
+        while index > 0:
+            names.append(self.names[index])
+            index = int(self.parents[index])
+
+        return os.path.join(self.root_path, *reversed(names))
+
+    def _levels_deepest_first(self) -> list[Any]:
+        """Get the numbers of the entries at each depth below the root, deepest first."""
+
+        if self._levels is None:
+            order = np.argsort(self.depths, kind="stable")
+            bounds = np.searchsorted(self.depths[order], np.arange(1, self.depths.max() + 2))
+            self._levels = [order[start:end] for start, end in zip(bounds[:-1], bounds[1:])][::-1]
+
+        return self._levels
+
+    def rollup(self, values: Any) -> Any:
+        """Add up a value for each entry into every folder above it.
+
+        :param values: A value for each entry, such as its size
+
+        :returns: The total of the values in each entry's subtree, including its own
+        """
+
+        totals = np.array(values, dtype=np.int64)
+
+        if len(totals) == 0:
+            return totals
+
+        for level in self._levels_deepest_first():
+            np.add.at(totals, self.parents[level], totals[level])
+
+        return totals
+
+    def folder_sizes(self) -> Any:
+        """Get the total size of the files directly in each folder, not counting sub-folders.
+
+        :returns: The total for each entry, which is 0 for files
+        """
+
+        files = ~self.is_folder
+        totals = np.zeros(len(self), dtype=np.int64)
+        np.add.at(totals, self.parents[files], self.sizes[files])
+
+        return totals
+
+    def subtree_sizes(self) -> Any:
+        """Get the total size of the files under each folder.
+
+        :returns: The total for each entry, which is its own size for files
+        """
+        return self.rollup(self.sizes)
+
+    def size_histogram(self) -> list[tuple[int, int, int]]:
+        """Count the files by the power of two their size is in.
+
+        :returns: A row for each bucket up to the largest file, of the smallest size in it, the
+                  number of files and their total size. The first bucket is for empty files, and
+                  each other bucket has the sizes from its smallest up to twice that.
+        """
+
+        sizes = self.sizes[~self.is_folder]
+
+        # frexp gives an exponent one more than the floor of log2, and 0 for 0
+        _, buckets = np.frexp(sizes.astype(np.float64))
+        counts = np.bincount(buckets)
+        totals = np.zeros(len(counts), dtype=np.int64)
+        np.add.at(totals, buckets, sizes)
+
+        return [
+            (0 if bucket == 0 else 1 << (bucket - 1), int(counts[bucket]), int(totals[bucket]))
+            for bucket in range(len(counts))
+        ]
+
+    def _cutoff(self, days: float, now: float | None) -> float:
+        return (time.time() if now is None else now) - days * SECONDS_PER_DAY
+
+    def stale_files(
+        self, days: float, now: float | None = None, times: str = "accessed"
+    ) -> tuple[int, int]:
+        """Count the files which haven't been touched in over a number of days.
+
+        :param days: How many days ago the files were last touched before
+        :param now: The time to count back from. Defaults to the current time.
+        :param times: Which time to go by: `accessed`, `modified` or `created`
+
+        :returns: The number of files and their total size
+        """
+
+        stale = self._stale(days, now, times)
+
+        return int(stale.sum()), int(self.sizes[stale].sum())
+
+    def stale_sizes(self, days: float, now: float | None = None, times: str = "accessed") -> Any:
+        """Get the total size of the files under each folder which haven't been touched in over a
+        number of days.
+
+        :param days: How many days ago the files were last touched before
+        :param now: The time to count back from. Defaults to the current time.
+        :param times: Which time to go by: `accessed`, `modified` or `created`
+
+        :returns: The total for each entry
+        """
+        return self.rollup(np.where(self._stale(days, now, times), self.sizes, 0))
+
+    def _stale(self, days: float, now: float | None, times: str) -> Any:
+        return ~self.is_folder & (self._times(times) < self._cutoff(days, now))
+
+    def _times(self, times: str) -> Any:
+        if times not in TIME_COLUMNS:
+            raise ValueError(f"Unknown times: {times}")
+
+        return getattr(self, TIME_COLUMNS[times])
+
+    def age_buckets(
+        self, days: list[float], now: float | None = None, times: str = "accessed"
+    ) -> list[tuple[float, int, int]]:
+        """Count the files by how long ago they were last touched.
+
+        :param days: The ages in days which the buckets start at, in increasing order
+        :param now: The time to count back from. Defaults to the current time.
+        :param times: Which time to go by: `accessed`, `modified` or `created`
+
+        :returns: A row for each bucket, of the age it starts at, the number of files and their
+                  total size. The first bucket is for files younger than the first age, with an
+                  age of 0, and each other bucket has the files from its age up to the next.
+        """
+
+        files = ~self.is_folder
+        file_times = self._times(times)[files]
+        sizes = self.sizes[files]
+
+        # The cutoffs go back in time, so they are reversed to be in increasing order
+        cutoffs = np.array([self._cutoff(age, now) for age in reversed(days)], dtype=np.float64)
+        buckets = len(days) - np.searchsorted(cutoffs, file_times, side="right")
+
+        counts = np.bincount(buckets, minlength=len(days) + 1)
+        totals = np.zeros(len(days) + 1, dtype=np.int64)
+        np.add.at(totals, buckets, sizes)
+
+        return [
+            (age, int(counts[bucket]), int(totals[bucket]))
+            for bucket, age in enumerate([0.0] + list(days))
+        ]
+
+    def top_extensions(self, count: int) -> list[tuple[str, int, int]]:
+        """Get the extensions with the most bytes in files which have them.
+
+        :param count: How many extensions to get
+
+        :returns: A row for each extension, largest first, of the extension, the number of files
+                  and their total size
+        """
+
+        files = ~self.is_folder
+        codes = self.extension_codes[files]
+        counts = np.bincount(codes, minlength=len(self.extensions))
+        totals = np.zeros(len(self.extensions), dtype=np.int64)
+        np.add.at(totals, codes, self.sizes[files])
+
+        # Ties are broken by the extension, so the order doesn't depend on the scan order
+        order = np.lexsort((np.array(self.extensions, dtype=np.str_), -totals))[:count]
+
+        return [(self.extensions[code], int(counts[code]), int(totals[code])) for code in order]
+
+    def largest_folders(self, count: int) -> list[tuple[str, int]]:
+        """Get the folders with the most bytes under them.
+
+        :param count: How many folders to get
+
+        :returns: A row for each folder, largest first, of its path and total size
+        """
+
+        totals = self.subtree_sizes()
+        folders = np.flatnonzero(self.is_folder)
+        largest = folders[np.argsort(-totals[folders], kind="stable")[:count]]
+
+        return [(self.path(int(index)), int(totals[index])) for index in largest]
+
+    def report(
+        self,
+        stale_days: float = 365,
+        count: int = 20,
+        now: float | None = None,
+        age_days: list[float] | None = None,
+    ) -> dict[str, Any]:
+        """Gather the usual reports into a document which can be written as JSON.
+
+        :param stale_days: How many days without being accessed counts files as stale
+        :param count: How many extensions and folders to list
+        :param now: The time to count back from. Defaults to the current time.
+        :param age_days: The ages in days of the buckets of files by access time. Defaults to a
+                         month, a quarter, a year and three years.
+
+        :returns: The reports
+        """
+
+        if age_days is None:
+            age_days = [30, 91, 365, 3 * 365]
+
+        stale_count, stale_size = self.stale_files(stale_days, now)
+        files = ~self.is_folder
+
+        return {
+            "root_path": self.root_path,
+            "file_count": int(files.sum()),
+            "folder_count": int(self.is_folder.sum()),
+            "total_size": int(self.sizes[files].sum()),
+            "size_histogram": [
+                {"min_size": min_size, "count": bucket_count, "size": size}
+                for min_size, bucket_count, size in self.size_histogram()
+            ],
+            "age_buckets": [
+                {"min_age_days": age, "count": bucket_count, "size": size}
+                for age, bucket_count, size in self.age_buckets(age_days, now)
+            ],
+            "stale": {"days": stale_days, "count": stale_count, "size": stale_size},
+            "top_extensions": [
+                {"extension": extension, "count": extension_count, "size": size}
+                for extension, extension_count, size in self.top_extensions(count)
+            ],
+            "largest_folders": [
+                {"path": path, "size": size} for path, size in self.largest_folders(count)
+            ],
+        }
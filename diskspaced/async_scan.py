@@ -0,0 +1,158 @@
+"""Scan a folder tree from asyncio without blocking the event loop."""
+
+import asyncio
+from concurrent.futures import Executor
+from typing import AsyncGenerator
+
+from diskspaced.events import ScanEvent
+from diskspaced.scan_filter import ScanFilter
+from diskspaced.scan_stats import ScanStats
+from diskspaced.scanner import LIST_FOLDER, Listing, list_folder, stat_root, walk_steps
+
+
+def _list_folder_job(
+    folder_path: str, process_in_order: bool, scan_filter: ScanFilter | None
+) -> tuple[Listing, ScanStats]:
+    # Each job counts into its own stats so that the shared ones are only touched by the loop
+    stats = ScanStats()
+    listing = list_folder(folder_path, process_in_order, stats, scan_filter)
+    return listing, stats
+
+
+class AsyncFolderLister:
+    """Lists folders ahead of the walk on an executor, for a walk running on an event loop.
+
+    This works the same way as `ThreadedFolderLister`: whenever the walk takes a listing, the
+    sub-folders in it are queued, and queued folders are listed while there are fewer than
+    `lookahead` listings in flight or waiting to be taken. A semaphore caps how many folders
+    are being listed at once, so that scans sharing an executor each get a share of it.
+    """
+
+    loop: asyncio.AbstractEventLoop
+    executor: Executor | None
+    process_in_order: bool
+    stats: ScanStats
+    scan_filter: ScanFilter | None
+    lookahead: int
+    semaphore: asyncio.Semaphore
+    tasks: dict[str, asyncio.Task]
+    pending: list[str]
+
+    def __init__(
+        self,
+        process_in_order: bool,
+        stats: ScanStats,
+        max_in_flight: int,
+        lookahead: int,
+        executor: Executor | None = None,
+        scan_filter: ScanFilter | None = None,
+    ) -> None:
+        """Create the lister, which must be on the thread running the event loop.
+
+        :param process_in_order: Whether to process the contents of each folder by name
+        :param stats: The statistics to update
+        :param max_in_flight: The most folders to be listing at once
+        :param lookahead: The most folders to list ahead of the walk
+        :param executor: The executor to list folders on, or None for the loop's default one
+        :param scan_filter: The rules for which entries to skip, if any
+        """
+
+        if max_in_flight < 1:
+            raise ValueError(f"The most folders in flight must be at least 1: {max_in_flight}")
+
+        if lookahead < 1:
+            raise ValueError(f"The lookahead must be at least 1: {lookahead}")
+
+        self.loop = asyncio.get_running_loop()
+        self.executor = executor
+        self.process_in_order = process_in_order
+        self.stats = stats
+        self.scan_filter = scan_filter
+        self.lookahead = lookahead
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+        self.tasks = {}
+
+        # Folders waiting to be listed, with the next one the walk will want at the end
+        self.pending = []
+
+    async def _list(self, folder_path: str) -> tuple[Listing, ScanStats]:
+        async with self.semaphore:
+            return await self.loop.run_in_executor(
+                self.executor,
+                _list_folder_job,
+                folder_path,
+                self.process_in_order,
+                self.scan_filter,
+            )
+
+    async def list_folder(self, folder_path: str) -> Listing:
+        """List a folder the walk has just entered.
+
+        :param folder_path: The path of the folder to list
+
+        :returns: The sub-folders and the files in the folder
+        """
+
+        task = self.tasks.pop(folder_path, None)
+
+        if task is None:
+            # The walk has caught up, which means this is the next folder queued
+            if self.pending and self.pending[-1] == folder_path:
+                self.pending.pop()
+
+            listing, stats = await self._list(folder_path)
+        else:
+            listing, stats = await task
+
+        self.stats.merge(stats)
+
+        folders, _ = listing
+        self.pending.extend(folder[1] for folder in reversed(folders))
+
+        while self.pending and len(self.tasks) < self.lookahead:
+            pending_path = self.pending.pop()
+            self.tasks[pending_path] = self.loop.create_task(self._list(pending_path))
+
+        return listing
+
+    def close(self) -> None:
+        """Cancel the listings which haven't been taken.
+
+        Listings already running on the executor finish there, but their results are dropped.
+        """
+
+        self.pending.clear()
+
+        for task in self.tasks.values():
+            task.cancel()
+
+        self.tasks.clear()
+
+
+async def walk_tree_async(
+    folder_path: str, lister: AsyncFolderLister
+) -> AsyncGenerator[ScanEvent, None]:
+    """Walk the folder tree, yielding an event for each folder and each batch of files in it.
+
+    The events are the same as those from `walk_tree`, in the same order.
+
+    :param folder_path: The path of the folder to walk
+    :param lister: The lister to get the contents of each folder from
+
+    :returns: An asynchronous iterator over the events
+    """
+
+    root = await lister.loop.run_in_executor(lister.executor, stat_root, folder_path, lister.stats)
+
+    if root is None:
+        return
+
+    steps = walk_steps(root, lister.stats)
+    event = next(steps, None)
+
+    while event is not None:
+        if event[0] == LIST_FOLDER:
+            event = steps.send(await lister.list_folder(event[1]))
+        else:
+            yield event
+            event = next(steps, None)
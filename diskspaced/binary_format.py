@@ -0,0 +1,134 @@
+"""The layout of the binary scan format, shared by its writer and reader.
+
+A binary scan starts with a header:
+
+* The magic bytes and a format version, as `<4sH`
+* The root path, as a varint length followed by that many UTF-8 bytes
+* The volume size, used space, free space and block size, as `<qqqq`
+
+This is followed by blocks of entries, each of which starts with `<BII`: the block type, the
+number of entries in it and the length of the rest of the block in bytes. An end block, with no
+entries and an empty body, finishes the scan. The body of an entries block is a set of columns:
+
+* A flags byte. If `FLAG_RESET_STRINGS` is set, the string table is emptied before this block.
+* The strings this block adds to the string table, as a varint count followed by each string
+  as a varint length and its UTF-8 bytes. Strings are numbered in the order they are added.
+* The kind of each entry, one byte each
+* How far back the parent of each entry is, as varints. Folders are numbered from 1 in the order
+  they appear, with 0 standing for whatever the scan is in. Each value is the number of folders
+  seen before the entry minus the id of its parent.
+* The string id of each entry's name, as varints
+* The size of each file, as varints. Folders have no size.
+* The accessed, modified and created times, each as a column starting with `<qB`: the smallest
+  time in the block and the width in bytes of each value. That is followed by a fixed width,
+  little endian array with each entry's time minus the smallest one.
+
+Entries are written in the order the scan writes them, so a folder's files come after its
+sub-folders, and folder ends are implied by the parent of the following entry changing.
+
+A fragment, written for a scan split across processes, has the blocks without the header.
+"""
+
+from array import array
+import sys
+
+MAGIC = b"DSPC"
+VERSION = 1
+
+HEADER_FORMAT = "<4sH"
+USAGE_FORMAT = "<qqqq"
+BLOCK_HEADER_FORMAT = "<BII"
+TIME_COLUMN_FORMAT = "<qB"
+
+BLOCK_END = 0
+BLOCK_ENTRIES = 1
+
+KIND_FILE = 0
+KIND_FOLDER = 1
+
+FLAG_RESET_STRINGS = 1
+
+ENTRIES_PER_BLOCK = 4096
+"""The most entries in a block, which bounds the memory used for a block by the writer and reader."""
+
+MAX_STRINGS = 65_536
+"""The string table is emptied once it has this many strings, to bound the memory it uses."""
+
+NAME_ENCODING = "utf-8"
+NAME_ERRORS = "surrogateescape"
+
+# The array type codes for unsigned values by width in bytes
+UNSIGNED_TYPECODES = {array(typecode).itemsize: typecode for typecode in "BHIQ"}
+
+BIG_ENDIAN = sys.byteorder == "big"
+
+
+def encode_varints(output: bytearray, values: list[int]) -> None:
+    """Add unsigned values to the output as LEB128 varints.
+
+    :param output: The buffer to add the values to
+    :param values: The values to add
+    """
+
+    append = output.append
+
+    for value in values:
+        while value >= 0x80:
+            append((value & 0x7F) | 0x80)
+            value >>= 7
+
+        append(value)
+
+
+def decode_varints(data, offset: int, count: int) -> tuple[list[int], int]:
+    """Read unsigned LEB128 varints.
+
+    :param data: The buffer to read from, such as an `mmap`
+    :param offset: Where to start reading
+    :param count: How many values to read
+
+    :returns: The values and the offset after them
+    """
+
+    values: list[int] = []
+    append = values.append
+
+    for _ in range(count):
+        value = data[offset]
+        offset += 1
+
+        if value >= 0x80:
+            value &= 0x7F
+            shift = 7
+
+            while True:
+                byte = data[offset]
+                offset += 1
+                value |= (byte & 0x7F) << shift
+
+                if byte < 0x80:
+                    break
+
+                shift += 7
+
+        append(value)
+
+    return values, offset
+
+
+def time_column_width(smallest: int, largest: int) -> int:
+    """Get the narrowest width which holds every time in a column.
+
+    :param smallest: The smallest time in the column
+    :param largest: The largest time in the column
+
+    :returns: The width in bytes
+    """
+
+    span = largest - smallest
+
+    for width in (1, 2, 4):
+        if span < 1 << (8 * width):
+            return width
+
+    return 8
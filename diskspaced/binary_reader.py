@@ -0,0 +1,276 @@
+"""Read scans written in the binary format."""
+
+from array import array
+import mmap
+import os
+import struct
+from typing import Iterator
+
+from diskspaced import binary_format
+from diskspaced.events import FILES, FOLDER_END_EVENT, FOLDER_START, ScanEvent
+from diskspaced.writer import FileEntry, Writer
+
+# An entry is read as (folder_id, parent_id, name, size, accessed_time, modified_time,
+# created_time). Files have a folder id of 0, and folders a size of 0.
+BinaryEntry = tuple[int, int, str, int, int, int, int]
+
+
+class BinaryReader:
+    """Reads a scan written by `BinaryWriter`.
+
+    The file is memory mapped and read a block at a time, so only the block being read and the
+    string table are ever held in memory, however big the scan is.
+    """
+
+    input_path: str
+    fragment: bool
+    root_path: str
+    disk_usage_total: int
+    disk_usage_used: int
+    disk_usage_free: int
+    block_size: int
+    data: mmap.mmap | bytes
+    entries_offset: int
+
+    def __init__(self, input_path: str, fragment: bool = False) -> None:
+        """Open a binary scan.
+
+        :param input_path: The path of the scan to read
+        :param fragment: Whether the file is a fragment of a scan, which has no header
+        """
+
+        self.input_path = input_path
+        self.fragment = fragment
+        self.root_path = ""
+        self.disk_usage_total = 0
+        self.disk_usage_used = 0
+        self.disk_usage_free = 0
+        self.block_size = 0
+
+        with open(input_path, "rb") as f:
+            try:
+                self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files can't be mapped
+                self.data = b""
+
+        try:
+            self.entries_offset = 0 if fragment else self._read_header()
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def close(self) -> None:
+        """Unmap the file."""
+
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+    def _read_header(self) -> int:
+        header_size = struct.calcsize(binary_format.HEADER_FORMAT)
+
+        if len(self.data) < header_size:
+            raise ValueError(f"Not a binary scan: {self.input_path}")
+
+        magic, version = struct.unpack_from(binary_format.HEADER_FORMAT, self.data, 0)
+
+        if magic != binary_format.MAGIC:
+            raise ValueError(f"Not a binary scan: {self.input_path}")
+
+        if version != binary_format.VERSION:
+            raise ValueError(f"Unsupported binary scan version {version}: {self.input_path}")
+
+        (root_path_length,), offset = binary_format.decode_varints(self.data, header_size, 1)
+        self.root_path = self.data[offset : offset + root_path_length].decode(
+            binary_format.NAME_ENCODING, binary_format.NAME_ERRORS
+        )
+        offset += root_path_length
+
+        (
+            self.disk_usage_total,
+            self.disk_usage_used,
+            self.disk_usage_free,
+            self.block_size,
+        ) = struct.unpack_from(binary_format.USAGE_FORMAT, self.data, offset)
+
+        return offset + struct.calcsize(binary_format.USAGE_FORMAT)
+
+    def entries(self) -> Iterator[BinaryEntry]:
+        """Read the entries in the scan, in the order they were written.
+
+        :returns: An iterator over the entries
+        """
+
+        data = self.data
+        offset = self.entries_offset
+        block_header_size = struct.calcsize(binary_format.BLOCK_HEADER_FORMAT)
+        time_column_size = struct.calcsize(binary_format.TIME_COLUMN_FORMAT)
+        strings: list[str] = []
+        folder_count = 0
+
+        while True:
+            if offset + block_header_size > len(data):
+                raise ValueError(f"The binary scan is truncated: {self.input_path}")
+
+            block_type, count, length = struct.unpack_from(
+                binary_format.BLOCK_HEADER_FORMAT, data, offset
+            )
+            offset += block_header_size
+
+            if block_type == binary_format.BLOCK_END:
+                return
+
+            if block_type != binary_format.BLOCK_ENTRIES or offset + length > len(data):
+                raise ValueError(f"The binary scan is corrupt: {self.input_path}")
+
+            block_end = offset + length
+
+            if data[offset] & binary_format.FLAG_RESET_STRINGS:
+                strings = []
+
+            (string_count,), offset = binary_format.decode_varints(data, offset + 1, 1)
+
+            for _ in range(string_count):
+                (string_length,), offset = binary_format.decode_varints(data, offset, 1)
+                strings.append(
+                    data[offset : offset + string_length].decode(
+                        binary_format.NAME_ENCODING, binary_format.NAME_ERRORS
+                    )
+                )
+                offset += string_length
+
+            kinds = data[offset : offset + count]
+            offset += count
+
+            parents, offset = binary_format.decode_varints(data, offset, count)
+            names, offset = binary_format.decode_varints(data, offset, count)
+            sizes, offset = binary_format.decode_varints(
+                data, offset, count - sum(kinds)  # Folders have a kind of 1
+            )
+
+            times = []
+
+            for _ in range(3):
+                smallest, width = struct.unpack_from(binary_format.TIME_COLUMN_FORMAT, data, offset)
+                offset += time_column_size
+
+                column = array(binary_format.UNSIGNED_TYPECODES[width])
+                column.frombytes(data[offset : offset + count * width])
+                offset += count * width
+
+                if binary_format.BIG_ENDIAN:
+                    column.byteswap()
+
+                times.append([smallest + value for value in column])
+
+            if offset != block_end:
+                raise ValueError(f"The binary scan is corrupt: {self.input_path}")
+
+            file_index = 0
+
+            for kind, parent, name, accessed_time, modified_time, created_time in zip(
+                kinds, parents, names, times[0], times[1], times[2]
+            ):
+                if kind == binary_format.KIND_FOLDER:
+                    yield (
+                        folder_count + 1,
+                        folder_count - parent,
+                        strings[name],
+                        0,
+                        accessed_time,
+                        modified_time,
+                        created_time,
+                    )
+                    folder_count += 1
+                else:
+                    yield (
+                        0,
+                        folder_count - parent,
+                        strings[name],
+                        sizes[file_index],
+                        accessed_time,
+                        modified_time,
+                        created_time,
+                    )
+                    file_index += 1
+
+    def replay(self, writer: Writer) -> None:
+        """Write the scan out again with another writer, such as to convert it to JSON.
+
+        :param writer: The writer to write the scan with, which mustn't have been started
+        """
+
+        if self.fragment:
+            raise ValueError("A fragment has no header, so it can only have its entries replayed")
+
+        writer.write_start(
+            self.root_path,
+            self.disk_usage_total,
+            self.disk_usage_used,
+            self.disk_usage_free,
+            self.block_size,
+        )
+        self.replay_entries(writer)
+        writer.write_end()
+
+    def replay_entries(self, writer: Writer) -> None:
+        """Write the entries in the scan to a writer, without a header or footer.
+
+        :param writer: The writer to write the entries to
+        """
+
+        writer.write_events(self.events())
+
+    def events(self) -> Iterator[ScanEvent]:
+        """Read the entries in the scan as the same events a scan gives as it goes.
+
+        The root folder has the root path of the scan as its path.
+
+        :returns: An iterator over the events
+        """
+
+        # The ids and paths of the open folders
+        open_folders = [0]
+        paths: list[str] = []
+        files: list[FileEntry] = []
+
+        for (
+            folder_id,
+            parent_id,
+            name,
+            size,
+            accessed_time,
+            modified_time,
+            created_time,
+        ) in self.entries():
+            if files and (folder_id or parent_id != open_folders[-1]):
+                yield (FILES, files)
+                files = []
+
+            while parent_id != open_folders[-1]:
+                if len(open_folders) == 1:
+                    raise ValueError(f"The binary scan is corrupt: {self.input_path}")
+
+                open_folders.pop()
+                paths.pop()
+                yield FOLDER_END_EVENT
+
+            if folder_id:
+                path = os.path.join(paths[-1], name) if paths else self.root_path
+                yield (FOLDER_START, name, path, accessed_time, modified_time, created_time)
+                open_folders.append(folder_id)
+                paths.append(path)
+            else:
+                files.append((name, size, accessed_time, modified_time, created_time))
+
+        if files:
+            yield (FILES, files)
+
+        for _ in range(len(open_folders) - 1):
+            yield FOLDER_END_EVENT
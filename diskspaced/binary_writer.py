@@ -0,0 +1,260 @@
+"""A CLI tool for checking disk space."""
+
+from array import array
+import struct
+
+from diskspaced import binary_format, writer
+from diskspaced.binary_reader import BinaryReader
+from diskspaced.output import Compression
+
+
+class BinaryWriter(writer.Writer):
+    """Write out results in the compact binary format described in `binary_format`.
+
+    Entries are gathered into blocks, which are written out a column at a time. Names are
+    replaced with ids in a string table, so names which repeat across the tree are only
+    written once, sizes are varints and times are stored relative to the smallest one in the
+    block, using the fewest bytes which hold them all.
+    """
+
+    strings: dict[str, int]
+    reset_strings: bool
+    open_folders: list[int]
+    folder_count: int
+    new_strings: list[str]
+    kinds: bytearray
+    parents: list[int]
+    names: list[int]
+    sizes: list[int]
+    accessed_times: list[int]
+    modified_times: list[int]
+    created_times: list[int]
+
+    def __init__(
+        self,
+        output_path: str,
+        file_print_count: int,
+        pretty: bool = False,
+        compression: Compression | None = None,
+    ) -> None:
+        super().__init__(output_path, file_print_count, pretty, compression)
+
+        # The reader maps the scan into memory, so it has to be written as it is
+        if compression is not None:
+            raise ValueError("A binary scan can't be compressed")
+
+        self._reset()
+
+    def _reset(self) -> None:
+        self.strings = {}
+        self.reset_strings = False
+
+        # The ids of the folders currently open, starting with whatever the output is in
+        self.open_folders = [0]
+        self.folder_count = 0
+
+        self._clear_block()
+
+    def _clear_block(self) -> None:
+        self.new_strings = []
+        self.kinds = bytearray()
+        self.parents = []
+        self.names = []
+        self.sizes = []
+        self.accessed_times = []
+        self.modified_times = []
+        self.created_times = []
+
+    def write_start(
+        self,
+        root_path: str,
+        disk_usage_total: int,
+        disk_usage_used: int,
+        disk_usage_free: int,
+        block_size: int,
+    ) -> None:
+        """Write the start of the output file."""
+
+        super().write_start(
+            root_path, disk_usage_total, disk_usage_used, disk_usage_free, block_size
+        )
+
+        self._reset()
+
+        header = bytearray(
+            struct.pack(binary_format.HEADER_FORMAT, binary_format.MAGIC, binary_format.VERSION)
+        )
+        encoded_root_path = root_path.encode(binary_format.NAME_ENCODING, binary_format.NAME_ERRORS)
+        binary_format.encode_varints(header, [len(encoded_root_path)])
+        header += encoded_root_path
+        header += struct.pack(
+            binary_format.USAGE_FORMAT,
+            disk_usage_total,
+            disk_usage_used,
+            disk_usage_free,
+            block_size,
+        )
+
+        self.file.write(header)
+
+        if self.flush_after_writes:
+            self.file.flush()
+
+    def write_end(self) -> None:
+        """Write the end of the output file."""
+
+        super().write_end()
+        self._write_end_block()
+        self.close_output()
+
+    def write_fragment_start(self, parent_path: str, depth: int, block_size: int) -> None:
+        """Start writing a fragment of the output, to be added to it later with `append_fragment`."""
+
+        super().write_fragment_start(parent_path, depth, block_size)
+        self._reset()
+
+    def write_fragment_end(self) -> None:
+        """Finish writing a fragment of the output."""
+
+        self._write_end_block()
+        super().write_fragment_end()
+
+    def append_fragment(self, fragment_path: str) -> None:
+        """Add a fragment written by another writer to the output.
+
+        Fragments number their folders and strings from scratch, so they can't be copied in as
+        they are. Instead the fragment is read back and its entries written again.
+
+        :param fragment_path: The path of the fragment to add
+        """
+
+        with BinaryReader(fragment_path, fragment=True) as reader:
+            reader.replay_entries(self)
+
+    def write_folder_start(
+        self, folder_name: str, accessed_time: int, modified_time: int, created_time: int
+    ) -> None:
+        """Write the start of a folder entry."""
+
+        super().write_folder_start(folder_name, accessed_time, modified_time, created_time)
+
+        self.kinds.append(binary_format.KIND_FOLDER)
+        self.parents.append(self.folder_count - self.open_folders[-1])
+        self.names.append(self._string_id(folder_name))
+        self.accessed_times.append(accessed_time)
+        self.modified_times.append(modified_time)
+        self.created_times.append(created_time)
+
+        self.folder_count += 1
+        self.open_folders.append(self.folder_count)
+
+        if len(self.kinds) >= binary_format.ENTRIES_PER_BLOCK:
+            self._write_block()
+
+    def write_folder_end(self) -> None:
+        """Write the end of a folder entry."""
+
+        # The end of a folder isn't written, as it is implied by the entries which follow
+        self.open_folders.pop()
+
+        super().write_folder_end()
+
+    def write_file(
+        self, file_name: str, size: int, accessed_time: int, modified_time: int, created_time: int
+    ) -> None:
+        """Write the start of a file entry."""
+        self.write_files([(file_name, size, accessed_time, modified_time, created_time)])
+
+    def write_files(self, files: list[writer.FileEntry]) -> None:
+        """Write the entries for a batch of files in the current folder."""
+
+        self.count_files(files)
+
+        parent = self.folder_count - self.open_folders[-1]
+        string_id = self._string_id
+        start = 0
+
+        while start < len(files):
+            batch = files[start : start + binary_format.ENTRIES_PER_BLOCK - len(self.kinds)]
+            start += len(batch)
+
+            self.kinds.extend(bytes(len(batch)))
+            self.parents.extend([parent] * len(batch))
+
+            for file_name, size, accessed_time, modified_time, created_time in batch:
+                self.names.append(string_id(file_name))
+                self.sizes.append(size)
+                self.accessed_times.append(accessed_time)
+                self.modified_times.append(modified_time)
+                self.created_times.append(created_time)
+
+            if len(self.kinds) >= binary_format.ENTRIES_PER_BLOCK:
+                self._write_block()
+
+    def _string_id(self, value: str) -> int:
+        string_id = self.strings.get(value)
+
+        if string_id is None:
+            string_id = len(self.strings)
+            self.strings[value] = string_id
+            self.new_strings.append(value)
+
+        return string_id
+
+    def _write_block(self) -> None:
+        if not self.kinds:
+            return
+
+        body = bytearray([binary_format.FLAG_RESET_STRINGS if self.reset_strings else 0])
+
+        binary_format.encode_varints(body, [len(self.new_strings)])
+
+        for value in self.new_strings:
+            encoded = value.encode(binary_format.NAME_ENCODING, binary_format.NAME_ERRORS)
+            binary_format.encode_varints(body, [len(encoded)])
+            body += encoded
+
+        body += self.kinds
+        binary_format.encode_varints(body, self.parents)
+        binary_format.encode_varints(body, self.names)
+        binary_format.encode_varints(body, self.sizes)
+
+        for times in [self.accessed_times, self.modified_times, self.created_times]:
+            smallest = min(times)
+            width = binary_format.time_column_width(smallest, max(times))
+            column = array(
+                binary_format.UNSIGNED_TYPECODES[width], [time - smallest for time in times]
+            )
+
+            if binary_format.BIG_ENDIAN:
+                column.byteswap()
+
+            body += struct.pack(binary_format.TIME_COLUMN_FORMAT, smallest, width)
+            body += column.tobytes()
+
+        self.file.write(
+            struct.pack(
+                binary_format.BLOCK_HEADER_FORMAT,
+                binary_format.BLOCK_ENTRIES,
+                len(self.kinds),
+                len(body),
+            )
+        )
+        self.file.write(body)
+
+        if self.flush_after_writes:
+            self.file.flush()
+
+        self._clear_block()
+
+        # The table is only emptied between blocks, so it can go a block's worth over the limit
+        self.reset_strings = len(self.strings) >= binary_format.MAX_STRINGS
+
+        if self.reset_strings:
+            self.strings = {}
+
+    def _write_end_block(self) -> None:
+        self._write_block()
+        self.file.write(
+            struct.pack(binary_format.BLOCK_HEADER_FORMAT, binary_format.BLOCK_END, 0, 0)
+        )
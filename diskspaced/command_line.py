@@ -3,9 +3,12 @@
 """Command line handler for diskspaced."""
 
 import argparse
+import json
 import logging
 import os
+import signal
 import sys
+import time
 
 try:
     import diskspaced
@@ -15,10 +18,8 @@ except ImportError:
     import diskspaced
 
 
-def _handle_arguments() -> int:
-    """Handle command line arguments and call the correct method."""
-
-    parser = argparse.ArgumentParser()
+def _add_output_arguments(parser: argparse.ArgumentParser, format_required: bool = True) -> None:
+    """Add the arguments for what to scan and where to write it to a parser."""
 
     parser.add_argument(
         "--folder-path",
@@ -33,7 +34,17 @@ def _handle_arguments() -> int:
         dest="output_path",
         action="store",
         required=True,
-        help="Set the output path for the results to be written to",
+        help="Set the output path for the results to be written to, or - to write them to stdout",
+    )
+
+    parser.add_argument(
+        "--compression",
+        dest="compression",
+        action="store",
+        choices=[item.value for item in diskspaced.Compression],
+        default=None,
+        required=False,
+        help="Compress the output. Defaults to the compression implied by the output path's extension (.gz or .zst), if any.",
     )
 
     parser.add_argument(
@@ -41,7 +52,7 @@ def _handle_arguments() -> int:
         dest="format",
         action="store",
         choices=[item.value for item in diskspaced.OutputFormat],
-        required=True,
+        required=format_required,
         help="Set the output path for the results to be written to",
     )
 
@@ -54,6 +65,117 @@ def _handle_arguments() -> int:
         help="Set this to pretty print the output (if supported by the format)",
     )
 
+    parser.add_argument(
+        "--alphabetical",
+        dest="alphabetical",
+        action="store_true",
+        default=False,
+        required=False,
+        help="Set this to process the files in alphabetical order",
+    )
+
+
+def _get_compression(args: argparse.Namespace) -> "diskspaced.Compression | None":
+    """Get the compression to write the output with."""
+
+    if args.compression is None:
+        return diskspaced.Compression.from_path(args.output_path)
+
+    return diskspaced.Compression(args.compression)
+
+
+def _write_profile(profiler: "diskspaced.ScanProfiler", output_path: str) -> None:
+    """Write the report from a profiled scan next to its output."""
+
+    if output_path == diskspaced.STDOUT_PATH:
+        sys.stderr.write(profiler.report())
+        return
+
+    report_path = output_path + ".profile.txt"
+    profiler.write_report(report_path)
+    logging.info(f"Wrote the profile to {report_path}")
+
+
+def _check_format_arguments(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    """Check the options which only apply to some formats, filling in the format if implied."""
+
+    if args.estimate:
+        if args.format is not None or args.top_count is not None:
+            parser.error("--estimate writes a report of its own, so can't use --format or --top")
+
+        if args.workers != 1 or args.processes != 1 or args.index_path is not None:
+            parser.error("--estimate can't be used with --workers, --processes or --index")
+
+        if args.progress or args.metrics_path is not None or args.status_path is not None:
+            parser.error("--estimate can't be used with progress reporting")
+
+        if args.profile is not None:
+            parser.error("--estimate can't be used with --profile")
+
+        return
+
+    if args.format is None:
+        if args.top_count is None:
+            parser.error("the following arguments are required: --format")
+
+        args.format = diskspaced.OutputFormat.TOP.value
+    elif args.top_count is not None and args.format != diskspaced.OutputFormat.TOP.value:
+        parser.error("--top can only be used with --format top")
+
+    if args.format != diskspaced.OutputFormat.NDJSON.value:
+        if args.records_per_file or args.flush_interval:
+            parser.error("--records-per-file and --flush-interval need --format ndjson")
+
+
+def _handle_arguments() -> int:
+    """Handle command line arguments and call the correct method."""
+
+    if sys.argv[1:2] == ["watch"]:
+        return _handle_watch_arguments(sys.argv[2:])
+
+    if sys.argv[1:2] == ["convert"]:
+        return _handle_convert_arguments(sys.argv[2:])
+
+    if sys.argv[1:2] == ["diff"]:
+        return _handle_diff_arguments(sys.argv[2:])
+
+    if sys.argv[1:2] == ["report"]:
+        return _handle_report_arguments(sys.argv[2:])
+
+    parser = argparse.ArgumentParser()
+
+    _add_output_arguments(parser, format_required=False)
+
+    parser.add_argument(
+        "--top",
+        dest="top_count",
+        action="store",
+        default=None,
+        type=int,
+        required=False,
+        help="Only report the N largest files and folders. Implies --format top, which reports the largest 100 by default.",
+    )
+
+    parser.add_argument(
+        "--records-per-file",
+        dest="records_per_file",
+        action="store",
+        default=0,
+        type=int,
+        required=False,
+        help="With --format ndjson, split the output into numbered files of at most N records each. Defaults to 0, which writes a single file.",
+    )
+
+    parser.add_argument(
+        "--flush-interval",
+        dest="flush_interval",
+        action="store",
+        default=0,
+        type=float,
+        required=False,
+        help="With --format ndjson, flush the output at least every N seconds. Defaults to 0, which only flushes when needed.",
+    )
+
     parser.add_argument(
         "--print-after-n-files",
         dest="print_after_n_files",
@@ -65,19 +187,206 @@ def _handle_arguments() -> int:
     )
 
     parser.add_argument(
-        "--alphabetical",
-        dest="alphabetical",
+        "--workers",
+        dest="workers",
+        action="store",
+        default=1,
+        type=int,
+        required=False,
+        help="Set this to list folders on N threads at once. Defaults to 1.",
+    )
+
+    parser.add_argument(
+        "--lookahead",
+        dest="lookahead",
+        action="store",
+        default=256,
+        type=int,
+        required=False,
+        help="The most folders to list ahead of the output when using several workers. Defaults to 256.",
+    )
+
+    parser.add_argument(
+        "--processes",
+        dest="processes",
+        action="store",
+        default=1,
+        type=int,
+        required=False,
+        help="Set this to split the tree up and scan it on N processes at once. Defaults to 1.",
+    )
+
+    parser.add_argument(
+        "--index",
+        dest="index_path",
+        action="store",
+        default=None,
+        required=False,
+        help="Keep an index of folder listings at this path, and only list the folders which have changed since the last scan with the same index.",
+    )
+
+    parser.add_argument(
+        "--exclude",
+        dest="exclude_globs",
+        action="append",
+        default=[],
+        required=False,
+        help="Skip entries matching this glob. Globs without a / match names, and globs with one match paths. Can be given several times.",
+    )
+
+    parser.add_argument(
+        "--exclude-regex",
+        dest="exclude_regexes",
+        action="append",
+        default=[],
+        required=False,
+        help="Skip entries whose paths contain a match for this regular expression. Can be given several times.",
+    )
+
+    parser.add_argument(
+        "--one-file-system",
+        dest="one_file_system",
         action="store_true",
         default=False,
         required=False,
-        help="Set this to process the files in alphabetical order",
+        help="Skip folders which are on a different file system to the folder being scanned.",
+    )
+
+    parser.add_argument(
+        "--progress",
+        dest="progress",
+        action="store_true",
+        default=False,
+        required=False,
+        help="Report the progress of the scan to stderr every --report-interval seconds, with the files and folders per second and an estimate of the time left.",
+    )
+
+    parser.add_argument(
+        "--metrics-file",
+        dest="metrics_path",
+        action="store",
+        default=None,
+        required=False,
+        help="Write the progress of the scan to this path every --report-interval seconds, as a Prometheus textfile.",
+    )
+
+    parser.add_argument(
+        "--status-file",
+        dest="status_path",
+        action="store",
+        default=None,
+        required=False,
+        help="Write the progress of the scan to this path every --report-interval seconds, as JSON.",
+    )
+
+    parser.add_argument(
+        "--report-interval",
+        dest="report_interval",
+        action="store",
+        default=10.0,
+        type=float,
+        required=False,
+        help="How many seconds to wait between reports of the progress of the scan. Defaults to 10.",
+    )
+
+    parser.add_argument(
+        "--profile",
+        dest="profile",
+        action="store",
+        nargs="?",
+        const="phases",
+        default=None,
+        choices=["phases", "cprofile", "tracemalloc"],
+        required=False,
+        help="Time listing folders, encoding and writing the output, and write a report to the output path with .profile.txt added. cprofile or tracemalloc also profile calls or memory.",
+    )
+
+    parser.add_argument(
+        "--estimate",
+        dest="estimate",
+        action="store_true",
+        default=False,
+        required=False,
+        help="Only walk a random sample of the sub-folders of each folder, and write a JSON report of the estimated size and counts of each top level folder, with confidence intervals.",
+    )
+
+    parser.add_argument(
+        "--sample-size",
+        dest="sample_size",
+        action="store",
+        default=8,
+        type=int,
+        required=False,
+        help="With --estimate, the most sub-folders of each folder to walk. Defaults to 8.",
+    )
+
+    parser.add_argument(
+        "--confidence",
+        dest="confidence",
+        action="store",
+        default=0.95,
+        type=float,
+        required=False,
+        help="With --estimate, how likely the real totals are to be inside the intervals. Defaults to 0.95.",
+    )
+
+    parser.add_argument(
+        "--seed",
+        dest="seed",
+        action="store",
+        default=None,
+        type=int,
+        required=False,
+        help="With --estimate, the seed for picking sub-folders, to pick the same ones each time.",
     )
 
     args = parser.parse_args()
 
+    _check_format_arguments(parser, args)
+
+    try:
+        scan_filter = diskspaced.ScanFilter(
+            args.exclude_globs, args.exclude_regexes, args.one_file_system
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    reporter = None
+
+    if args.progress or args.metrics_path is not None or args.status_path is not None:
+        if args.report_interval <= 0:
+            parser.error("--report-interval must be more than 0")
+
+        reporter = diskspaced.ScanReporter(
+            args.report_interval,
+            sys.stderr if args.progress else None,
+            args.metrics_path,
+            args.status_path,
+        )
+
+    profiler = None
+
+    if args.profile is not None:
+        profiler = diskspaced.ScanProfiler(
+            args.profile == "cprofile", args.profile == "tracemalloc"
+        )
+
     logging.basicConfig(level=logging.INFO)
 
     try:
+        if args.estimate:
+            diskspaced.estimate(
+                args.folder_path,
+                args.output_path,
+                args.sample_size,
+                args.confidence,
+                args.seed,
+                args.pretty_print,
+                _get_compression(args),
+                scan_filter,
+            )
+            return 0
+
         diskspaced.scan(
             args.folder_path,
             args.output_path,
@@ -85,6 +394,210 @@ def _handle_arguments() -> int:
             args.print_after_n_files,
             args.alphabetical,
             args.pretty_print,
+            workers=args.workers,
+            lookahead=args.lookahead,
+            processes=args.processes,
+            compression=_get_compression(args),
+            index_path=args.index_path,
+            top_count=100 if args.top_count is None else args.top_count,
+            scan_filter=scan_filter,
+            reporter=reporter,
+            profiler=profiler,
+            records_per_file=args.records_per_file,
+            flush_interval=args.flush_interval,
+        )
+
+        if profiler is not None:
+            _write_profile(profiler, args.output_path)
+    except BrokenPipeError:
+        # Whatever was reading the output, such as `head`, has stopped reading it
+        logging.error("The output was closed before the scan finished")
+        return 1
+    # pylint: disable=broad-except
+    except Exception as e:
+        # pylint: enable=broad-except
+        logging.error(f"{e}", exc_info=True)
+        return 1
+
+    return 0
+
+
+def _handle_watch_arguments(arguments: list[str]) -> int:
+    """Handle the arguments for watching a folder, and watch it until stopped."""
+
+    parser = argparse.ArgumentParser(
+        prog="diskspaced watch",
+        description="Scan a folder once, then keep the results current by watching it for changes. "
+        + "The results are written once the scan is done, and again on SIGUSR1.",
+    )
+
+    _add_output_arguments(parser)
+
+    parser.add_argument(
+        "--snapshot-interval",
+        dest="snapshot_interval",
+        action="store",
+        default=0,
+        type=float,
+        required=False,
+        help="Also write the results every N seconds. Defaults to 0, which only writes them on SIGUSR1.",
+    )
+
+    parser.add_argument(
+        "--max-watches",
+        dest="max_watches",
+        action="store",
+        default=65536,
+        type=int,
+        required=False,
+        help="The most folders to watch. Each watch uses around 1KB of kernel memory. Defaults to 65536.",
+    )
+
+    parser.add_argument(
+        "--coalesce-delay",
+        dest="coalesce_delay",
+        action="store",
+        default=1.0,
+        type=float,
+        required=False,
+        help="How many seconds to gather changes for before applying them. Defaults to 1.",
+    )
+
+    args = parser.parse_args(arguments)
+
+    logging.basicConfig(level=logging.INFO)
+
+    output_format = diskspaced.OutputFormat(args.format)
+    compression = _get_compression(args)
+    snapshot_requested = False
+    stopping = False
+
+    def request_snapshot(*_) -> None:
+        nonlocal snapshot_requested
+        snapshot_requested = True
+
+    def stop(*_) -> None:
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGUSR1, request_snapshot)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    try:
+        with diskspaced.TreeWatcher(
+            args.folder_path, args.alphabetical, args.max_watches, args.coalesce_delay
+        ) as watcher:
+            watcher.start()
+            snapshot_requested = True
+            last_snapshot = time.monotonic()
+
+            while not stopping and not watcher.root_gone:
+                if args.snapshot_interval > 0:
+                    if time.monotonic() - last_snapshot >= args.snapshot_interval:
+                        snapshot_requested = True
+
+                if snapshot_requested:
+                    snapshot_requested = False
+                    last_snapshot = time.monotonic()
+                    try:
+                        diskspaced.write_snapshot(
+                            watcher, args.output_path, output_format, args.pretty_print, compression
+                        )
+                        logging.info(f"Wrote {args.output_path}")
+                    # pylint: disable=broad-except
+                    except Exception as e:
+                        # pylint: enable=broad-except
+                        # The next snapshot could well succeed, so the watch carries on
+                        logging.error(f"Failed to write {args.output_path}: {e}", exc_info=True)
+
+                # Signals don't interrupt the wait, so it is kept short to respond to them
+                watcher.process_events(0.5)
+    # pylint: disable=broad-except
+    except Exception as e:
+        # pylint: enable=broad-except
+        logging.error(f"{e}", exc_info=True)
+        return 1
+
+    return 0 if stopping else 1
+
+
+def _handle_convert_arguments(arguments: list[str]) -> int:
+    """Handle the arguments for converting a scan to another format, and convert it."""
+
+    parser = argparse.ArgumentParser(
+        prog="diskspaced convert",
+        description="Convert a scan to another format without scanning the folder again.",
+    )
+
+    parser.add_argument(
+        "--input-path",
+        dest="input_path",
+        action="store",
+        required=True,
+        help="The scan to convert, which can be compressed with gzip or zstd",
+    )
+
+    parser.add_argument(
+        "--input-format",
+        dest="input_format",
+        action="store",
+        choices=[
+            item.value for item in diskspaced.OutputFormat if item != diskspaced.OutputFormat.TOP
+        ],
+        default=None,
+        required=False,
+        help="The format of the scan. Defaults to the format found from the start of it.",
+    )
+
+    parser.add_argument(
+        "--output-path",
+        dest="output_path",
+        action="store",
+        required=True,
+        help="Set the output path for the results to be written to, or - to write them to stdout",
+    )
+
+    parser.add_argument(
+        "--compression",
+        dest="compression",
+        action="store",
+        choices=[item.value for item in diskspaced.Compression],
+        default=None,
+        required=False,
+        help="Compress the output. Defaults to the compression implied by the output path's extension (.gz or .zst), if any.",
+    )
+
+    parser.add_argument(
+        "--format",
+        dest="format",
+        action="store",
+        choices=[item.value for item in diskspaced.OutputFormat],
+        required=True,
+        help="The format to convert the scan to",
+    )
+
+    parser.add_argument(
+        "--pretty-print",
+        dest="pretty_print",
+        action="store_true",
+        default=False,
+        required=False,
+        help="Set this to pretty print the output (if supported by the format)",
+    )
+
+    args = parser.parse_args(arguments)
+
+    logging.basicConfig(level=logging.INFO)
+
+    try:
+        diskspaced.convert(
+            args.input_path,
+            args.output_path,
+            diskspaced.OutputFormat(args.format),
+            args.pretty_print,
+            _get_compression(args),
+            None if args.input_format is None else diskspaced.OutputFormat(args.input_format),
         )
     # pylint: disable=broad-except
     except Exception as e:
@@ -95,6 +608,162 @@ def _handle_arguments() -> int:
     return 0
 
 
+def _handle_diff_arguments(arguments: list[str]) -> int:
+    """Handle the arguments for comparing two scans, and compare them."""
+
+    parser = argparse.ArgumentParser(
+        prog="diskspaced diff",
+        description="Write what changed between two scans which were written with --alphabetical, "
+        + "as a line of JSON for each file and folder which was added, removed or resized.",
+    )
+
+    parser.add_argument(
+        "--old-path",
+        dest="old_path",
+        action="store",
+        required=True,
+        help="The older scan, in any format but top, which can be compressed with gzip or zstd",
+    )
+
+    parser.add_argument(
+        "--new-path",
+        dest="new_path",
+        action="store",
+        required=True,
+        help="The newer scan, in any format but top, which can be compressed with gzip or zstd",
+    )
+
+    parser.add_argument(
+        "--output-path",
+        dest="output_path",
+        action="store",
+        required=True,
+        help="Set the output path for the changes to be written to, or - to write them to stdout",
+    )
+
+    parser.add_argument(
+        "--compression",
+        dest="compression",
+        action="store",
+        choices=[item.value for item in diskspaced.Compression],
+        default=None,
+        required=False,
+        help="Compress the output. Defaults to the compression implied by the output path's extension (.gz or .zst), if any.",
+    )
+
+    parser.add_argument(
+        "--min-change",
+        dest="min_change",
+        action="store",
+        default=0,
+        type=int,
+        required=False,
+        help="Only write changes of at least this many bytes. Defaults to 0, which writes them all.",
+    )
+
+    args = parser.parse_args(arguments)
+
+    logging.basicConfig(level=logging.INFO)
+
+    try:
+        stats = diskspaced.diff(
+            args.old_path,
+            args.new_path,
+            args.output_path,
+            args.min_change,
+            _get_compression(args),
+        )
+    # pylint: disable=broad-except
+    except Exception as e:
+        # pylint: enable=broad-except
+        logging.error(f"{e}", exc_info=True)
+        return 1
+
+    logging.info(f"{stats}")
+
+    return 0
+
+
+def _handle_report_arguments(arguments: list[str]) -> int:
+    """Handle the arguments for reporting on a scan, and write the report."""
+
+    parser = argparse.ArgumentParser(
+        prog="diskspaced report",
+        description="Report on a scan: a histogram of file sizes, how much data hasn't been "
+        + "accessed for a while, and the extensions and folders with the most data, as JSON.",
+    )
+
+    parser.add_argument(
+        "--input-path",
+        dest="input_path",
+        action="store",
+        required=True,
+        help="The scan to report on, in any format but top, which can be compressed with gzip or zstd",
+    )
+
+    parser.add_argument(
+        "--input-format",
+        dest="input_format",
+        action="store",
+        choices=[
+            item.value for item in diskspaced.OutputFormat if item != diskspaced.OutputFormat.TOP
+        ],
+        default=None,
+        required=False,
+        help="The format of the scan. Defaults to the format found from the start of it.",
+    )
+
+    parser.add_argument(
+        "--output-path",
+        dest="output_path",
+        action="store",
+        default=diskspaced.STDOUT_PATH,
+        required=False,
+        help="Set the output path for the report to be written to. Defaults to - for stdout.",
+    )
+
+    parser.add_argument(
+        "--stale-days",
+        dest="stale_days",
+        action="store",
+        default=365,
+        type=float,
+        required=False,
+        help="Count files which haven't been accessed for this many days as stale. Defaults to 365.",
+    )
+
+    parser.add_argument(
+        "--count",
+        dest="count",
+        action="store",
+        default=20,
+        type=int,
+        required=False,
+        help="How many of the largest extensions and folders to report. Defaults to 20.",
+    )
+
+    args = parser.parse_args(arguments)
+
+    logging.basicConfig(level=logging.INFO)
+
+    try:
+        columns = diskspaced.analyze(
+            args.input_path,
+            None if args.input_format is None else diskspaced.OutputFormat(args.input_format),
+        )
+        report = columns.report(args.stale_days, args.count)
+
+        with diskspaced.output.open_output(args.output_path) as output:
+            output.write(json.dumps(report, indent=2).encode("utf-8") + b"\n")
+    # pylint: disable=broad-except
+    except Exception as e:
+        # pylint: enable=broad-except
+        logging.error(f"{e}", exc_info=True)
+        return 1
+
+    return 0
+
+
 def run() -> int:
     """Entry point for poetry generated command line tool."""
     return _handle_arguments()
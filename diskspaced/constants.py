@@ -7,5 +7,3 @@ ACCEPTABLE_OS_ERRORS = set(
         13,  # Permission denied
     ]
 )
-
-MAX_RECURSION_LIMIT = 10_000
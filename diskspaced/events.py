@@ -0,0 +1,22 @@
+"""The events a scan produces as it walks a folder tree."""
+
+from typing import Any
+
+# A file is written as (name, size, accessed_time, modified_time, created_time)
+FileEntry = tuple[str, int, int, int, int]
+
+# Each event is a plain tuple starting with its kind, as a tuple costs less to make than any
+# other kind of record, and the scan makes one per folder and one per batch of files:
+#
+#   (FOLDER_START, name, path, accessed_time, modified_time, created_time)
+#   (FILES, files), with every file in the folder which was just started or ended a sub-folder
+#   (FOLDER_END,)
+#
+# Sub-folders are started and ended before the files next to them.
+FOLDER_START = 0
+FILES = 1
+FOLDER_END = 2
+
+ScanEvent = tuple[Any, ...]
+
+FOLDER_END_EVENT: ScanEvent = (FOLDER_END,)
@@ -0,0 +1,181 @@
+"""Encode names and timestamps for GrandPerspective output, and decode them again."""
+
+import datetime
+import time
+
+SECONDS_PER_DAY = 86_400
+
+EPOCH = datetime.date(1970, 1, 1)
+
+TWO_DIGITS = [f"{value:02d}" for value in range(60)]
+
+
+class GrandPerspectiveEncoder:
+    """Encode names and timestamps for GrandPerspective output.
+
+    Formatting a timestamp through `datetime` costs a lot more than writing the rest of an entry,
+    and every entry has three of them. Instead, the local UTC offset is looked up once per UTC
+    day, the date is formatted once per local day, and the time of day is built from the seconds
+    into it. Days which have a daylight saving change in them fall back to `datetime`. Recently
+    formatted timestamps are also kept, as many files share them. Timestamps are parsed back the
+    same way, from the start of each local day.
+    """
+
+    DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+    cache_size: int
+    timestamps: dict[int, str]
+    offsets: dict[int, int | None]
+    dates: dict[int, str]
+    parsed: dict[str, int]
+    day_starts: dict[str, int | None]
+
+    def __init__(self, cache_size: int = 65_536) -> None:
+        self.cache_size = cache_size
+        self.timestamps = {}
+
+        # The local UTC offset by UTC day, or None if it changes during the day
+        self.offsets = {}
+
+        # The formatted date by local day
+        self.dates = {}
+
+        # The parsed timestamps by what they were formatted as
+        self.parsed = {}
+
+        # The timestamp of the start of each local day, or None if it has a daylight saving
+        # change in it
+        self.day_starts = {}
+
+    def format_time(self, timestamp: int) -> str:
+        """Format a timestamp as local time the way GrandPerspective expects.
+
+        The result is the same as `datetime.datetime.fromtimestamp(timestamp).strftime(...)`.
+
+        :param timestamp: The timestamp to format
+
+        :return: The formatted timestamp
+        """
+
+        formatted = self.timestamps.get(timestamp)
+
+        if formatted is not None:
+            return formatted
+
+        utc_day = timestamp // SECONDS_PER_DAY
+
+        try:
+            offset = self.offsets[utc_day]
+        except KeyError:
+            offset = self._get_offset(utc_day)
+
+        if offset is None:
+            formatted = datetime.datetime.fromtimestamp(timestamp).strftime(
+                GrandPerspectiveEncoder.DATE_FORMAT
+            )
+        else:
+            local_day, seconds = divmod(timestamp + offset, SECONDS_PER_DAY)
+
+            try:
+                date = self.dates[local_day]
+            except KeyError:
+                date = (EPOCH + datetime.timedelta(days=local_day)).strftime("%Y-%m-%dT")
+                self.dates[local_day] = date
+
+            minutes, seconds = divmod(seconds, 60)
+            hours, minutes = divmod(minutes, 60)
+
+            formatted = (
+                date
+                + TWO_DIGITS[hours]
+                + ":"
+                + TWO_DIGITS[minutes]
+                + ":"
+                + TWO_DIGITS[seconds]
+                + "Z"
+            )
+
+        if len(self.timestamps) >= self.cache_size:
+            self.timestamps.clear()
+
+        self.timestamps[timestamp] = formatted
+
+        return formatted
+
+    def parse_time(self, formatted: str) -> int:
+        """Parse a timestamp which was formatted with `format_time`.
+
+        Local times in the hour which repeats when the clocks go back can't be told apart, so
+        they may come out an hour out.
+
+        :param formatted: The formatted timestamp
+
+        :return: The timestamp
+        """
+
+        timestamp = self.parsed.get(formatted)
+
+        if timestamp is not None:
+            return timestamp
+
+        date = formatted[:10]
+
+        try:
+            day_start = self.day_starts[date]
+        except KeyError:
+            day_start = self._get_day_start(date)
+
+        if day_start is None or len(formatted) != 20:
+            timestamp = int(
+                time.mktime(time.strptime(formatted, GrandPerspectiveEncoder.DATE_FORMAT))
+            )
+        else:
+            timestamp = (
+                day_start
+                + int(formatted[11:13]) * 3600
+                + int(formatted[14:16]) * 60
+                + int(formatted[17:19])
+            )
+
+        if len(self.parsed) >= self.cache_size:
+            self.parsed.clear()
+
+        self.parsed[formatted] = timestamp
+
+        return timestamp
+
+    def _get_day_start(self, date: str) -> int | None:
+        year, month, day = (int(part) for part in date.split("-"))
+        start = time.mktime((year, month, day, 0, 0, 0, 0, 0, -1))
+        end = time.mktime((year, month, day + 1, 0, 0, 0, 0, 0, -1))
+
+        day_start = int(start) if end - start == SECONDS_PER_DAY else None
+        self.day_starts[date] = day_start
+
+        return day_start
+
+    def _get_offset(self, utc_day: int) -> int | None:
+        day_start = utc_day * SECONDS_PER_DAY
+        start_offset = time.localtime(day_start).tm_gmtoff
+        end_offset = time.localtime(day_start + SECONDS_PER_DAY - 1).tm_gmtoff
+
+        offset = start_offset if start_offset == end_offset else None
+        self.offsets[utc_day] = offset
+
+        return offset
+
+    @staticmethod
+    def escape(value: str) -> str:
+        """Make sure the value is safe to write as an attribute.
+
+        Most names don't need escaping, so they are returned as they are.
+
+        :param value: The value to make safe
+
+        :return: The safe value
+        """
+
+        if "&" in value or "<" in value or '"' in value:
+            return value.replace("&", "&amp;").replace("<", "&lt;").replace('"', "&quot;")
+
+        return value
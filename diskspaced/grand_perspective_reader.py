@@ -0,0 +1,222 @@
+"""Read scans written in the GrandPerspective format."""
+
+import os
+from typing import BinaryIO, Iterator
+import xml.sax
+import xml.sax.handler
+import xml.sax.xmlreader
+from xml.sax.xmlreader import AttributesImpl
+
+from diskspaced.events import FILES, FOLDER_END_EVENT, FOLDER_START, ScanEvent
+from diskspaced.grand_perspective_encoder import GrandPerspectiveEncoder
+from diskspaced.output import open_input
+from diskspaced.writer import FileEntry, Writer
+
+# The most files to hold before giving them as an event, so that huge folders don't use up memory
+FILE_BATCH_SIZE = 4096
+
+# How much is fed to the parser at once
+CHUNK_SIZE = 1024 * 1024
+
+
+class _EventHandler(xml.sax.handler.ContentHandler):
+    """Turns each element into scan events as it is parsed."""
+
+    encoder: GrandPerspectiveEncoder
+    events: list[ScanEvent]
+    files: list[FileEntry]
+    paths: list[str]
+    scan_info: dict[str, str] | None
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.encoder = GrandPerspectiveEncoder()
+        self.events = []
+        self.files = []
+
+        # The paths of the open folders
+        self.paths = []
+
+        self.scan_info = None
+
+    def startElement(self, name: str, attrs: AttributesImpl) -> None:
+        if name == "File":
+            parse_time = self.encoder.parse_time
+            self.files.append(
+                (
+                    attrs.get("name", ""),
+                    int(attrs.get("size", "0")),
+                    parse_time(attrs["accessed"]),
+                    parse_time(attrs["modified"]),
+                    parse_time(attrs["created"]),
+                )
+            )
+
+            if len(self.files) >= FILE_BATCH_SIZE:
+                self.take_files()
+        elif name == "Folder":
+            self.take_files()
+            folder_name = attrs.get("name", "")
+
+            if self.paths:
+                path = os.path.join(self.paths[-1], folder_name)
+            else:
+                path = self.root_path()
+
+            self.events.append(
+                (
+                    FOLDER_START,
+                    folder_name,
+                    path,
+                    self.encoder.parse_time(attrs["accessed"]),
+                    self.encoder.parse_time(attrs["modified"]),
+                    self.encoder.parse_time(attrs["created"]),
+                )
+            )
+            self.paths.append(path)
+        elif name == "ScanInfo":
+            self.scan_info = dict(attrs.items())
+
+    def endElement(self, name: str) -> None:
+        if name == "Folder":
+            self.take_files()
+            self.events.append(FOLDER_END_EVENT)
+            self.paths.pop()
+        elif name == "ScanInfo":
+            self.take_files()
+
+    def take_files(self) -> None:
+        """Add the files gathered so far as an event."""
+
+        if self.files:
+            self.events.append((FILES, self.files))
+            self.files = []
+
+    def root_path(self) -> str:
+        """Get the path of the root of the scan.
+
+        :returns: The path
+        """
+
+        root_path = (self.scan_info or {}).get("volumePath", "")
+
+        # The writer adds a slash to the end of the path
+        if root_path.endswith("/") and root_path != "/":
+            root_path = root_path[:-1]
+
+        return root_path
+
+
+class GrandPerspectiveReader:
+    """Reads a scan written by `GrandPerspectiveWriter`, without loading it into memory.
+
+    The XML is fed to `xml.sax` a chunk at a time, and the elements parsed from each chunk are
+    turned into the same events as a scan gives as it goes. Files are gathered up until the next
+    folder starts or ends, so that they are given in batches, whatever order the elements are in.
+
+    The used space on the disk isn't in the scan, so it is taken to be the size of the volume
+    less the free space. Sizes are written as they are in the scan, with a block size of 0.
+    """
+
+    input_path: str
+    stream: BinaryIO
+    handler: _EventHandler
+    parser: xml.sax.xmlreader.IncrementalParser
+    root_path: str
+    disk_usage_total: int
+    disk_usage_used: int
+    disk_usage_free: int
+    block_size: int
+
+    def __init__(self, input_path: str) -> None:
+        """Open a GrandPerspective scan, and read the details of the disk from the start of it.
+
+        :param input_path: The path of the scan to read, which can be compressed
+        """
+
+        self.input_path = input_path
+        self.stream = open_input(input_path)
+        self.handler = _EventHandler()
+        self.parser = xml.sax.make_parser()  # type: ignore
+        self.parser.setContentHandler(self.handler)
+
+        try:
+            while self.handler.scan_info is None and self._feed():
+                pass
+        except BaseException:
+            self.close()
+            raise
+
+        if self.handler.scan_info is None:
+            self.close()
+            raise ValueError(f"Not a GrandPerspective scan: {self.input_path}")
+
+        self.root_path = self.handler.root_path()
+        self.disk_usage_total = int(self.handler.scan_info.get("volumeSize", "0"))
+        self.disk_usage_free = int(self.handler.scan_info.get("freeSpace", "0"))
+        self.disk_usage_used = self.disk_usage_total - self.disk_usage_free
+        self.block_size = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def close(self) -> None:
+        """Close the file."""
+        self.stream.close()
+
+    def _feed(self) -> bool:
+        """Parse the next chunk of the scan.
+
+        :returns: False if the scan had already been read to the end
+        """
+
+        chunk = self.stream.read(CHUNK_SIZE)
+
+        try:
+            if chunk:
+                self.parser.feed(chunk)
+            else:
+                self.parser.close()
+        except xml.sax.SAXException as ex:
+            # pylint: disable=bad-exception-cause
+            raise ValueError(f"Not a valid GrandPerspective scan: {self.input_path}: {ex}") from ex
+
+        return bool(chunk)
+
+    def replay(self, writer: Writer) -> None:
+        """Write the scan out again with another writer, such as to convert it to JSON.
+
+        :param writer: The writer to write the scan with, which mustn't have been started
+        """
+
+        writer.write_start(
+            self.root_path,
+            self.disk_usage_total,
+            self.disk_usage_used,
+            self.disk_usage_free,
+            self.block_size,
+        )
+        writer.write_events(self.events())
+        writer.write_end()
+
+    def events(self) -> Iterator[ScanEvent]:
+        """Read the entries in the scan as events, in the order they were written.
+
+        The root folder has the root path of the scan as its path.
+
+        :returns: An iterator over the events
+        """
+
+        while True:
+            events = self.handler.events
+            self.handler.events = []
+            yield from events
+
+            if not self._feed():
+                break
+
+        yield from self.handler.events
+        self.handler.events = []
@@ -1,14 +1,11 @@
 """A CLI tool for checking disk space."""
 
 import datetime
-from io import IOBase
-import logging
-import os
-import shutil
-import tempfile
-import xml.sax
+import sys
 
 from diskspaced import writer
+from diskspaced.output import Compression
+from diskspaced.grand_perspective_encoder import GrandPerspectiveEncoder
 
 # Example:
 # <?xml version="1.0" encoding="UTF-8"?>
@@ -32,19 +29,34 @@ from diskspaced import writer
 class GrandPerspectiveWriter(writer.Writer):
     """A write out results as JSON."""
 
-    DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+    DATE_FORMAT = GrandPerspectiveEncoder.DATE_FORMAT
 
-    FOLDER_OPEN = "<Folder ".encode("utf-8")
-    FOLDER_CLOSE = "</Folder>\n".encode("utf-8")
-    FILE_OPEN = "<File ".encode("utf-8")
-    FILE_CLOSE = "/>\n".encode("utf-8")
-    CLOSE_TAG = ">\n".encode("utf-8")
-    ATTR_CLOSE = '" '.encode("utf-8")
-    ATTR_NAME = 'name="'.encode("utf-8")
-    ATTR_SIZE = 'size="'.encode("utf-8")
-    ATTR_CREATED = 'created="'.encode("utf-8")
-    ATTR_MODIFIED = 'modified="'.encode("utf-8")
-    ATTR_ACCESSED = 'accessed="'.encode("utf-8")
+    FOLDER_START = '<Folder name="%s" created="%s" modified="%s" accessed="%s" >\n'
+    FILE = '<File name="%s" size="%d" created="%s" modified="%s" accessed="%s" />\n'
+    FOLDER_CLOSE = "</Folder>\n"
+
+    # When pretty printing, each element is indented by its depth and elements without
+    # children are closed with a separate tag.
+    PRETTY_FOLDER_START = '<Folder name="%s" created="%s" modified="%s" accessed="%s">'
+    PRETTY_FILE = '<File name="%s" size="%d" created="%s" modified="%s" accessed="%s"></File>\n'
+    INDENT = "    "
+
+    encoder: GrandPerspectiveEncoder
+    folder_is_empty: bool
+
+    def __init__(
+        self,
+        output_path: str,
+        file_print_count: int,
+        pretty: bool = False,
+        compression: Compression | None = None,
+    ) -> None:
+        super().__init__(output_path, file_print_count, pretty, compression)
+        self.encoder = GrandPerspectiveEncoder()
+
+        # Whether the last element written was an opening tag which hasn't been ended yet, which
+        # is only used when pretty printing.
+        self.folder_is_empty = False
 
     def write_start(
         self,
@@ -59,36 +71,61 @@ class GrandPerspectiveWriter(writer.Writer):
             root_path, disk_usage_total, disk_usage_used, disk_usage_free, block_size
         )
 
-        # pylint: disable=consider-using-with
-        self.block_size = block_size
-        self.file = open(self.output_path, "wb")
-        # pylint: enable=consider-using-with
-
         if not root_path.endswith("/"):
             root_path += "/"
 
         now = datetime.datetime.now()
         scan_time = now.strftime(GrandPerspectiveWriter.DATE_FORMAT)
+        scan_info = (
+            f'<ScanInfo volumePath="{GrandPerspectiveEncoder.escape(root_path)}" '
+            + f'volumeSize="{disk_usage_total}" freeSpace="{disk_usage_free}" '
+            + f'scanTime="{scan_time}" fileSizeMeasure="physical">'
+        )
 
         # This only happens once, so we don't bother caching the encoded values
-        self.file.write('<?xml version="1.0" encoding="UTF-8"?>\n'.encode("utf-8"))
-        self.file.write(
-            '  <GrandPerspectiveScanDump appVersion="4" formatVersion="7">\n'.encode("utf-8")
-        )
-        self.file.write(
-            f'    <ScanInfo volumePath="{root_path}" volumeSize="{disk_usage_total}" freeSpace="{disk_usage_free}" scanTime="{scan_time}" fileSizeMeasure="physical">\n'.encode(
-                "utf-8"
+        if self.pretty:
+            self.file.write(
+                (
+                    '<?xml version="1.0" encoding="UTF-8"?>\n'
+                    + '<GrandPerspectiveScanDump appVersion="4" formatVersion="7">\n'
+                    + GrandPerspectiveWriter.INDENT
+                    + scan_info
+                ).encode("utf-8")
+            )
+            self.folder_is_empty = True
+        else:
+            self.file.write(
+                (
+                    '<?xml version="1.0" encoding="UTF-8"?>\n'
+                    + '  <GrandPerspectiveScanDump appVersion="4" formatVersion="7">\n'
+                    + "    "
+                    + scan_info
+                    + "\n"
+                ).encode("utf-8")
             )
-        )
 
-        if os.environ.get("PYTEST_CURRENT_TEST"):
+        if self.flush_after_writes:
             self.file.flush()
 
     def write_end(self) -> None:
         """Write the end of the output file."""
         super().write_end()
-        self.file.write("  </ScanInfo>\n</GrandPerspectiveScanDump>".encode("utf-8"))
-        self.file.close()
+
+        if not self.pretty:
+            self.file.write("  </ScanInfo>\n</GrandPerspectiveScanDump>".encode("utf-8"))
+        elif self.folder_is_empty:
+            self.file.write("</ScanInfo>\n</GrandPerspectiveScanDump>\n".encode("utf-8"))
+        else:
+            self.file.write("    </ScanInfo>\n</GrandPerspectiveScanDump>\n".encode("utf-8"))
+
+        self.close_output()
+
+    def start_entry(self) -> None:
+        """Prepare the output for another entry in the current folder."""
+
+        if self.folder_is_empty:
+            self.file.write(b"\n")
+            self.folder_is_empty = False
 
     def write_folder_start(
         self, folder_name: str, accessed_time: int, modified_time: int, created_time: int
@@ -97,95 +134,89 @@ class GrandPerspectiveWriter(writer.Writer):
 
         super().write_folder_start(folder_name, accessed_time, modified_time, created_time)
 
-        self.file.write(GrandPerspectiveWriter.FOLDER_OPEN)
-
-        self.file.write(GrandPerspectiveWriter.ATTR_NAME)
-        self.file.write(GrandPerspectiveWriter.safe_attr(folder_name).encode("utf-8"))
-        self.file.write(GrandPerspectiveWriter.ATTR_CLOSE)
-
-        self.file.write(GrandPerspectiveWriter.ATTR_CREATED)
-        self.file.write(
-            datetime.datetime.fromtimestamp(created_time)
-            .strftime(GrandPerspectiveWriter.DATE_FORMAT)
-            .encode("utf-8")
-        )
-        self.file.write(GrandPerspectiveWriter.ATTR_CLOSE)
-
-        self.file.write(GrandPerspectiveWriter.ATTR_MODIFIED)
-        self.file.write(
-            datetime.datetime.fromtimestamp(modified_time)
-            .strftime(GrandPerspectiveWriter.DATE_FORMAT)
-            .encode("utf-8")
-        )
-        self.file.write(GrandPerspectiveWriter.ATTR_CLOSE)
+        if self.pretty:
+            self.start_entry()
+            self.folder_is_empty = True
+            template = GrandPerspectiveWriter.INDENT * (self.depth + 1)
+            template += GrandPerspectiveWriter.PRETTY_FOLDER_START
+        else:
+            template = GrandPerspectiveWriter.FOLDER_START
 
-        self.file.write(GrandPerspectiveWriter.ATTR_ACCESSED)
         self.file.write(
-            datetime.datetime.fromtimestamp(accessed_time)
-            .strftime(GrandPerspectiveWriter.DATE_FORMAT)
-            .encode("utf-8")
+            (
+                template
+                % (
+                    GrandPerspectiveEncoder.escape(folder_name),
+                    self.encoder.format_time(created_time),
+                    self.encoder.format_time(modified_time),
+                    self.encoder.format_time(accessed_time),
+                )
+            ).encode("utf-8")
         )
-        self.file.write(GrandPerspectiveWriter.ATTR_CLOSE)
 
-        self.file.write(GrandPerspectiveWriter.CLOSE_TAG)
-
-        if os.environ.get("PYTEST_CURRENT_TEST"):
+        if self.flush_after_writes:
             self.file.flush()
 
     def write_folder_end(self) -> None:
         """Write the end of a folder entry."""
 
-        super().write_folder_end()
+        if not self.pretty:
+            self.file.write(GrandPerspectiveWriter.FOLDER_CLOSE.encode("utf-8"))
+        elif self.folder_is_empty:
+            self.file.write(GrandPerspectiveWriter.FOLDER_CLOSE.encode("utf-8"))
+            self.folder_is_empty = False
+        else:
+            self.file.write(
+                (
+                    GrandPerspectiveWriter.INDENT * (self.depth + 1)
+                    + GrandPerspectiveWriter.FOLDER_CLOSE
+                ).encode("utf-8")
+            )
 
-        self.file.write(GrandPerspectiveWriter.FOLDER_CLOSE)
+        super().write_folder_end()
 
-        if os.environ.get("PYTEST_CURRENT_TEST"):
+        if self.flush_after_writes:
             self.file.flush()
 
     def write_file(
         self, file_name: str, size: int, accessed_time: int, modified_time: int, created_time: int
     ) -> None:
         """Write the start of a file entry."""
+        self.write_files([(file_name, size, accessed_time, modified_time, created_time)])
 
-        super().write_file(file_name, size, accessed_time, modified_time, created_time)
-
-        self.file.write(GrandPerspectiveWriter.FILE_OPEN)
+    def write_files(self, files: list[writer.FileEntry]) -> None:
+        """Write the entries for a batch of files in the current folder."""
 
-        self.file.write(GrandPerspectiveWriter.ATTR_NAME)
-        self.file.write(GrandPerspectiveWriter.safe_attr(file_name).encode("utf-8"))
-        self.file.write(GrandPerspectiveWriter.ATTR_CLOSE)
-
-        self.file.write(GrandPerspectiveWriter.ATTR_SIZE)
-        self.file.write(str(min(self.block_size, size)).encode("utf-8"))
-        self.file.write(GrandPerspectiveWriter.ATTR_CLOSE)
-
-        self.file.write(GrandPerspectiveWriter.ATTR_CREATED)
-        self.file.write(
-            datetime.datetime.fromtimestamp(created_time)
-            .strftime(GrandPerspectiveWriter.DATE_FORMAT)
-            .encode("utf-8")
-        )
-        self.file.write(GrandPerspectiveWriter.ATTR_CLOSE)
+        self.count_files(files)
+        if self.pretty:
+            self.start_entry()
+            template = GrandPerspectiveWriter.INDENT * (self.depth + 2)
+            template += GrandPerspectiveWriter.PRETTY_FILE
+        else:
+            template = GrandPerspectiveWriter.FILE
 
-        self.file.write(GrandPerspectiveWriter.ATTR_MODIFIED)
-        self.file.write(
-            datetime.datetime.fromtimestamp(modified_time)
-            .strftime(GrandPerspectiveWriter.DATE_FORMAT)
-            .encode("utf-8")
-        )
-        self.file.write(GrandPerspectiveWriter.ATTR_CLOSE)
+        # Sizes which have already been rounded, such as from a converted scan, have no block size
+        block_size = self.block_size or sys.maxsize
+        escape = GrandPerspectiveEncoder.escape
+        format_time = self.encoder.format_time
 
-        self.file.write(GrandPerspectiveWriter.ATTR_ACCESSED)
         self.file.write(
-            datetime.datetime.fromtimestamp(accessed_time)
-            .strftime(GrandPerspectiveWriter.DATE_FORMAT)
-            .encode("utf-8")
+            "".join(
+                [
+                    template
+                    % (
+                        escape(file_name),
+                        min(block_size, size),
+                        format_time(created_time),
+                        format_time(modified_time),
+                        format_time(accessed_time),
+                    )
+                    for file_name, size, accessed_time, modified_time, created_time in files
+                ]
+            ).encode("utf-8")
         )
-        self.file.write(GrandPerspectiveWriter.ATTR_CLOSE)
-
-        self.file.write(GrandPerspectiveWriter.FILE_CLOSE)
 
-        if os.environ.get("PYTEST_CURRENT_TEST"):
+        if self.flush_after_writes:
             self.file.flush()
 
     @staticmethod
@@ -196,82 +227,4 @@ class GrandPerspectiveWriter(writer.Writer):
 
         :return: The safe value
         """
-        return value.replace("&", "&amp;").replace("<", "&lt;").replace('"', "&quot;")
-
-    def pretty_print(self) -> None:
-        """Pretty print the output."""
-
-        super().pretty_print()
-
-        _format(self.output_path)
-
-
-class XMLFormatter(xml.sax.ContentHandler):
-    """Format XML output for disk usage."""
-
-    indent_level: int
-    output_file: IOBase
-    had_contents: list[tuple[str, bool]]
-
-    def __init__(self, output_file: IOBase) -> None:
-        self.indent_level = 0
-        self.output_file = output_file
-        self.had_contents = []
-
-        self.output_file.write('<?xml version="1.0" encoding="UTF-8"?>\n'.encode("utf-8"))
-
-        super().__init__()
-
-    @staticmethod
-    def get_name(name: str, attrs) -> str:
-        """Get the name from the attributes if it exists.
-
-        Returns the name of the element if it doesn't.
-
-        :param name: The name of the element
-        :param attrs: The attributes of the element
-
-        :return: The name of the element
-        """
-        if "name" in attrs:
-            return attrs["name"]
-        return name
-
-    def startElement(self, name, attrs):
-        self.output_file.write((" " * 4 * self.indent_level).encode("utf-8"))
-        self.output_file.write(f"<{name}".encode("utf-8"))
-        for attr, value in attrs.items():
-            self.output_file.write(
-                f' {attr}="{GrandPerspectiveWriter.safe_attr(value)}"'.encode("utf-8")
-            )
-        self.output_file.write(">\n".encode("utf-8"))
-        self.indent_level += 1
-        self.had_contents.append((XMLFormatter.get_name(name, attrs), False))
-
-        if len(self.had_contents) > 1:
-            self.had_contents[-2] = (self.had_contents[-2][0], True)
-
-    def endElement(self, name):
-        self.indent_level -= 1
-        if not self.had_contents[-1][1]:
-            self.output_file.seek(-1, 1)
-        else:
-            self.output_file.write((" " * 4 * self.indent_level).encode("utf-8"))
-        self.output_file.write(f"</{name}>\n".encode("utf-8"))
-
-        self.had_contents.pop()
-
-
-def _format(input_file_path: str) -> None:
-    logging.info("Formatting...")
-
-    with tempfile.TemporaryDirectory() as temp_folder:
-        tempfile_name = "unformatted.xml"
-        tempfile_path = os.path.join(temp_folder, tempfile_name)
-        shutil.copy(input_file_path, tempfile_path)
-
-        with open(input_file_path, "wb") as output_file:
-            parser = xml.sax.make_parser()
-            formatter = XMLFormatter(output_file)
-            parser.setContentHandler(formatter)
-            parser.parse(tempfile_path)
+        return GrandPerspectiveEncoder.escape(value)
@@ -0,0 +1,258 @@
+"""Reuse the listings of folders which haven't changed since the last scan."""
+
+import marshal
+import os
+import sqlite3
+import stat
+import time
+
+from diskspaced.scan_filter import ScanFilter
+from diskspaced.scan_stats import ScanStats
+from diskspaced.scanner import FolderEntry, FolderLister, Listing, list_folder, lstat_folder
+
+INDEX_VERSION = f"1-{marshal.version}"
+"""Changes whenever the layout of the index or its listings changes, which empties the index."""
+
+RACY_WINDOW_NS = 2_000_000_000
+"""How close to being listed a folder can change and still be trusted.
+
+Timestamps are only as fine as the filesystem keeps them, which is as coarse as 2 seconds on
+some. A folder which changed within that long of being listed may have changed again afterwards
+without its timestamps moving, so it is listed again next time.
+"""
+
+COMMIT_INTERVAL = 10_000
+"""How many folders to update the index for between commits, so an interrupted scan keeps most
+of its progress."""
+
+
+class IndexedFolderLister(FolderLister):
+    """Lists only the folders which have changed since the last scan with the same index.
+
+    The index is a SQLite database with a row per folder, holding the folder's modified and
+    changed times and what it contained the last time it was listed. A folder's modified time
+    moves whenever an entry is added to, removed from or renamed in it. When the walk reaches a
+    folder whose times match the index, the listing in the index is used, and only the folder's
+    sub-folders are looked at, to get their current times. Everything else is listed as usual
+    and the index is updated. Folders which weren't reached are removed from the index once the
+    scan is complete.
+
+    Writing to a file doesn't change the modified time of the folder it is in, so files which are
+    changed in place keep the size and times they had when their folder was last listed.
+
+    The listings are stored after the filter has been applied to them, so the index is emptied
+    whenever the filter changes.
+    """
+
+    root_path: str
+    connection: sqlite3.Connection
+    generation: int
+    folder_times: dict[str, tuple[int, int]]
+    pending_updates: int
+    completed: bool
+
+    def __init__(
+        self,
+        process_in_order: bool,
+        stats: ScanStats,
+        index_path: str,
+        root_path: str,
+        scan_filter: ScanFilter | None = None,
+    ) -> None:
+        """Open the index, creating it if it doesn't exist.
+
+        :param process_in_order: Whether to process the contents of each folder by name
+        :param stats: The statistics to update
+        :param index_path: The path of the index
+        :param root_path: The path of the folder being scanned, which is the only part of the
+                          index which is removed if it isn't reached
+        :param scan_filter: The rules for which entries to skip, if any
+        """
+        super().__init__(process_in_order, stats, scan_filter)
+
+        self.root_path = root_path
+        self.connection = sqlite3.connect(index_path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)")
+
+        version = self._get_meta("version")
+        filter_rules = repr(scan_filter)
+
+        if version != INDEX_VERSION or self._get_meta("filter") != filter_rules:
+            self.connection.execute("DROP TABLE IF EXISTS folders")
+            self._set_meta("version", INDEX_VERSION)
+            self._set_meta("filter", filter_rules)
+
+        self.connection.execute(
+            """CREATE TABLE IF NOT EXISTS folders (
+                path BLOB PRIMARY KEY,
+                modified_ns INTEGER NOT NULL,
+                changed_ns INTEGER NOT NULL,
+                listed_ns INTEGER NOT NULL,
+                generation INTEGER NOT NULL,
+                listing BLOB NOT NULL
+            )"""
+        )
+
+        self.generation = (self._get_meta("generation") or 0) + 1
+        self._set_meta("generation", self.generation)
+        self.connection.commit()
+
+        # The times of sub-folders looked at by the walk already, to save looking at them again
+        self.folder_times = {}
+
+        self.pending_updates = 0
+        self.completed = False
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.completed = exc_type is None
+        super().__exit__(exc_type, exc_value, tb)
+
+    def _get_meta(self, key: str):
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def _set_meta(self, key: str, value) -> None:
+        self.connection.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+
+    def list_folder(self, folder_path: str) -> Listing:
+        """List a folder the walk has just entered, using the index if it hasn't changed.
+
+        :param folder_path: The path of the folder to list
+
+        :returns: The sub-folders and the files in the folder
+        """
+
+        encoded_path = os.fsencode(folder_path)
+        times = self.folder_times.pop(folder_path, None)
+
+        if times is None:
+            times = self._get_times(folder_path)
+
+        if times is not None:
+            row = self.connection.execute(
+                "SELECT modified_ns, changed_ns, listed_ns, listing FROM folders WHERE path = ?",
+                (encoded_path,),
+            ).fetchone()
+
+            if row is not None and self._is_unchanged(times, row[0], row[1], row[2]):
+                listing = self._reuse_listing(folder_path, row[3])
+
+                if listing is not None:
+                    self.stats.reused_folders += 1
+                    self._update(
+                        "UPDATE folders SET generation = ? WHERE path = ?",
+                        (self.generation, encoded_path),
+                    )
+                    return listing
+
+        listed_ns = time.time_ns()
+        listing = list_folder(
+            folder_path, self.process_in_order, self.stats, self.scan_filter, self.phase_ns
+        )
+
+        if times is not None:
+            folders, files = listing
+            self._update(
+                "INSERT OR REPLACE INTO folders VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    encoded_path,
+                    times[0],
+                    times[1],
+                    listed_ns,
+                    self.generation,
+                    marshal.dumps(([folder[0] for folder in folders], files)),
+                ),
+            )
+
+        return listing
+
+    def _get_times(self, folder_path: str) -> tuple[int, int] | None:
+        details = lstat_folder(folder_path, self.stats, self.phase_ns)
+
+        if details is None:
+            return None
+
+        return details.st_mtime_ns, details.st_ctime_ns
+
+    @staticmethod
+    def _is_unchanged(
+        times: tuple[int, int], modified_ns: int, changed_ns: int, listed_ns: int
+    ) -> bool:
+        if times != (modified_ns, changed_ns):
+            return False
+
+        # If the folder changed just before it was listed, it could have changed again since
+        # without its modified time moving. The changed time can't be set by hand, so it catches
+        # the modified time being moved back after a change.
+        return modified_ns < listed_ns - RACY_WINDOW_NS
+
+    def _reuse_listing(self, folder_path: str, stored_listing: bytes) -> Listing | None:
+        folder_names, files = marshal.loads(stored_listing)
+        folders: list[FolderEntry] = []
+
+        # Sub-folders can change without this folder changing, so their times are looked up
+        for folder_name in folder_names:
+            sub_folder_path = os.path.join(folder_path, folder_name)
+            self.stats.syscalls += 1
+            start = time.perf_counter_ns() if self.phase_ns is not None else 0
+
+            try:
+                details = os.lstat(sub_folder_path)
+            except OSError:
+                # It must have gone in between looking at this folder and listing it
+                return None
+            finally:
+                if self.phase_ns is not None:
+                    self.phase_ns["stat"] += time.perf_counter_ns() - start
+
+            if not stat.S_ISDIR(details.st_mode):
+                return None
+
+            # Something could have been mounted on it since it was listed
+            if self.scan_filter is not None and self.scan_filter.excludes_device(details.st_dev):
+                continue
+
+            folders.append(
+                (
+                    folder_name,
+                    sub_folder_path,
+                    int(details.st_atime),
+                    int(details.st_mtime),
+                    int(details.st_ctime),
+                )
+            )
+            self.folder_times[sub_folder_path] = (details.st_mtime_ns, details.st_ctime_ns)
+
+        if self.process_in_order:
+            folders.sort()
+            files.sort()
+
+        return folders, files
+
+    def _update(self, query: str, parameters: tuple) -> None:
+        self.connection.execute(query, parameters)
+        self.pending_updates += 1
+
+        if self.pending_updates >= COMMIT_INTERVAL:
+            self.connection.commit()
+            self.pending_updates = 0
+
+    def close(self) -> None:
+        """Remove the folders which weren't reached if the scan completed, and close the index."""
+
+        try:
+            if self.completed:
+                root = os.fsencode(self.root_path.rstrip("/"))
+
+                # Every path under the root sorts between "root/" and "root0"
+                self.connection.execute(
+                    """DELETE FROM folders
+                    WHERE generation != ? AND (path = ? OR (path >= ? AND path < ?))""",
+                    (self.generation, root or b"/", root + b"/", root + b"0"),
+                )
+
+            self.connection.commit()
+        finally:
+            self.connection.close()
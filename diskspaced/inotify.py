@@ -0,0 +1,132 @@
+"""A minimal binding to Linux's inotify API."""
+
+import ctypes
+import errno
+import os
+import platform
+import struct
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_UNMOUNT = 0x00002000
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR = 0x40000000
+
+EVENT_FORMAT = "iIII"
+EVENT_SIZE = struct.calcsize(EVENT_FORMAT)
+
+READ_SIZE = 64 * 1024
+
+# An event is read as (watch_descriptor, mask, cookie, name)
+Event = tuple[int, int, int, str]
+
+
+class WatchLimitReached(Exception):
+    """Raised when the kernel won't give out any more watches."""
+
+
+class Inotify:
+    """An inotify instance, which is read without blocking."""
+
+    fd: int
+
+    def __init__(self) -> None:
+        if platform.system() != "Linux":
+            raise NotImplementedError("Watching for changes is only supported on Linux")
+
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self._libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, f"inotify_init1 failed: {os.strerror(error)}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def fileno(self) -> int:
+        """Get the file descriptor to wait on for events."""
+        return self.fd
+
+    def add_watch(self, path: str, mask: int) -> int | None:
+        """Watch a path.
+
+        :param path: The path to watch
+        :param mask: The events to watch for
+
+        :returns: The watch descriptor, or None if the path has gone or can't be read
+
+        :raises WatchLimitReached: If the kernel won't give out any more watches
+        """
+
+        watch_descriptor = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+
+        if watch_descriptor >= 0:
+            return watch_descriptor
+
+        error = ctypes.get_errno()
+
+        if error == errno.ENOSPC:
+            raise WatchLimitReached()
+
+        if error in (errno.ENOENT, errno.ENOTDIR, errno.EACCES, errno.EPERM):
+            return None
+
+        raise OSError(error, f"inotify_add_watch failed for {path}: {os.strerror(error)}")
+
+    def remove_watch(self, watch_descriptor: int) -> None:
+        """Stop watching something.
+
+        :param watch_descriptor: The watch to remove
+        """
+
+        # This fails if the watch has already gone along with what it was watching, which is fine
+        self._libc.inotify_rm_watch(self.fd, watch_descriptor)
+
+    def read_events(self) -> list[Event]:
+        """Read the events which are waiting, without blocking.
+
+        :returns: The events, which is empty if there are none
+        """
+
+        events: list[Event] = []
+
+        while True:
+            try:
+                data = os.read(self.fd, READ_SIZE)
+            except BlockingIOError:
+                return events
+
+            offset = 0
+
+            while offset < len(data):
+                watch_descriptor, mask, cookie, name_length = struct.unpack_from(
+                    EVENT_FORMAT, data, offset
+                )
+                offset += EVENT_SIZE
+                name = os.fsdecode(data[offset : offset + name_length].rstrip(b"\0"))
+                offset += name_length
+                events.append((watch_descriptor, mask, cookie, name))
+
+    def close(self) -> None:
+        """Close the instance, which removes all of its watches."""
+
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
@@ -0,0 +1,257 @@
+"""Parse JSON incrementally, as a stream of events."""
+
+import json
+import re
+from json.decoder import scanstring  # type: ignore[attr-defined]
+from typing import Any, Iterator, TextIO
+
+# The events, each of which is a tuple starting with one of these
+START_MAP = 0
+END_MAP = 1
+KEY = 2  # (KEY, key)
+START_ARRAY = 3
+END_ARRAY = 4
+VALUE = 5  # (VALUE, value) for a string, number, boolean or null
+VALUES = 6  # (VALUES, [value, ...]) for a run of values in an array, see `_read_values`
+
+JSONEvent = tuple[Any, ...]
+
+# How much is read from the input at once
+CHUNK_SIZE = 1024 * 1024
+
+# How much of the input is kept ahead of the parser where it can be, so that it rarely has to
+# stop part of the way through a value and read some more
+LOOKAHEAD = 64 * 1024
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+NUMBER_CHARACTERS = re.compile(r"[-+0-9.eE]+")
+NUMBER = re.compile(r"-?(?:0|[1-9][0-9]*)(\.[0-9]+)?([eE][-+]?[0-9]+)?")
+LITERALS = {"true": True, "false": False, "null": None}
+
+# An object with only strings, numbers, booleans and null in it, followed by any more of them
+_FLAT_OBJECT = r'\{[^{}\[\]"]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^{}\[\]"]*)*\}'
+FLAT_OBJECTS = re.compile(_FLAT_OBJECT + r"(?:[ \t\n\r]*,[ \t\n\r]*" + _FLAT_OBJECT + ")*", re.S)
+
+
+class JSONEventParser:
+    """Parses a JSON document a chunk at a time, giving an event for each part of it.
+
+    Only the chunk being parsed is held in memory, however big the document is. Going through a
+    document an event at a time is a lot slower than `json.loads`, so runs of values in an
+    array which start with an object and have no arrays in them are decoded by `json.loads` all
+    at once, as a single `VALUES` event. Most of a scan is files, which are exactly that.
+
+    Commas aren't checked, but anything else which isn't valid JSON raises a `ValueError`.
+    """
+
+    stream: TextIO
+    buffer: str
+    position: int
+    at_end: bool
+
+    def __init__(self, stream: TextIO) -> None:
+        """Create the parser.
+
+        :param stream: The text stream to read the document from
+        """
+
+        self.stream = stream
+        self.buffer = ""
+        self.position = 0
+        self.at_end = False
+
+    def _read_more(self) -> bool:
+        """Read the next chunk of the input onto the end of what hasn't been parsed yet.
+
+        :returns: False if the input had already been read to the end
+        """
+
+        if self.at_end:
+            return False
+
+        chunk = self.stream.read(CHUNK_SIZE)
+        self.buffer = self.buffer[self.position :] + chunk
+        self.position = 0
+        self.at_end = not chunk
+
+        return True
+
+    def _next_character(self) -> str:
+        """Skip any whitespace, and get the character after it.
+
+        :returns: The character, or an empty string at the end of the input
+        """
+
+        while True:
+            self.position = WHITESPACE.match(self.buffer, self.position).end()  # type: ignore
+
+            remaining = len(self.buffer) - self.position
+
+            if self.at_end or (remaining and remaining >= LOOKAHEAD):
+                break
+
+            self._read_more()
+
+        return self.buffer[self.position : self.position + 1]
+
+    def _read_string(self) -> str:
+        while True:
+            try:
+                value, self.position = scanstring(self.buffer, self.position + 1)
+                return value
+            except ValueError:
+                if not self._read_more():
+                    raise
+
+    def _read_key(self) -> str:
+        if self.buffer[self.position] != '"':
+            raise ValueError(f"Expected a key in the JSON at {self.position}")
+
+        key = self._read_string()
+
+        if self._next_character() != ":":
+            raise ValueError(f"Expected a ':' in the JSON at {self.position}")
+
+        self.position += 1
+        return key
+
+    def _read_scalar(self) -> Any:
+        while True:
+            character = self.buffer[self.position]
+
+            if character == '"':
+                return self._read_string()
+
+            characters = NUMBER_CHARACTERS.match(self.buffer, self.position)
+
+            if characters is not None:
+                # The number might carry on into the next chunk
+                if characters.end() == len(self.buffer) and self._read_more():
+                    continue
+
+                match = NUMBER.fullmatch(self.buffer, self.position, characters.end())
+
+                if match is None:
+                    raise ValueError(f"Invalid number in the JSON at {self.position}")
+
+                self.position = match.end()
+
+                if match.group(1) or match.group(2):
+                    return float(match.group())
+
+                return int(match.group())
+
+            for literal, value in LITERALS.items():
+                if self.buffer.startswith(literal, self.position):
+                    self.position += len(literal)
+                    return value
+
+            if not self._read_more():
+                raise ValueError(f"Unexpected {character!r} in the JSON at {self.position}")
+
+    def _read_values(self) -> list[Any] | None:
+        """Decode the run of values starting with the object at the current position, up to the
+        last one before the next bracket, so that none of them have an array in them.
+
+        The bracket might be in a string, in which case what is before it won't decode, and the
+        run is found with a regular expression instead, which only finds objects with nothing
+        nested in them, and is a lot slower.
+
+        :returns: The values, or None if the object has an array in it
+        """
+
+        buffer = self.buffer
+        start = self.position
+        end = len(buffer)
+
+        for bracket in "[]":
+            found = buffer.find(bracket, start, end)
+
+            if found != -1:
+                end = found
+
+        end = buffer.rfind("}", start, end) + 1
+
+        if end:
+            try:
+                objects = json.loads("[" + buffer[start:end] + "]")
+                self.position = end
+                return objects
+            except ValueError:
+                pass
+
+        match = FLAT_OBJECTS.match(buffer, start)
+
+        if match is None:
+            return None
+
+        self.position = match.end()
+        return json.loads("[" + match.group() + "]")
+
+    def events(self) -> Iterator[JSONEvent]:
+        """Parse the document.
+
+        :returns: An iterator over the events in it
+        """
+
+        # For each container the parser is in, True for a map and False for an array
+        containers: list[bool] = []
+        expecting_key = False
+
+        while True:
+            character = self._next_character()
+
+            if not character:
+                if containers:
+                    raise ValueError("The JSON ends part of the way through")
+
+                return
+
+            if character == ",":
+                self.position += 1
+                expecting_key = bool(containers) and containers[-1]
+            elif character in "}]":
+                if not containers or containers[-1] != (character == "}"):
+                    raise ValueError(f"Unexpected {character!r} in the JSON at {self.position}")
+
+                self.position += 1
+                containers.pop()
+                expecting_key = False
+                yield (END_MAP,) if character == "}" else (END_ARRAY,)
+            elif expecting_key:
+                expecting_key = False
+                yield (KEY, self._read_key())
+            elif character == "{":
+                values = self._read_values() if containers and not containers[-1] else None
+
+                if values is not None:
+                    yield (VALUES, values)
+                else:
+                    self.position += 1
+                    containers.append(True)
+                    expecting_key = True
+                    yield (START_MAP,)
+            elif character == "[":
+                self.position += 1
+                containers.append(False)
+                yield (START_ARRAY,)
+            else:
+                yield (VALUE, self._read_scalar())
+
+
+def skip_value(events: Iterator[JSONEvent], event: JSONEvent) -> None:
+    """Skip over a value, along with everything in it if it is a map or an array.
+
+    :param events: The events being parsed
+    :param event: The event which starts the value
+    """
+
+    depth = 1 if event[0] in (START_MAP, START_ARRAY) else 0
+
+    while depth:
+        kind = next(events)[0]
+
+        if kind in (START_MAP, START_ARRAY):
+            depth += 1
+        elif kind in (END_MAP, END_ARRAY):
+            depth -= 1
@@ -0,0 +1,259 @@
+"""Read scans written in the JSON format."""
+
+import io
+import os
+from typing import Any, Iterator
+
+from diskspaced.events import FILES, FOLDER_END_EVENT, FOLDER_START, ScanEvent
+from diskspaced.json_events import (
+    END_ARRAY,
+    END_MAP,
+    START_ARRAY,
+    START_MAP,
+    VALUE,
+    VALUES,
+    JSONEvent,
+    JSONEventParser,
+    skip_value,
+)
+from diskspaced.output import open_input
+from diskspaced.writer import FileEntry, Writer
+
+# The most files to hold before giving them as an event, so that huge folders don't use up memory
+FILE_BATCH_SIZE = 4096
+
+
+class JSONReader:
+    """Reads a scan written by `JSONWriter`, without loading it into memory.
+
+    The scan is parsed a chunk at a time with `JSONEventParser`, and turned into the same events
+    as a scan gives as it goes. The keys can be in any order, other than that the details of the
+    disk have to come before the top level `contents`, and the name and times of a folder before
+    its `contents`. Any other keys are skipped.
+
+    JSON scans have the sizes of files after they were rounded up to the block size, so they
+    are written with a block size of 0, which leaves them as they are.
+    """
+
+    input_path: str
+    stream: io.TextIOWrapper
+    json_events: Iterator[JSONEvent]
+    root_path: str
+    disk_usage_total: int
+    disk_usage_used: int
+    disk_usage_free: int
+    block_size: int
+    files: list[FileEntry]
+
+    def __init__(self, input_path: str) -> None:
+        """Open a JSON scan, and read the details of the disk from the start of it.
+
+        :param input_path: The path of the scan to read, which can be compressed
+        """
+
+        self.input_path = input_path
+        self.stream = io.TextIOWrapper(open_input(input_path), encoding="utf-8")
+        self.json_events = JSONEventParser(self.stream).events()
+        self.block_size = 0
+        self.files = []
+
+        try:
+            header = self._read_header()
+        except BaseException:
+            self.close()
+            raise
+
+        self.root_path = header.get("root_path", "")
+        self.disk_usage_total = int(header.get("volume_size", 0))
+        self.disk_usage_used = int(header.get("used_space", 0))
+        self.disk_usage_free = int(header.get("free_space", 0))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def close(self) -> None:
+        """Close the file."""
+        self.stream.close()
+
+    def _read_header(self) -> dict[str, Any]:
+        """Read the fields before the top level `contents`, up to the start of it."""
+
+        if next(self.json_events, None) != (START_MAP,):
+            raise ValueError(f"Not a JSON scan: {self.input_path}")
+
+        header, has_contents = self._read_fields(self.json_events)
+
+        if not has_contents:
+            raise ValueError(f"The JSON scan has no contents: {self.input_path}")
+
+        return header
+
+    def replay(self, writer: Writer) -> None:
+        """Write the scan out again with another writer, such as to convert it to GrandPerspective.
+
+        :param writer: The writer to write the scan with, which mustn't have been started
+        """
+
+        writer.write_start(
+            self.root_path,
+            self.disk_usage_total,
+            self.disk_usage_used,
+            self.disk_usage_free,
+            self.block_size,
+        )
+        writer.write_events(self.events())
+        writer.write_end()
+
+    def events(self) -> Iterator[ScanEvent]:
+        """Read the entries in the scan as events, in the order they were written.
+
+        The root folder has the root path of the scan as its path.
+
+        :returns: An iterator over the events
+        """
+
+        events = self.json_events
+
+        # The paths of the open folders
+        paths: list[str] = []
+
+        for event in events:
+            kind = event[0]
+
+            if kind == VALUES:
+                yield from self._add_entries(event[1], paths)
+            elif kind == START_MAP:
+                fields, has_contents = self._read_fields(events)
+
+                if has_contents:
+                    yield from self._take_files()
+                    folder_start = self._folder_start(fields, paths)
+                    paths.append(folder_start[2])
+                    yield folder_start
+                else:
+                    yield from self._add_entry(fields, paths)
+            elif kind == END_ARRAY:
+                yield from self._take_files()
+
+                if not paths:
+                    return
+
+                yield FOLDER_END_EVENT
+                paths.pop()
+
+                # Anything after the contents of the folder is skipped
+                self._skip_fields(events)
+            else:
+                raise ValueError(f"Unexpected value in the contents of the JSON scan: {event}")
+
+        raise ValueError(f"The JSON scan ends part of the way through: {self.input_path}")
+
+    @staticmethod
+    def _read_fields(events: Iterator[JSONEvent]) -> tuple[dict[str, Any], bool]:
+        """Read the fields of a map up to the start of its contents, or its end if it has none.
+
+        :returns: The fields, and whether the map has contents to read next
+        """
+
+        fields: dict[str, Any] = {}
+
+        for event in events:
+            if event[0] == END_MAP:
+                return fields, False
+
+            value_event = next(events)
+
+            if event[1] == "contents" and value_event[0] == START_ARRAY:
+                return fields, True
+
+            if value_event[0] == VALUE:
+                fields[event[1]] = value_event[1]
+            else:
+                skip_value(events, value_event)
+
+        raise ValueError("The JSON scan ends part of the way through an entry")
+
+    @staticmethod
+    def _skip_fields(events: Iterator[JSONEvent]) -> None:
+        """Skip the rest of the fields of a map, up to the end of it."""
+
+        for event in events:
+            if event[0] == END_MAP:
+                return
+
+            skip_value(events, next(events))
+
+    def _folder_start(self, fields: dict[str, Any], paths: list[str]) -> ScanEvent:
+        name = fields.get("name", "")
+
+        return (
+            FOLDER_START,
+            name,
+            os.path.join(paths[-1], name) if paths else self.root_path,
+            int(fields.get("accessed", 0)),
+            int(fields.get("modified", 0)),
+            int(fields.get("created", 0)),
+        )
+
+    def _add_entries(self, entries: list[Any], paths: list[str]) -> Iterator[ScanEvent]:
+        """Add a run of entries, which are almost always files, to the batch being gathered."""
+
+        try:
+            files = [
+                (
+                    fields["name"],
+                    fields["size"],
+                    fields["accessed"],
+                    fields["modified"],
+                    fields["created"],
+                )
+                for fields in entries
+                if fields.get("type") == "file"
+            ]
+        except (AttributeError, KeyError):
+            files = []
+
+        if len(files) < len(entries):
+            # There are folders, or fields missing, so each entry is looked at on its own
+            for fields in entries:
+                yield from self._add_entry(fields, paths)
+
+            return
+
+        self.files += files
+
+        if len(self.files) >= FILE_BATCH_SIZE:
+            yield from self._take_files()
+
+    def _add_entry(self, fields: Any, paths: list[str]) -> Iterator[ScanEvent]:
+        """Add a file to the batch being gathered, or give a folder with nothing in it."""
+
+        if not isinstance(fields, dict):
+            raise ValueError(f"Unexpected value in the contents of the JSON scan: {fields!r}")
+
+        if fields.get("type") == "folder":
+            yield from self._take_files()
+            yield self._folder_start(fields, paths)
+            yield FOLDER_END_EVENT
+            return
+
+        self.files.append(
+            (
+                fields.get("name", ""),
+                int(fields.get("size", 0)),
+                int(fields.get("accessed", 0)),
+                int(fields.get("modified", 0)),
+                int(fields.get("created", 0)),
+            )
+        )
+
+        if len(self.files) >= FILE_BATCH_SIZE:
+            yield from self._take_files()
+
+    def _take_files(self) -> Iterator[ScanEvent]:
+        if self.files:
+            yield (FILES, self.files)
+            self.files = []
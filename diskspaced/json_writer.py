@@ -1,8 +1,9 @@
 """A CLI tool for checking disk space."""
 
-import os
+from json.encoder import encode_basestring
 
 from diskspaced import writer
+from diskspaced.output import Compression
 
 # Example:
 # {
@@ -23,19 +24,32 @@ from diskspaced import writer
 class JSONWriter(writer.Writer):
     """A write out results as JSON."""
 
-    OPEN_BRACE = "{".encode("utf-8")
-    TYPE_FILE = '"type": "file", '.encode("utf-8")
-    TYPE_FOLDER = '"type": "folder", '.encode("utf-8")
-    FIELD_NAME = '"name": "'.encode("utf-8")
-    FIELD_SIZE = '"size": '.encode("utf-8")
-    FIELD_ACCESSED = '"accessed": '.encode("utf-8")
-    FIELD_MODIFIED = '"modified": '.encode("utf-8")
-    FIELD_CREATED = '"created": '.encode("utf-8")
-    FIELD_CONTENTS = '"contents": [\n'.encode("utf-8")
-    FOLDER_END = "]},\n".encode("utf-8")
-    CLOSE_BRACE = "},\n".encode("utf-8")
-    STRING_COMMA = '",'.encode("utf-8")
-    COMMA = ",".encode("utf-8")
+    FOLDER_START = (
+        '{"type": "folder", "name": %s,"accessed": %d,"modified": %d,"created": %d,"contents": [\n'
+    )
+    FILE = '{"type": "file", "name": %s,"size": %d,"accessed": %d,"modified": %d,"created": %d}'
+    FOLDER_END = "]}"
+
+    # Entries are separated by writing this before every entry but the first in a folder, so the
+    # output never has to be seeked back on to remove a trailing comma.
+    SEPARATOR = ",\n"
+
+    # When pretty printing, the output is laid out the same way as `json.dumps(..., indent=4)`
+    INDENT = "    "
+
+    separator: str
+
+    def __init__(
+        self,
+        output_path: str,
+        file_print_count: int,
+        pretty: bool = False,
+        compression: Compression | None = None,
+    ) -> None:
+        super().__init__(output_path, file_print_count, pretty, compression)
+
+        # What to write before the next entry in the current folder
+        self.separator = ""
 
     def write_start(
         self,
@@ -51,20 +65,24 @@ class JSONWriter(writer.Writer):
             root_path, disk_usage_total, disk_usage_used, disk_usage_free, block_size
         )
 
-        # pylint: disable=consider-using-with
-        self.block_size = block_size
-        self.file = open(self.output_path, "wb")
-        # pylint: enable=consider-using-with
+        fields = [
+            f'"root_path": {encode_basestring(root_path)}',
+            f'"volume_size": {disk_usage_total}',
+            f'"free_space": {disk_usage_free}',
+            f'"used_space": {disk_usage_used}',
+            '"contents": [',
+        ]
 
         # This only happens once, so we don't bother caching the encoded values
-        self.file.write("{".encode("utf-8"))
-        self.file.write(('"root_path": "' + root_path + '", ').encode("utf-8"))
-        self.file.write(('"volume_size": ' + str(disk_usage_total) + ", ").encode("utf-8"))
-        self.file.write(('"free_space": ' + str(disk_usage_free) + ", ").encode("utf-8"))
-        self.file.write(('"used_space": ' + str(disk_usage_used) + ", ").encode("utf-8"))
-        self.file.write('"contents": [\n'.encode("utf-8"))
-
-        if os.environ.get("PYTEST_CURRENT_TEST"):
+        if self.pretty:
+            header = "{\n" + ",\n".join(JSONWriter.INDENT + field for field in fields)
+        else:
+            header = "{" + ", ".join(fields) + "\n"
+
+        self.file.write(header.encode("utf-8"))
+        self.separator = self._first_separator()
+
+        if self.flush_after_writes:
             self.file.flush()
 
     def write_end(self) -> None:
@@ -72,83 +90,134 @@ class JSONWriter(writer.Writer):
 
         super().write_end()
 
-        self.file.seek(-2, 1)  # Remove the final comma
-        self.file.write("\n]}".encode("utf-8"))
-        self.file.close()
+        if self.separator != JSONWriter.SEPARATOR:
+            self.file.write(("]\n}" if self.pretty else "]}").encode("utf-8"))
+        else:
+            self.file.write(("\n    ]\n}" if self.pretty else "\n]}").encode("utf-8"))
 
-    def write_folder_start(
-        self, folder_name: str, accessed_time: int, modified_time: int, created_time: int
-    ) -> None:
-        """Write the start of a folder entry."""
+        self.close_output()
 
-        super().write_folder_start(folder_name, accessed_time, modified_time, created_time)
+    def write_fragment_start(self, parent_path: str, depth: int, block_size: int) -> None:
+        """Start writing a fragment of the output, to be added to it later with `append_fragment`.
 
-        self.file.write(JSONWriter.OPEN_BRACE)
-        self.file.write(JSONWriter.TYPE_FOLDER)
+        The writer adding the fragment writes the separator before it, so the fragment starts
+        without one.
+        """
+        super().write_fragment_start(parent_path, depth, block_size)
+        self.separator = ""
 
-        self.file.write(JSONWriter.FIELD_NAME)
-        self.file.write(folder_name.encode("utf-8"))
-        self.file.write(JSONWriter.STRING_COMMA)
+    def start_entry(self) -> None:
+        """Prepare the output for another entry in the current folder."""
 
-        self.file.write(JSONWriter.FIELD_ACCESSED)
-        self.file.write(str(accessed_time).encode("utf-8"))
-        self.file.write(JSONWriter.COMMA)
+        if self.separator:
+            self.file.write(self.separator.encode("utf-8"))
 
-        self.file.write(JSONWriter.FIELD_MODIFIED)
-        self.file.write(str(modified_time).encode("utf-8"))
-        self.file.write(JSONWriter.COMMA)
+        self.separator = JSONWriter.SEPARATOR
 
-        self.file.write(JSONWriter.FIELD_CREATED)
-        self.file.write(str(created_time).encode("utf-8"))
-        self.file.write(JSONWriter.COMMA)
+    def _first_separator(self) -> str:
+        # The compact templates already end with a new line
+        return "\n" if self.pretty else ""
 
-        self.file.write(JSONWriter.FIELD_CONTENTS)
+    def write_folder_start(
+        self, folder_name: str, accessed_time: int, modified_time: int, created_time: int
+    ) -> None:
+        """Write the start of a folder entry."""
 
-        if os.environ.get("PYTEST_CURRENT_TEST"):
+        super().write_folder_start(folder_name, accessed_time, modified_time, created_time)
+
+        self.start_entry()
+
+        if self.pretty:
+            brace_indent = JSONWriter.INDENT * (2 * self.depth)
+            field_indent = brace_indent + JSONWriter.INDENT
+            template = (
+                f"{brace_indent}{{\n"
+                + f'{field_indent}"type": "folder",\n'
+                + f'{field_indent}"name": %s,\n'
+                + f'{field_indent}"accessed": %d,\n'
+                + f'{field_indent}"modified": %d,\n'
+                + f'{field_indent}"created": %d,\n'
+                + f'{field_indent}"contents": ['
+            )
+        else:
+            template = JSONWriter.FOLDER_START
+
+        self.file.write(
+            (
+                template
+                % (encode_basestring(folder_name), accessed_time, modified_time, created_time)
+            ).encode("utf-8")
+        )
+        self.separator = self._first_separator()
+
+        if self.flush_after_writes:
             self.file.flush()
 
     def write_folder_end(self) -> None:
         """Write the end of a folder entry."""
 
-        super().write_folder_end()
+        if self.pretty:
+            brace_indent = JSONWriter.INDENT * (2 * self.depth)
+            folder_end = f"]\n{brace_indent}}}"
 
-        self.file.seek(-2, 1)  # Remove the final comma
-        self.file.write(JSONWriter.FOLDER_END)
+            if self.separator == JSONWriter.SEPARATOR:
+                folder_end = f"\n{brace_indent}{JSONWriter.INDENT}" + folder_end
+        else:
+            folder_end = JSONWriter.FOLDER_END
 
-        if os.environ.get("PYTEST_CURRENT_TEST"):
+        self.file.write(folder_end.encode("utf-8"))
+        self.separator = JSONWriter.SEPARATOR
+
+        super().write_folder_end()
+
+        if self.flush_after_writes:
             self.file.flush()
 
     def write_file(
         self, file_name: str, size: int, accessed_time: int, modified_time: int, created_time: int
     ) -> None:
         """Write the start of a file entry."""
+        self.write_files([(file_name, size, accessed_time, modified_time, created_time)])
+
+    def write_files(self, files: list[writer.FileEntry]) -> None:
+        """Write the entries for a batch of files in the current folder."""
+
+        self.count_files(files)
+        self.start_entry()
+
+        if self.pretty:
+            brace_indent = JSONWriter.INDENT * (2 * self.depth + 2)
+            field_indent = brace_indent + JSONWriter.INDENT
+            template = (
+                f"{brace_indent}{{\n"
+                + f'{field_indent}"type": "file",\n'
+                + f'{field_indent}"name": %s,\n'
+                + f'{field_indent}"size": %d,\n'
+                + f'{field_indent}"accessed": %d,\n'
+                + f'{field_indent}"modified": %d,\n'
+                + f'{field_indent}"created": %d\n'
+                + f"{brace_indent}}}"
+            )
+        else:
+            template = JSONWriter.FILE
+
+        block_size = self.block_size
+
+        self.file.write(
+            JSONWriter.SEPARATOR.join(
+                [
+                    template
+                    % (
+                        encode_basestring(file_name),
+                        max(block_size, size),
+                        accessed_time,
+                        modified_time,
+                        created_time,
+                    )
+                    for file_name, size, accessed_time, modified_time, created_time in files
+                ]
+            ).encode("utf-8")
+        )
 
-        super().write_file(file_name, size, accessed_time, modified_time, created_time)
-
-        self.file.write(JSONWriter.OPEN_BRACE)
-        self.file.write(JSONWriter.TYPE_FILE)
-
-        self.file.write(JSONWriter.FIELD_NAME)
-        self.file.write(file_name.encode("utf-8"))
-        self.file.write(JSONWriter.STRING_COMMA)
-
-        self.file.write(JSONWriter.FIELD_SIZE)
-        self.file.write(str(max(self.block_size, size)).encode("utf-8"))
-        self.file.write(JSONWriter.COMMA)
-
-        self.file.write(JSONWriter.FIELD_ACCESSED)
-        self.file.write(str(accessed_time).encode("utf-8"))
-        self.file.write(JSONWriter.COMMA)
-
-        self.file.write(JSONWriter.FIELD_MODIFIED)
-        self.file.write(str(modified_time).encode("utf-8"))
-        self.file.write(JSONWriter.COMMA)
-
-        self.file.write(JSONWriter.FIELD_CREATED)
-        self.file.write(str(created_time).encode("utf-8"))
-        # No comma here
-
-        self.file.write(JSONWriter.CLOSE_BRACE)
-
-        if os.environ.get("PYTEST_CURRENT_TEST"):
+        if self.flush_after_writes:
             self.file.flush()
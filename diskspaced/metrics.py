@@ -0,0 +1,295 @@
+"""Report the progress of a scan while it runs."""
+
+import errno
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, TextIO
+
+from diskspaced.scan_stats import ScanStats
+from diskspaced.writer import Writer
+
+PROMETHEUS_PREFIX = "diskspaced_"
+
+# The metrics written to a Prometheus textfile, as (key, name, type, help)
+PROMETHEUS_METRICS = [
+    ("elapsed_seconds", "elapsed_seconds", "gauge", "Seconds since the scan started."),
+    ("folders", "folders_total", "counter", "Folders scanned."),
+    ("files", "files_total", "counter", "Files scanned."),
+    ("bytes_seen", "file_bytes_total", "counter", "Total size of the files scanned."),
+    ("bytes_written", "output_bytes_total", "counter", "Bytes written to the output."),
+    ("syscalls", "syscalls_total", "counter", "Calls to scandir and lstat."),
+    ("depth", "depth", "gauge", "How many folders deep the scan is."),
+    ("expected_bytes", "expected_file_bytes", "gauge", "Used space on the disk being scanned."),
+    ("eta_seconds", "eta_seconds", "gauge", "Estimated seconds until the scan finishes."),
+    ("finished", "finished", "gauge", "1 once the scan has finished."),
+]
+
+
+def _error_name(error_number: int) -> str:
+    return errno.errorcode.get(error_number, str(error_number))
+
+
+def _format_bytes(size: float) -> str:
+    if size < 1024:
+        return f"{size:.0f} B"
+
+    for unit in ["KB", "MB", "GB"]:
+        size /= 1024
+
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+
+    return f"{size / 1024:.1f} TB"
+
+
+def _format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+
+    if hours:
+        return f"{hours}h {minutes}m"
+
+    if minutes:
+        return f"{minutes}m {seconds}s"
+
+    return f"{seconds}s"
+
+
+def _write_atomically(path: str, contents: str) -> None:
+    # Anything reading the file never sees it half written
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+
+    with open(temporary_path, "w", encoding="utf-8") as f:
+        f.write(contents)
+
+    os.replace(temporary_path, path)
+
+
+class ScanReporter:
+    """Reports the progress of a scan at a fixed interval, on a background thread.
+
+    The scan only increments the counters in its `ScanStats`, and the reporter reads them each
+    interval, so a scan being reported on runs as fast as one which isn't. The progress can be
+    written as a line to a stream such as stderr, as a Prometheus textfile for the node exporter
+    to collect, and as a JSON status file. The files are replaced as a whole each time.
+
+    The time left is estimated from the used space on the disk, against the total size of the
+    files seen so far. It is only a rough guide when scanning part of a disk, or a disk with
+    lots of space taken up by something other than the sizes of files, such as many small files
+    each taking up a whole block.
+    """
+
+    interval: float
+    stream: TextIO | None
+    prometheus_path: str | None
+    status_path: str | None
+    stats: ScanStats
+    writer: Writer | None
+    expected_bytes: int | None
+    start_time: float
+    stopping: threading.Event
+    thread: threading.Thread | None
+
+    def __init__(
+        self,
+        interval: float = 10.0,
+        stream: TextIO | None = None,
+        prometheus_path: str | None = None,
+        status_path: str | None = None,
+    ) -> None:
+        """Create the reporter, which doesn't report anything until it is started.
+
+        :param interval: How many seconds to wait between reports
+        :param stream: The stream to write a line of progress to each report, if any
+        :param prometheus_path: The path of a Prometheus textfile to write, if any
+        :param status_path: The path of a JSON status file to write, if any
+        """
+
+        if interval <= 0:
+            raise ValueError(f"The report interval must be more than 0: {interval}")
+
+        self.interval = interval
+        self.stream = stream
+        self.prometheus_path = prometheus_path
+        self.status_path = status_path
+        self.stats = ScanStats()
+        self.writer = None
+        self.expected_bytes = None
+        self.start_time = time.monotonic()
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def start(
+        self, stats: ScanStats, writer: Writer | None = None, expected_bytes: int | None = None
+    ) -> None:
+        """Start reporting on a scan.
+
+        :param stats: The statistics the scan is updating
+        :param writer: The writer the scan is writing to, if any
+        :param expected_bytes: The total size the files are expected to come to, if known
+        """
+
+        self.stats = stats
+        self.writer = writer
+        self.expected_bytes = expected_bytes
+        self.start_time = time.monotonic()
+        self.stopping.clear()
+
+        self.thread = threading.Thread(
+            target=self._report_until_stopped, name="diskspaced-reporter", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self, finished: bool = True) -> None:
+        """Stop reporting, after a final report.
+
+        :param finished: Whether the scan finished, rather than stopping because of an error
+        """
+
+        if self.thread is None:
+            return
+
+        self.stopping.set()
+        self.thread.join()
+        self.thread = None
+
+        try:
+            self.report(finished)
+        except OSError as e:
+            # The scan itself is done, so it shouldn't fail, or have its own error hidden, here
+            logging.warning(f"Failed to report the progress of the scan: {e}")
+
+    def _report_until_stopped(self) -> None:
+        while not self.stopping.wait(self.interval):
+            try:
+                self.report()
+            except OSError as e:
+                # A report which can't be written shouldn't stop the scan, or the next report
+                logging.warning(f"Failed to report the progress of the scan: {e}")
+
+    def snapshot(self, finished: bool = False) -> dict[str, Any]:
+        """Get the current metrics.
+
+        :param finished: Whether the scan has finished
+
+        :returns: The metrics, by name
+        """
+
+        stats = self.stats
+        elapsed = max(time.monotonic() - self.start_time, 1e-9)
+
+        # Read once, so the rates are for the same counts as are reported
+        folders = stats.folders
+        files = stats.files
+        bytes_seen = stats.bytes_seen
+
+        # Copied in one step, as the scan could add to it while it is being read
+        skipped = dict(stats.skipped)
+
+        eta_seconds = None
+
+        if finished:
+            eta_seconds = 0.0
+        elif self.expected_bytes is not None and bytes_seen > 0:
+            remaining_bytes = max(self.expected_bytes - bytes_seen, 0)
+            eta_seconds = remaining_bytes / (bytes_seen / elapsed)
+
+        return {
+            "elapsed_seconds": elapsed,
+            "folders": folders,
+            "files": files,
+            "folders_per_second": folders / elapsed,
+            "files_per_second": files / elapsed,
+            "bytes_seen": bytes_seen,
+            "bytes_written": None if self.writer is None else self.writer.bytes_written(),
+            "syscalls": stats.syscalls,
+            "depth": stats.depth,
+            "skipped": {_error_name(number): count for number, count in skipped.items()},
+            "expected_bytes": self.expected_bytes,
+            "eta_seconds": eta_seconds,
+            "finished": finished,
+        }
+
+    def report(self, finished: bool = False) -> None:
+        """Report the current metrics everywhere the reporter writes to.
+
+        :param finished: Whether the scan has finished
+        """
+
+        metrics = self.snapshot(finished)
+
+        if self.stream is not None:
+            self.stream.write(self.format_line(metrics) + "\n")
+            self.stream.flush()
+
+        if self.prometheus_path is not None:
+            _write_atomically(self.prometheus_path, self.format_prometheus(metrics))
+
+        if self.status_path is not None:
+            _write_atomically(self.status_path, json.dumps(metrics, indent=4) + "\n")
+
+    @staticmethod
+    def format_line(metrics: dict[str, Any]) -> str:
+        """Format metrics as a line for people to read.
+
+        :param metrics: The metrics, from `snapshot`
+
+        :returns: The line, without a newline at the end
+        """
+
+        parts = [
+            f"{metrics['files']:,} files ({metrics['files_per_second']:,.0f}/s)",
+            f"{metrics['folders']:,} folders ({metrics['folders_per_second']:,.0f}/s)",
+            _format_bytes(metrics["bytes_seen"]),
+            f"depth {metrics['depth']}",
+        ]
+
+        if metrics["bytes_written"] is not None:
+            parts.append(f"{_format_bytes(metrics['bytes_written'])} written")
+
+        if metrics["skipped"]:
+            skipped = ", ".join(f"{count:,} {name}" for name, count in metrics["skipped"].items())
+            parts.append(f"skipped {skipped}")
+
+        if metrics["finished"]:
+            parts.append(f"finished in {_format_duration(metrics['elapsed_seconds'])}")
+        elif metrics["eta_seconds"] is not None:
+            parts.append(f"about {_format_duration(metrics['eta_seconds'])} left")
+
+        return "Scanned " + ", ".join(parts)
+
+    @staticmethod
+    def format_prometheus(metrics: dict[str, Any]) -> str:
+        """Format metrics in the Prometheus text exposition format.
+
+        :param metrics: The metrics, from `snapshot`
+
+        :returns: The text
+        """
+
+        lines = []
+
+        for key, name, metric_type, description in PROMETHEUS_METRICS:
+            value = metrics[key]
+
+            if value is None:
+                continue
+
+            if isinstance(value, bool):
+                value = int(value)
+
+            lines.append(f"# HELP {PROMETHEUS_PREFIX}{name} {description}")
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}{name} {metric_type}")
+            lines.append(f"{PROMETHEUS_PREFIX}{name} {value!r}")
+
+        name = f"{PROMETHEUS_PREFIX}skipped_entries_total"
+        lines.append(f"# HELP {name} Entries skipped because of an error, by the error.")
+        lines.append(f"# TYPE {name} counter")
+
+        for error_name, count in metrics["skipped"].items():
+            lines.append(f'{name}{{errno="{error_name}"}} {count}')
+
+        return "\n".join(lines) + "\n"
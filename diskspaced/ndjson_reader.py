@@ -0,0 +1,143 @@
+"""Read scans written as newline delimited JSON."""
+
+import io
+import json
+import os
+from typing import Iterator
+
+from diskspaced.events import FILES, FOLDER_END_EVENT, FOLDER_START, ScanEvent
+from diskspaced.ndjson_writer import NAME_ENCODING, NAME_ERRORS
+from diskspaced.output import open_input
+from diskspaced.writer import FileEntry, Writer
+
+# The most files to hold before giving them as an event, so that huge folders don't use up memory
+FILE_BATCH_SIZE = 4096
+
+
+class NDJSONReader:
+    """Reads a scan written by `NDJSONWriter` to a single file, a line at a time.
+
+    The records have to be in the order they were written, with each folder before everything
+    in it, which is how `NDJSONWriter` writes them. A folder is ended as soon as a record comes
+    which isn't in it, and the records are turned into the same events as a scan gives as it
+    goes.
+    """
+
+    input_path: str
+    stream: io.TextIOWrapper
+    root_path: str
+    disk_usage_total: int
+    disk_usage_used: int
+    disk_usage_free: int
+    block_size: int
+
+    def __init__(self, input_path: str) -> None:
+        """Open a newline delimited JSON scan, and read the details of the disk from it.
+
+        :param input_path: The path of the scan to read, which can be compressed
+        """
+
+        self.input_path = input_path
+        self.stream = io.TextIOWrapper(
+            open_input(input_path), encoding=NAME_ENCODING, errors=NAME_ERRORS
+        )
+
+        try:
+            header = json.loads(self.stream.readline() or "null")
+        except BaseException:
+            self.close()
+            raise
+
+        if not isinstance(header, dict) or header.get("type") != "scan":
+            self.close()
+            raise ValueError(f"Not a newline delimited JSON scan: {self.input_path}")
+
+        self.root_path = header.get("root_path", "")
+        self.disk_usage_total = header.get("volume_size", 0)
+        self.disk_usage_used = header.get("used_space", 0)
+        self.disk_usage_free = header.get("free_space", 0)
+        self.block_size = header.get("block_size", 0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def close(self) -> None:
+        """Close the file."""
+        self.stream.close()
+
+    def replay(self, writer: Writer) -> None:
+        """Write the scan out again with another writer, such as to convert it to JSON.
+
+        :param writer: The writer to write the scan with, which mustn't have been started
+        """
+
+        writer.write_start(
+            self.root_path,
+            self.disk_usage_total,
+            self.disk_usage_used,
+            self.disk_usage_free,
+            self.block_size,
+        )
+        writer.write_events(self.events())
+        writer.write_end()
+
+    def events(self) -> Iterator[ScanEvent]:
+        """Read the entries in the scan as events, in the order they were written.
+
+        The root folder has the root path of the scan as its path.
+
+        :returns: An iterator over the events
+        """
+
+        # The ids and paths of the open folders, with the root's parent of None at the start
+        open_folders: list[int | None] = [None]
+        paths: list[str] = []
+        files: list[FileEntry] = []
+
+        for line in self.stream:
+            record = json.loads(line)
+            parent_id = record["parent"]
+
+            if files and (parent_id != open_folders[-1] or len(files) >= FILE_BATCH_SIZE):
+                yield (FILES, files)
+                files = []
+
+            while parent_id != open_folders[-1]:
+                if len(open_folders) == 1:
+                    raise ValueError(f"Record {record['id']} is out of order: {self.input_path}")
+
+                open_folders.pop()
+                paths.pop()
+                yield FOLDER_END_EVENT
+
+            if record["type"] == "folder":
+                path = os.path.join(paths[-1], record["name"]) if paths else self.root_path
+                yield (
+                    FOLDER_START,
+                    record["name"],
+                    path,
+                    record["accessed"],
+                    record["modified"],
+                    record["created"],
+                )
+                open_folders.append(record["id"])
+                paths.append(path)
+            else:
+                files.append(
+                    (
+                        record["name"],
+                        record["size"],
+                        record["accessed"],
+                        record["modified"],
+                        record["created"],
+                    )
+                )
+
+        if files:
+            yield (FILES, files)
+
+        for _ in range(len(open_folders) - 1):
+            yield FOLDER_END_EVENT
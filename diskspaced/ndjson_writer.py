@@ -0,0 +1,349 @@
+"""Write results as newline delimited JSON, one record per line."""
+
+from io import IOBase
+import json
+import os
+import time
+from json.encoder import encode_basestring
+
+from diskspaced import writer
+from diskspaced.output import STDOUT_PATH, Compression, open_output
+
+# Example:
+# {"type":"scan","root_path":"/Users/dalemyers/Downloads","volume_size":494384795648,...}
+# {"id":1,"parent":null,"type":"folder","name":"Downloads","accessed":1,"modified":2,"created":3}
+# {"id":2,"parent":1,"type":"folder","name":"foo","accessed":1,"modified":2,"created":3}
+# {"id":3,"parent":2,"type":"file","name":"bar","size":1234,"accessed":1,"modified":2,"created":3}
+
+# The start of every record, up to the parent id, which fragments are renumbered from
+RECORD_PREFIX = '{"id":'
+PARENT_PREFIX = ',"parent":'
+
+# Names which aren't valid UTF-8 are written as the bytes they were on disk
+NAME_ENCODING = "utf-8"
+NAME_ERRORS = "surrogateescape"
+
+# How many records of a fragment to renumber at once
+FRAGMENT_BATCH_SIZE = 10000
+
+# The extensions which `Compression.from_path` looks for, which chunk numbers go before
+COMPRESSION_EXTENSIONS = [".gz", ".zst"]
+
+
+def chunk_path(output_path: str, index: int) -> str:
+    """Get the path of one of the files a rotated output is split into.
+
+    The number goes before the extensions, so `scan.ndjson.gz` becomes `scan.000001.ndjson.gz`.
+
+    :param output_path: The path of the output
+    :param index: The number of the file, from 1
+
+    :returns: The path of the file
+    """
+
+    compression_extension = ""
+
+    for extension in COMPRESSION_EXTENSIONS:
+        if output_path.endswith(extension):
+            compression_extension = extension
+            output_path = output_path[: -len(extension)]
+
+    base, extension = os.path.splitext(output_path)
+
+    return f"{base}.{index:06}{extension}{compression_extension}"
+
+
+class NDJSONWriter(writer.Writer):
+    """Writes every folder and file as a record on a line of its own.
+
+    Each record has an `id`, and the `id` of the folder it is in as its `parent`, so the tree
+    can be put back together without reading the records in order, and the output can be split
+    at any line and processed in parallel. The root folder has a `parent` of null. The first
+    line is a record with a `type` of `scan`, with the details of the disk.
+
+    Records are only ever appended, so nothing has to be held back. With `records_per_file`,
+    the output is split into numbered files of at most that many records, which are each valid
+    on their own. With `flush_interval`, the output is flushed at least that often, so that
+    something following it sees the records as they are written.
+
+    Pretty printing isn't supported, as every record has to be on one line.
+    """
+
+    FOLDER = (
+        '{"id":%d,"parent":%d,"type":"folder","name":%s,"accessed":%d,"modified":%d,"created":%d}\n'
+    )
+    ROOT_FOLDER = '{"id":%d,"parent":null,"type":"folder","name":%s,"accessed":%d,"modified":%d,"created":%d}\n'
+    FILE = '{"id":%d,"parent":%d,"type":"file","name":%s,"size":%d,"accessed":%d,"modified":%d,"created":%d}\n'
+
+    records_per_file: int
+    flush_interval: float
+    next_id: int
+    parent_ids: list[int]
+    records_in_file: int
+    output_paths: list[str]
+    rotated_bytes: int
+    last_flush: float
+
+    def __init__(
+        self,
+        output_path: str,
+        file_print_count: int,
+        pretty: bool = False,
+        compression: Compression | None = None,
+        records_per_file: int = 0,
+        flush_interval: float = 0,
+    ) -> None:
+        """Create the writer.
+
+        :param output_path: The path to write to, or `-` for stdout
+        :param file_print_count: The number of files to print after. Zero disables printing.
+        :param pretty: Ignored, as each record has to be on one line
+        :param compression: The compression to apply to the output, if any
+        :param records_per_file: The most records to write to each file, or 0 to write them all
+                                 to one file
+        :param flush_interval: The longest time in seconds to go without flushing the output,
+                               or 0 to only flush it when it is closed
+        """
+
+        super().__init__(output_path, file_print_count, pretty, compression)
+
+        if records_per_file < 0:
+            raise ValueError(f"The records per file can't be negative: {records_per_file}")
+
+        if records_per_file and output_path == STDOUT_PATH:
+            raise ValueError("The output can't be split into several files when it is stdout")
+
+        self.records_per_file = records_per_file
+        self.flush_interval = flush_interval
+        self.next_id = 1
+
+        # The ids of the open folders, with the one new records are in at the end
+        self.parent_ids = []
+
+        self.records_in_file = 0
+        self.output_paths = []
+        self.rotated_bytes = 0
+        self.last_flush = time.monotonic()
+
+    def open_output(self) -> IOBase:
+        """Open the next file of the output, if it is split into several, or the output if not.
+
+        :returns: The opened output
+        """
+
+        output_path = self.output_path
+
+        if self.records_per_file:
+            output_path = chunk_path(self.output_path, len(self.output_paths) + 1)
+
+        output = open_output(output_path, self.compression)
+        self.output_paths.append(output_path)
+        self.records_in_file = 0
+
+        return output
+
+    def write_start(
+        self,
+        root_path: str,
+        disk_usage_total: int,
+        disk_usage_used: int,
+        disk_usage_free: int,
+        block_size: int,
+    ) -> None:
+        """Write the record with the details of the scan."""
+
+        self.output_paths = []
+        self.rotated_bytes = 0
+
+        super().write_start(
+            root_path, disk_usage_total, disk_usage_used, disk_usage_free, block_size
+        )
+
+        self.next_id = 1
+        self.parent_ids = []
+
+        header = {
+            "type": "scan",
+            "root_path": root_path,
+            "volume_size": disk_usage_total,
+            "free_space": disk_usage_free,
+            "used_space": disk_usage_used,
+            "block_size": block_size,
+        }
+
+        # The details of the scan aren't counted as a record, as they are only in the first file
+        self.file.write(
+            (json.dumps(header, ensure_ascii=False, separators=(",", ":")) + "\n").encode(
+                NAME_ENCODING, NAME_ERRORS
+            )
+        )
+
+    def write_end(self) -> None:
+        """Close the output."""
+
+        super().write_end()
+        self.close_output()
+
+    def bytes_written(self) -> int | None:
+        """Get how many bytes have been written to all of the files so far."""
+
+        written = super().bytes_written()
+
+        if written is None or self.closed_output_size is not None:
+            return written
+
+        return self.rotated_bytes + written
+
+    def _rotate(self) -> None:
+        file_size = super().bytes_written() or 0
+        self.file.close()
+        self.rotated_bytes += file_size
+        self.file = self.open_output()
+
+    def _write_records(self, records: list[str]) -> None:
+        if self.records_per_file:
+            while self.records_in_file + len(records) > self.records_per_file:
+                room = self.records_per_file - self.records_in_file
+                self.file.write("".join(records[:room]).encode(NAME_ENCODING, NAME_ERRORS))
+                records = records[room:]
+                self._rotate()
+
+            self.records_in_file += len(records)
+
+        self.file.write("".join(records).encode(NAME_ENCODING, NAME_ERRORS))
+
+        if self.flush_after_writes:
+            self.file.flush()
+        elif self.flush_interval and time.monotonic() - self.last_flush >= self.flush_interval:
+            self.file.flush()
+            self.last_flush = time.monotonic()
+
+    def fragment_writer(self, fragment_path: str) -> "NDJSONWriter":
+        """Create a writer with the same settings as this one to write a fragment with.
+
+        Fragments are written to a single file, and split up when they are added to the output.
+        """
+        return NDJSONWriter(fragment_path, self.file_print_count)
+
+    def write_fragment_start(self, parent_path: str, depth: int, block_size: int) -> None:
+        """Start writing a fragment of the output, numbering its records from 1.
+
+        The folder the fragment will be added to has an id of 0 in it, until it is added.
+        """
+
+        super().write_fragment_start(parent_path, depth, block_size)
+        self.next_id = 1
+        self.parent_ids = [0]
+
+    def append_fragment(self, fragment_path: str) -> None:
+        """Add a fragment written by another writer, renumbering its records to follow on from
+        the records written so far.
+
+        :param fragment_path: The path of the fragment to add
+        """
+
+        offset = self.next_id - 1
+        parent_id = self.parent_ids[-1]
+        records = []
+        last_id = 0
+
+        with open(fragment_path, "r", encoding=NAME_ENCODING, errors=NAME_ERRORS) as fragment:
+            for line in fragment:
+                id_end = line.index(",", len(RECORD_PREFIX))
+                parent_start = id_end + len(PARENT_PREFIX)
+                parent_end = line.index(",", parent_start)
+                last_id = int(line[len(RECORD_PREFIX) : id_end])
+                fragment_parent_id = int(line[parent_start:parent_end])
+
+                records.append(
+                    '{"id":%d,"parent":%d'
+                    % (
+                        last_id + offset,
+                        parent_id if fragment_parent_id == 0 else fragment_parent_id + offset,
+                    )
+                    + line[parent_end:]
+                )
+
+                if len(records) >= FRAGMENT_BATCH_SIZE:
+                    self._write_records(records)
+                    records = []
+
+        self._write_records(records)
+        self.next_id += last_id
+
+    def write_folder_start(
+        self, folder_name: str, accessed_time: int, modified_time: int, created_time: int
+    ) -> None:
+        """Write the record for a folder."""
+
+        super().write_folder_start(folder_name, accessed_time, modified_time, created_time)
+
+        folder_id = self.next_id
+        self.next_id += 1
+        encoded_name = encode_basestring(folder_name)
+
+        if self.parent_ids:
+            record = NDJSONWriter.FOLDER % (
+                folder_id,
+                self.parent_ids[-1],
+                encoded_name,
+                accessed_time,
+                modified_time,
+                created_time,
+            )
+        else:
+            record = NDJSONWriter.ROOT_FOLDER % (
+                folder_id,
+                encoded_name,
+                accessed_time,
+                modified_time,
+                created_time,
+            )
+
+        self.parent_ids.append(folder_id)
+        self._write_records([record])
+
+    def write_folder_end(self) -> None:
+        """End a folder, which doesn't write anything."""
+
+        self.parent_ids.pop()
+        super().write_folder_end()
+
+    def write_file(
+        self, file_name: str, size: int, accessed_time: int, modified_time: int, created_time: int
+    ) -> None:
+        """Write the record for a file."""
+        self.write_files([(file_name, size, accessed_time, modified_time, created_time)])
+
+    def write_files(self, files: list[writer.FileEntry]) -> None:
+        """Write the records for a batch of files in the current folder."""
+
+        self.count_files(files)
+
+        first_id = self.next_id
+        self.next_id += len(files)
+        parent_id = self.parent_ids[-1]
+        block_size = self.block_size
+        template = NDJSONWriter.FILE
+
+        self._write_records(
+            [
+                template
+                % (
+                    record_id,
+                    parent_id,
+                    encode_basestring(file_name),
+                    max(block_size, size),
+                    accessed_time,
+                    modified_time,
+                    created_time,
+                )
+                for record_id, (
+                    file_name,
+                    size,
+                    accessed_time,
+                    modified_time,
+                    created_time,
+                ) in enumerate(files, first_id)
+            ]
+        )
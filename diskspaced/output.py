@@ -0,0 +1,232 @@
+"""Open the streams that results are written to and read back from."""
+
+import enum
+import gzip
+import io
+import queue
+import sys
+import threading
+from typing import Any, BinaryIO, cast
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+STDOUT_PATH = "-"
+"""The output path which means write to stdout."""
+
+# The bytes which compressed files start with
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+class Compression(enum.Enum):
+    """Represents the compression applied to the output."""
+
+    GZIP = "gzip"
+    ZSTD = "zstd"
+
+    @staticmethod
+    def from_path(output_path: str) -> "Compression | None":
+        """Get the compression implied by the extension of the output path.
+
+        :param output_path: The path the output will be written to
+
+        :returns: The compression to use, if any
+        """
+
+        if output_path.endswith(".gz"):
+            return Compression.GZIP
+
+        if output_path.endswith(".zst"):
+            return Compression.ZSTD
+
+        return None
+
+
+class BackgroundCompressor(io.BufferedIOBase):
+    """Compresses everything written to it on a background thread.
+
+    Writes are gathered into chunks, which are handed to a thread that compresses them and writes
+    them to the underlying file. Both zlib and zstandard release the GIL while compressing, so
+    the scan carries on while the previous chunk is being compressed. The number of chunks
+    waiting is bounded, so a slow output slows the scan down instead of using up memory.
+    """
+
+    CHUNK_SIZE = 1024 * 1024
+    MAX_QUEUED_CHUNKS = 8
+
+    output: io.BufferedIOBase
+    compressor: Any
+    chunks: queue.Queue
+    pending: list[bytes]
+    pending_size: int
+    position: int
+    error: BaseException | None
+    thread: threading.Thread
+
+    def __init__(self, output: io.BufferedIOBase, compressor: Any) -> None:
+        """Create a new compressor.
+
+        :param output: The file to write the compressed data to, which is closed with this
+        :param compressor: An object with `compress` and `flush` methods, such as the one from
+                           `zlib.compressobj`
+        """
+        super().__init__()
+
+        self.output = output
+        self.compressor = compressor
+        self.chunks = queue.Queue(BackgroundCompressor.MAX_QUEUED_CHUNKS)
+        self.pending = []
+        self.pending_size = 0
+        self.position = 0
+        self.error = None
+        self.thread = threading.Thread(
+            target=self._compress_chunks, name="diskspaced-compressor", daemon=True
+        )
+        self.thread.start()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        if self.closed:  # pylint: disable=using-constant-test
+            raise ValueError("write to closed file")
+
+        self._raise_error()
+
+        self.pending.append(bytes(data))
+        self.pending_size += len(data)
+        self.position += len(data)
+
+        if self.pending_size >= BackgroundCompressor.CHUNK_SIZE:
+            self._send_pending()
+
+        return len(data)
+
+    def tell(self) -> int:
+        """Get how many bytes have been written, before they were compressed."""
+        return self.position
+
+    def flush(self) -> None:
+        """Hand anything written so far to the background thread, without waiting for it."""
+
+        if not self.closed:
+            self._send_pending()
+
+    def close(self) -> None:
+        """Compress anything left, wait for the background thread and close the output."""
+
+        if self.closed:  # pylint: disable=using-constant-test
+            return
+
+        try:
+            self._send_pending()
+            self.chunks.put(None)
+            self.thread.join()
+            self.output.close()
+        finally:
+            super().close()
+
+        self._raise_error()
+
+    def _send_pending(self) -> None:
+        if self.pending:
+            self.chunks.put(b"".join(self.pending))
+            self.pending = []
+            self.pending_size = 0
+
+    def _raise_error(self) -> None:
+        if self.error is not None:
+            raise OSError(f"Failed to write compressed output: {self.error}") from self.error
+
+    def _compress_chunks(self) -> None:
+        while True:
+            chunk = self.chunks.get()
+
+            # After an error the chunks are still taken off the queue, so that writes never block
+            if self.error is not None and chunk is not None:
+                continue
+
+            try:
+                if chunk is None:
+                    if self.error is None:
+                        self.output.write(self.compressor.flush())
+                    return
+
+                self.output.write(self.compressor.compress(chunk))
+            # pylint: disable=broad-except
+            except BaseException as ex:
+                # pylint: enable=broad-except
+                self.error = ex
+
+
+def open_output(output_path: str, compression: Compression | None = None) -> io.BufferedIOBase:
+    """Open the output for writing.
+
+    Writers only ever write forwards, so the output can be anything which can be streamed to,
+    such as a pipe.
+
+    :param output_path: The path to write to, or `-` for stdout
+    :param compression: The compression to apply to the output, if any
+
+    :returns: The opened output
+    """
+
+    # pylint: disable=consider-using-with
+    if output_path == STDOUT_PATH:
+        # Closing the output shouldn't close stdout itself
+        sys.stdout.flush()
+        output = open(sys.stdout.fileno(), "wb", closefd=False)
+    else:
+        output = open(output_path, "wb")
+    # pylint: enable=consider-using-with
+
+    if compression is None:
+        return output
+
+    if compression == Compression.GZIP:
+        # A window size of 16 + 15 writes a gzip header and trailer around the deflate stream
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    elif compression == Compression.ZSTD:
+        if zstandard is None:
+            output.close()
+            raise ValueError("zstd compression requires the zstandard package to be installed")
+
+        compressor = zstandard.ZstdCompressor().compressobj()
+    else:
+        output.close()
+        raise ValueError(f"Unknown compression: {compression}")
+
+    return BackgroundCompressor(output, compressor)
+
+
+def open_input(input_path: str) -> BinaryIO:
+    """Open a file which was written by a writer for reading, decompressing it if it is
+    compressed.
+
+    The compression is found from the start of the file rather than its extension.
+
+    :param input_path: The path to read from
+
+    :returns: The opened file
+    """
+
+    # pylint: disable=consider-using-with
+    raw = open(input_path, "rb")
+    magic = raw.peek(4)[:4]
+
+    if magic[:2] == GZIP_MAGIC:
+        return cast(BinaryIO, gzip.GzipFile(fileobj=raw, mode="rb"))
+
+    if magic == ZSTD_MAGIC:
+        if zstandard is None:
+            raw.close()
+            raise ValueError("zstd compression requires the zstandard package to be installed")
+
+        return cast(BinaryIO, io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw)))
+    # pylint: enable=consider-using-with
+
+    return raw
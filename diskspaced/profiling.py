@@ -0,0 +1,351 @@
+"""Find out where the time in a scan goes."""
+
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+from typing import Any, Iterable, Iterator
+
+from diskspaced.events import ScanEvent
+from diskspaced.scanner import FolderEntry, FolderLister, Listing
+from diskspaced.writer import Writer
+
+PHASES = ["list", "stat", "walk", "encode", "output"]
+
+PHASE_DESCRIPTIONS = {
+    "list": "listing folders (scandir)",
+    "stat": "looking at entries (lstat)",
+    "walk": "walking the tree",
+    "encode": "encoding entries in the writer",
+    "output": "writing and compressing the output",
+}
+
+# The number of functions and allocation sites to show in the report
+REPORT_LINES = 25
+
+
+class LatencyHistogram:
+    """Counts durations in buckets which double in size, from under a microsecond upwards."""
+
+    buckets: list[int]
+    count: int
+    total_ns: int
+    max_ns: int
+
+    def __init__(self) -> None:
+        self.buckets = [0] * 40
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def add(self, duration_ns: int) -> None:
+        """Count a duration.
+
+        :param duration_ns: The duration in nanoseconds
+        """
+
+        self.buckets[min((duration_ns // 1000).bit_length(), len(self.buckets) - 1)] += 1
+        self.count += 1
+        self.total_ns += duration_ns
+        self.max_ns = max(self.max_ns, duration_ns)
+
+    def percentile(self, fraction: float) -> int:
+        """Get the upper bound of the bucket a percentile of the durations falls in.
+
+        :param fraction: The percentile, as a fraction such as 0.99
+
+        :returns: The upper bound in microseconds
+        """
+
+        target = fraction * self.count
+        seen = 0
+
+        for index, count in enumerate(self.buckets):
+            seen += count
+
+            if seen >= target and count:
+                return 1 << index
+
+        return 0
+
+    def format(self) -> str:
+        """Format the histogram as a table with a bar for each bucket in use.
+
+        :returns: The table
+        """
+
+        if self.count == 0:
+            return "  No folders were listed\n"
+
+        used = [index for index, count in enumerate(self.buckets) if count]
+        largest = max(self.buckets)
+        lines = []
+
+        for index in range(used[0], used[-1] + 1):
+            lower = 0 if index == 0 else 1 << (index - 1)
+            label = f"{lower:,}-{1 << index:,} µs"
+            scale = "#" * round(40 * self.buckets[index] / largest)
+            lines.append(f"  {label:>24} {self.buckets[index]:>10,} {scale}")
+
+        lines.append(
+            f"  mean {self.total_ns / self.count / 1000:,.1f} µs, "
+            + f"p50 < {self.percentile(0.5):,} µs, p99 < {self.percentile(0.99):,} µs, "
+            + f"max {self.max_ns / 1000:,.1f} µs"
+        )
+
+        return "\n".join(lines) + "\n"
+
+
+class _ProfilingLister(FolderLister):
+    """Times the listings given to the walk by another lister."""
+
+    lister: FolderLister
+    profiler: "ScanProfiler"
+
+    def __init__(self, lister: FolderLister, profiler: "ScanProfiler") -> None:
+        super().__init__(lister.process_in_order, lister.stats, lister.scan_filter)
+        self.lister = lister
+        self.profiler = profiler
+
+        # The lister adds the time it spends in lstat, which is taken out of listing at the end
+        lister.phase_ns = profiler.phase_ns
+
+    def list_folder(self, folder_path: str) -> Listing:
+        start = time.perf_counter_ns()
+        listing = self.lister.list_folder(folder_path)
+        duration = time.perf_counter_ns() - start
+
+        self.profiler.phase_ns["list"] += duration
+        self.profiler.listing_latency.add(duration)
+
+        return listing
+
+    def write_folder(self, folder: FolderEntry, writer: Writer) -> bool:
+        return self.lister.write_folder(folder, writer)
+
+    def close(self) -> None:
+        self.lister.close()
+
+
+class _ProfilingOutput(io.BufferedIOBase):
+    """Times the writes to the output of a writer."""
+
+    output: Any
+    profiler: "ScanProfiler"
+
+    def __init__(self, output: Any, profiler: "ScanProfiler") -> None:
+        super().__init__()
+        self.output = output
+        self.profiler = profiler
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        start = time.perf_counter_ns()
+        written = self.output.write(data)
+        self.profiler.phase_ns["output"] += time.perf_counter_ns() - start
+        return written
+
+    def flush(self) -> None:
+        start = time.perf_counter_ns()
+        self.output.flush()
+        self.profiler.phase_ns["output"] += time.perf_counter_ns() - start
+
+    def tell(self) -> int:
+        return self.output.tell()
+
+    def close(self) -> None:
+        if self.closed:  # pylint: disable=using-constant-test
+            return
+
+        # Closing waits for any compression still going on
+        start = time.perf_counter_ns()
+
+        try:
+            # This flushes the output, so it has to come before the output is closed
+            super().close()
+            self.output.close()
+        finally:
+            self.profiler.phase_ns["output"] += time.perf_counter_ns() - start
+
+
+class ScanProfiler:
+    """Times each phase of a scan, and can profile it with cProfile or tracemalloc as well.
+
+    The time the walk spends waiting for each folder to be listed is counted as listing, along
+    with a histogram of how long each folder took, and the time spent in `lstat` while listing
+    is split out of it. With several workers, listing is the time the walk waited for the pool
+    rather than the time the pool took, and only the `lstat` calls made on the walk's own thread
+    are split out. The time spent in the writer is split into encoding and writing the output,
+    which includes compressing it, and the rest is the walk itself.
+
+    Nothing is timed unless a profiler is given to the scan, as the lister, the output and the
+    events are only wrapped when there is one.
+    """
+
+    use_cprofile: bool
+    use_tracemalloc: bool
+    phase_ns: dict[str, int]
+    listing_latency: LatencyHistogram
+    events: int
+    total_ns: int
+    profile: cProfile.Profile | None
+    memory_snapshot: tracemalloc.Snapshot | None
+    peak_memory: int
+    started_tracemalloc: bool
+
+    def __init__(self, use_cprofile: bool = False, use_tracemalloc: bool = False) -> None:
+        """Create the profiler.
+
+        :param use_cprofile: Whether to profile every function call with cProfile as well, which
+                             slows the scan down several times over
+        :param use_tracemalloc: Whether to trace memory allocations with tracemalloc as well
+        """
+
+        self.use_cprofile = use_cprofile
+        self.use_tracemalloc = use_tracemalloc
+        self.phase_ns = dict.fromkeys(PHASES, 0)
+        self.listing_latency = LatencyHistogram()
+        self.events = 0
+        self.total_ns = 0
+        self.profile = None
+        self.memory_snapshot = None
+        self.peak_memory = 0
+        self.started_tracemalloc = False
+
+    def wrap_lister(self, lister: FolderLister) -> FolderLister:
+        """Wrap a lister so that the listings it gives are timed.
+
+        :param lister: The lister to wrap
+
+        :returns: A lister giving the same listings
+        """
+        return _ProfilingLister(lister, self)
+
+    def wrap_output(self, writer: Writer) -> None:
+        """Time the writes to every output a writer opens, before it is started.
+
+        The writer's `open_output` is wrapped rather than the file it has open, so outputs it
+        opens part way through, such as when `NDJSONWriter` moves on to the next file, are timed
+        as well. Writers which don't write to a file opened that way, such as `SQLiteWriter`,
+        have their writes counted as encoding.
+
+        :param writer: The writer to time the writes of
+        """
+
+        open_output = writer.open_output
+
+        def open_timed_output() -> Any:
+            return _ProfilingOutput(open_output(), self)
+
+        writer.open_output = open_timed_output  # type: ignore[method-assign]
+
+    def time_events(self, events: Iterable[ScanEvent]) -> Iterator[ScanEvent]:
+        """Time how long it takes to walk to each event, including listing folders.
+
+        :param events: The events from the walk
+
+        :returns: The same events
+        """
+
+        iterator = iter(events)
+
+        while True:
+            start = time.perf_counter_ns()
+            event = next(iterator, None)
+            self.phase_ns["walk"] += time.perf_counter_ns() - start
+
+            if event is None:
+                return
+
+            self.events += 1
+            yield event
+
+    def start(self) -> None:
+        """Start timing the scan, along with cProfile and tracemalloc if they are used."""
+
+        self.total_ns = -time.perf_counter_ns()
+
+        if self.use_tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracemalloc = True
+
+        if self.use_cprofile:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    def stop(self) -> None:
+        """Stop timing the scan, and work out how long each phase took."""
+
+        if self.profile is not None:
+            self.profile.disable()
+
+        if self.use_tracemalloc and tracemalloc.is_tracing():
+            self.memory_snapshot = tracemalloc.take_snapshot()
+            self.peak_memory = tracemalloc.get_traced_memory()[1]
+
+            if self.started_tracemalloc:
+                tracemalloc.stop()
+                self.started_tracemalloc = False
+
+        self.total_ns += time.perf_counter_ns()
+
+        # The walk was timed including the listings, the listings including lstat, and the writer
+        # including its output
+        self.phase_ns["walk"] -= self.phase_ns["list"]
+        self.phase_ns["list"] -= self.phase_ns["stat"]
+        self.phase_ns["encode"] = self.total_ns - sum(
+            self.phase_ns[phase] for phase in PHASES if phase != "encode"
+        )
+
+    def report(self) -> str:
+        """Format a report of where the time went.
+
+        :returns: The report
+        """
+
+        total_ns = max(self.total_ns, 1)
+        lines = [f"Scan took {total_ns / 1e9:.3f}s for {self.events:,} events", ""]
+
+        for phase in PHASES:
+            duration = self.phase_ns[phase]
+            lines.append(
+                f"  {PHASE_DESCRIPTIONS[phase]:<40} {duration / 1e9:>9.3f}s "
+                + f"{100 * duration / total_ns:>5.1f}%"
+            )
+
+        lines += ["", "Time to list each folder:", self.listing_latency.format()]
+
+        if self.profile is not None:
+            stream = io.StringIO()
+            stats = pstats.Stats(self.profile, stream=stream)
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(REPORT_LINES)
+            lines += ["cProfile, by cumulative time:", stream.getvalue()]
+
+        if self.memory_snapshot is not None:
+            lines.append(f"Peak traced memory {self.peak_memory / 1024 / 1024:,.1f} MB")
+            lines.append("Largest allocations still held at the end, by line:")
+
+            for statistic in self.memory_snapshot.statistics("lineno")[:REPORT_LINES]:
+                lines.append(f"  {statistic}")
+
+            lines.append("")
+
+        return "\n".join(lines)
+
+    def write_report(self, report_path: str) -> None:
+        """Write the report to a file, along with the raw cProfile statistics if there are any.
+
+        The statistics are written to the same path with `.pstats` added, which tools such as
+        snakeviz can read.
+
+        :param report_path: The path to write the report to
+        """
+
+        with open(report_path, "w", encoding="utf-8") as f:
+            f.write(self.report())
+
+        if self.profile is not None:
+            self.profile.dump_stats(report_path + ".pstats")
@@ -0,0 +1,395 @@
+"""Compare two scans as streams of events, without loading either of them into memory."""
+
+import json
+import os
+from typing import Iterable, Iterator
+
+from diskspaced.events import FILES, FOLDER_END, FOLDER_START, FileEntry, ScanEvent
+from diskspaced.ndjson_writer import NAME_ENCODING, NAME_ERRORS
+from diskspaced.output import Compression, open_output
+
+# Example:
+# {"change":"resized","type":"file","path":"/srv/db/data.bin","old_size":4096,"new_size":8192,"delta":4096}
+# {"change":"added","type":"folder","path":"/srv/db/wal","old_size":0,"new_size":65536,"delta":65536}
+# {"change":"resized","type":"folder","path":"/srv/db","old_size":4096,"new_size":77824,"delta":73728}
+
+ADDED = "added"
+REMOVED = "removed"
+RESIZED = "resized"
+
+
+class DiffStats:
+    """Counts of what changed between two scans.
+
+    Everything in folders which were added or removed is counted, and folders which are in both
+    scans are counted as resized if the total size of the files under them changed. The sizes
+    are the total size of the files in each scan.
+    """
+
+    changes: dict[tuple[str, str], int]
+    old_size: int
+    new_size: int
+
+    def __init__(self) -> None:
+        # The number of changes by the kind of change and the type of entry
+        self.changes = {
+            (change, entry_type): 0
+            for change in [ADDED, REMOVED, RESIZED]
+            for entry_type in ["file", "folder"]
+        }
+
+        self.old_size = 0
+        self.new_size = 0
+
+    def __repr__(self) -> str:
+        changes = ", ".join(
+            f"{change}: {self.changes[change, 'file']} files {self.changes[change, 'folder']} folders"
+            for change in [ADDED, REMOVED, RESIZED]
+        )
+        return f"DiffStats({changes}, {self.old_size} -> {self.new_size} bytes)"
+
+
+class _Side:
+    """One of the scans being compared, which can be looked ahead on by an event."""
+
+    events: Iterator[ScanEvent]
+    block_size: int
+    next_event: ScanEvent | None
+
+    def __init__(self, events: Iterable[ScanEvent], block_size: int) -> None:
+        self.events = iter(events)
+        self.block_size = block_size
+        self.next_event = next(self.events, None)
+
+    def take(self) -> ScanEvent:
+        """Take the next event.
+
+        :returns: The event
+        """
+
+        event = self.next_event
+
+        if event is None:
+            raise ValueError("The scan ends part of the way through")
+
+        self.next_event = next(self.events, None)
+        return event
+
+    def next_kind(self) -> int | None:
+        """Get the kind of the next event without taking it.
+
+        :returns: The kind, or None at the end of the scan
+        """
+        return None if self.next_event is None else self.next_event[0]
+
+    def next_folder_name(self) -> str | None:
+        """Get the name of the folder the next event starts, without taking it.
+
+        :returns: The name, or None if the next event doesn't start a folder
+        """
+
+        if self.next_event is None or self.next_event[0] != FOLDER_START:
+            return None
+
+        return self.next_event[1]
+
+    def files(self) -> Iterator[FileEntry]:
+        """Take the files in the current folder, which come after all of its sub-folders.
+
+        :returns: An iterator over the files
+        """
+
+        while self.next_kind() == FILES:
+            yield from self.round_sizes(self.take()[1])
+
+    def round_sizes(self, files: list[FileEntry]) -> list[FileEntry]:
+        """Round the sizes of files up to the block size, as writers do.
+
+        :param files: The files to round the sizes of
+
+        :returns: The files with their sizes rounded
+        """
+
+        if not self.block_size:
+            return files
+
+        block_size = self.block_size
+        return [(file[0], max(block_size, file[1])) + file[2:] for file in files]
+
+    def skip_folder(self) -> tuple[int, int, int]:
+        """Take a folder which was started and everything in it.
+
+        :returns: The total size of the files in it, and how many files and folders there are
+        """
+
+        depth = 1
+        size = 0
+        files = 0
+        folders = 1
+
+        while depth:
+            event = self.take()
+
+            if event[0] == FILES:
+                size += sum(file[1] for file in self.round_sizes(event[1]))
+                files += len(event[1])
+            elif event[0] == FOLDER_START:
+                depth += 1
+                folders += 1
+            else:
+                depth -= 1
+
+        return size, files, folders
+
+
+class _Folder:
+    """A folder which is in both scans, which is being compared."""
+
+    old_path: str
+    new_path: str
+    old_size: int
+    new_size: int
+
+    # The name of the last sub-folder on each side, to check they are in order
+    last_old_name: str
+    last_new_name: str
+
+    def __init__(self, old_path: str, new_path: str) -> None:
+        self.old_path = old_path
+        self.new_path = new_path
+        self.old_size = 0
+        self.new_size = 0
+        self.last_old_name = ""
+        self.last_new_name = ""
+
+
+class ScanDiff:
+    """Compares two scans a folder at a time, writing a record for each change as it is found.
+
+    Both scans have to be in alphabetical order, as they are when written with `--alphabetical`,
+    so that they can be merged like two sorted lists, with the sub-folders of each folder and
+    then the files in it taken from both at once. Only the folders which are open are held, so
+    the memory used depends on the depth of the tree, not its size.
+
+    Each change is written as a line of JSON, with the `change` (`added`, `removed` or
+    `resized`), the `type` of entry, its `path`, its `old_size`, `new_size` and the `delta`
+    between them. The size of a folder is the total size of the files under it, so a folder is
+    only written once everything in it has been compared, after the changes in it. Folders which
+    were added or removed are written without what was in them. Changes smaller than
+    `min_change` bytes aren't written, but are still counted.
+
+    The root folders of the scans are compared with each other, whatever their paths, and the
+    paths written are those in the new scan, apart from for removed entries.
+    """
+
+    output_path: str
+    compression: Compression | None
+    min_change: int
+    stats: DiffStats
+
+    def __init__(
+        self, output_path: str, min_change: int = 0, compression: Compression | None = None
+    ) -> None:
+        """Create the comparison.
+
+        :param output_path: The path to write the changes to, or `-` for stdout
+        :param min_change: The smallest change in bytes to write
+        :param compression: The compression to apply to the output, if any
+        """
+
+        self.output_path = output_path
+        self.compression = compression
+        self.min_change = min_change
+        self.stats = DiffStats()
+
+    def compare(
+        self,
+        old_events: Iterable[ScanEvent],
+        new_events: Iterable[ScanEvent],
+        old_block_size: int = 0,
+        new_block_size: int = 0,
+    ) -> DiffStats:
+        """Compare two scans, writing the changes between them.
+
+        The sizes of files in each scan are rounded up to its block size before they are
+        compared, as the JSON formats are written, so that scans which keep the sizes as they
+        were, such as binary scans, can be compared with those which don't.
+
+        :param old_events: The events of the older scan, such as from `BinaryReader.events`
+        :param new_events: The events of the newer scan
+        :param old_block_size: The block size of the older scan, or 0 if its sizes are already
+                               rounded, such as for JSON scans
+        :param new_block_size: The block size of the newer scan
+
+        :returns: Counts of what changed
+        """
+
+        old = _Side(old_events, old_block_size)
+        new = _Side(new_events, new_block_size)
+
+        if old.next_kind() != FOLDER_START or new.next_kind() != FOLDER_START:
+            raise ValueError("Both scans have to start with their root folder")
+
+        with open_output(self.output_path, self.compression) as output:
+            records: list[str] = []
+            stack = [_Folder(old.take()[2], new.take()[2])]
+
+            while stack:
+                folder = stack[-1]
+
+                if FOLDER_START in (old.next_kind(), new.next_kind()):
+                    sub_folder = self._compare_sub_folder(folder, old, new, records)
+
+                    if sub_folder is not None:
+                        stack.append(sub_folder)
+                else:
+                    self._compare_files(folder, old, new, records)
+
+                    if old.take()[0] != FOLDER_END or new.take()[0] != FOLDER_END:
+                        raise ValueError(
+                            "Folders have to come before the files next to them, as they do "
+                            + "when written with --alphabetical"
+                        )
+
+                    stack.pop()
+                    self._add_record(
+                        records,
+                        RESIZED,
+                        "folder",
+                        folder.new_path,
+                        folder.old_size,
+                        folder.new_size,
+                    )
+
+                    if stack:
+                        stack[-1].old_size += folder.old_size
+                        stack[-1].new_size += folder.new_size
+                    else:
+                        self.stats.old_size = folder.old_size
+                        self.stats.new_size = folder.new_size
+
+                if len(records) >= 1000:
+                    output.write("".join(records).encode(NAME_ENCODING, NAME_ERRORS))
+                    records = []
+
+            output.write("".join(records).encode(NAME_ENCODING, NAME_ERRORS))
+
+        return self.stats
+
+    def _compare_sub_folder(
+        self, folder: _Folder, old: _Side, new: _Side, records: list[str]
+    ) -> _Folder | None:
+        """Compare the next sub-folder of a folder, which is on one side or both.
+
+        :returns: The sub-folder to compare next if it is on both sides, or None if it was only
+                  on one, in which case it has already been taken
+        """
+
+        old_name = old.next_folder_name()
+        new_name = new.next_folder_name()
+
+        if old_name is not None:
+            self._check_order(folder.last_old_name, old_name, folder.old_path)
+
+        if new_name is not None:
+            self._check_order(folder.last_new_name, new_name, folder.new_path)
+
+        if old_name is not None and (new_name is None or old_name < new_name):
+            folder.last_old_name = old_name
+            path = old.take()[2]
+            size, files, folders = old.skip_folder()
+            folder.old_size += size
+            self._add_record(records, REMOVED, "folder", path, size, 0)
+            self.stats.changes[REMOVED, "folder"] += folders - 1
+            self.stats.changes[REMOVED, "file"] += files
+            return None
+
+        if new_name is not None and (old_name is None or new_name < old_name):
+            folder.last_new_name = new_name
+            path = new.take()[2]
+            size, files, folders = new.skip_folder()
+            folder.new_size += size
+            self._add_record(records, ADDED, "folder", path, 0, size)
+            self.stats.changes[ADDED, "folder"] += folders - 1
+            self.stats.changes[ADDED, "file"] += files
+            return None
+
+        folder.last_old_name = folder.last_new_name = new_name or ""
+        return _Folder(old.take()[2], new.take()[2])
+
+    def _compare_files(self, folder: _Folder, old: _Side, new: _Side, records: list[str]) -> None:
+        """Compare the files in a folder, after all of its sub-folders."""
+
+        old_files = old.files()
+        new_files = new.files()
+        old_file = next(old_files, None)
+        new_file = next(new_files, None)
+        last_old_name = ""
+        last_new_name = ""
+
+        while True:
+            if old_file is not None and (new_file is None or old_file[0] < new_file[0]):
+                self._check_order(last_old_name, old_file[0], folder.old_path)
+                last_old_name = old_file[0]
+                folder.old_size += old_file[1]
+                path = os.path.join(folder.old_path, old_file[0])
+                self._add_record(records, REMOVED, "file", path, old_file[1], 0)
+                old_file = next(old_files, None)
+            elif new_file is not None and (old_file is None or new_file[0] < old_file[0]):
+                self._check_order(last_new_name, new_file[0], folder.new_path)
+                last_new_name = new_file[0]
+                folder.new_size += new_file[1]
+                path = os.path.join(folder.new_path, new_file[0])
+                self._add_record(records, ADDED, "file", path, 0, new_file[1])
+                new_file = next(new_files, None)
+            elif old_file is not None and new_file is not None:
+                self._check_order(last_old_name, old_file[0], folder.old_path)
+                self._check_order(last_new_name, new_file[0], folder.new_path)
+                last_old_name = last_new_name = new_file[0]
+                folder.old_size += old_file[1]
+                folder.new_size += new_file[1]
+                path = os.path.join(folder.new_path, new_file[0])
+                self._add_record(records, RESIZED, "file", path, old_file[1], new_file[1])
+                old_file = next(old_files, None)
+                new_file = next(new_files, None)
+            else:
+                return
+
+    @staticmethod
+    def _check_order(last_name: str, name: str, folder_path: str) -> None:
+        if name <= last_name and last_name:
+            raise ValueError(
+                f"The entries in {folder_path} aren't in alphabetical order, as they are when "
+                + "written with --alphabetical"
+            )
+
+    def _add_record(
+        self,
+        records: list[str],
+        change: str,
+        entry_type: str,
+        path: str,
+        old_size: int,
+        new_size: int,
+    ) -> None:
+        """Count a change, and add a record of it if it is big enough."""
+
+        if old_size == new_size and change == RESIZED:
+            return
+
+        self.stats.changes[change, entry_type] += 1
+
+        if abs(new_size - old_size) < self.min_change:
+            return
+
+        records.append(
+            '{"change":"%s","type":"%s","path":%s,"old_size":%d,"new_size":%d,"delta":%d}\n'
+            % (
+                change,
+                entry_type,
+                json.dumps(path, ensure_ascii=False),
+                old_size,
+                new_size,
+                new_size - old_size,
+            )
+        )
@@ -0,0 +1,293 @@
+"""Estimate how much is in a folder tree by walking only a random sample of it."""
+
+import logging
+import math
+import random
+import statistics
+from typing import Any
+
+from diskspaced.scan_stats import ScanStats
+from diskspaced.scanner import FolderEntry, FolderLister, stat_root
+
+# Example:
+# {
+#    "root_path": "/srv",
+#    "volume_size": 494384795648,
+#    "free_space": 36101632000,
+#    "used_space": 458283163648,
+#    "confidence": 0.95,
+#    "sample_size": 8,
+#    "folders_listed": 1234,
+#    "total": {
+#        "size": {"estimate": 1234567, "low": 1000000, "high": 1500000},
+#        "file_count": {"estimate": 120, "low": 100, "high": 140},
+#        "folder_count": {"estimate": 30, "low": 25, "high": 35},
+#    },
+#    "folders": [{"path": "/srv/data", "size": {...}, "file_count": {...}, "folder_count": {...}}],
+# }
+
+# The positions of the counts in each estimate
+FILE_COUNT = 0
+FOLDER_COUNT = 1
+SIZE = 2
+
+METRIC_NAMES = ["file_count", "folder_count", "size"]
+
+
+class FolderEstimate:
+    """The estimated number of files, number of folders and size of everything under a folder.
+
+    Each total is an unbiased estimate of the real total, along with an estimate of its
+    variance, and `seen` has what was actually walked, which the real total can't be less than.
+    """
+
+    path: str
+    totals: list[float]
+    variances: list[float]
+    seen: list[int]
+
+    def __init__(
+        self, path: str, totals: list[float], variances: list[float], seen: list[int]
+    ) -> None:
+        self.path = path
+        self.totals = totals
+        self.variances = variances
+        self.seen = seen
+
+    def interval(
+        self, metric: int, z: float, upper_bound: float | None = None
+    ) -> tuple[float, float, float]:
+        """Get the estimate of a total with a confidence interval around it.
+
+        :param metric: Which total to get: `FILE_COUNT`, `FOLDER_COUNT` or `SIZE`
+        :param z: How many standard deviations the interval goes either side of the estimate
+        :param upper_bound: The most the total can be, if known
+
+        :returns: The estimate, and the lowest and highest it is likely to be
+        """
+
+        estimate = self.totals[metric]
+        half_width = z * math.sqrt(self.variances[metric])
+        low = max(float(self.seen[metric]), estimate - half_width)
+        high = estimate + half_width
+
+        if upper_bound is not None:
+            estimate = min(estimate, upper_bound)
+            low = min(low, upper_bound)
+            high = min(high, upper_bound)
+
+        return estimate, low, high
+
+    def to_json(self, z: float, size_bound: float | None = None) -> dict[str, Any]:
+        """Get the estimates as a document which can be written as JSON.
+
+        :param z: How many standard deviations the intervals go either side of the estimates
+        :param size_bound: The most the size can be, if known
+
+        :returns: The document
+        """
+
+        document: dict[str, Any] = {"path": self.path}
+
+        for metric, name in enumerate(METRIC_NAMES):
+            estimate, low, high = self.interval(metric, z, size_bound if metric == SIZE else None)
+            document[name] = {"estimate": round(estimate), "low": round(low), "high": round(high)}
+
+        return document
+
+
+def combine(
+    path: str, own: list[int], sampled: list[FolderEstimate], sub_folder_count: int
+) -> FolderEstimate:
+    """Estimate the totals of a folder from its own files and a sample of its sub-folders.
+
+    This is the usual two stage estimator for a simple random sample without replacement. Each
+    sampled sub-folder stands for `sub_folder_count / len(sampled)` of them, and the variance
+    adds the spread between the sampled sub-folders, shrunk by how much of them were sampled, to
+    the variances of the sampled sub-folders' own estimates, scaled up the same way.
+
+    :param path: The path of the folder
+    :param own: The counts of the folder itself: its files, 1 for itself and its files' size
+    :param sampled: The estimates of the sampled sub-folders
+    :param sub_folder_count: How many sub-folders there are in all
+
+    :returns: The estimate for the folder
+    """
+
+    totals = [float(value) for value in own]
+    variances = [0.0, 0.0, 0.0]
+    seen = list(own)
+
+    if not sampled:
+        return FolderEstimate(path, totals, variances, seen)
+
+    sample_count = len(sampled)
+    scale = sub_folder_count / sample_count
+
+    for metric in range(3):
+        values = [estimate.totals[metric] for estimate in sampled]
+        totals[metric] += scale * sum(values)
+        variances[metric] = scale * sum(estimate.variances[metric] for estimate in sampled)
+        seen[metric] += sum(estimate.seen[metric] for estimate in sampled)
+
+        if sample_count < sub_folder_count:
+            sampled_fraction = sample_count / sub_folder_count
+            variances[metric] += (
+                sub_folder_count**2
+                * (1 - sampled_fraction)
+                * statistics.variance(values)
+                / sample_count
+            )
+
+    return FolderEstimate(path, totals, variances, seen)
+
+
+class ScanEstimator:
+    """Walks a random sample of the sub-folders of each folder, and scales up what it finds.
+
+    Every folder directly in the root is walked, so that each of them has an estimate of its
+    own, and below them at most `sample_size` sub-folders of each folder are picked at random.
+    The files in each walked folder are all counted. The walk keeps an explicit stack of open
+    folders, like the scan, and combines the estimates of each folder's sampled sub-folders when
+    it ends.
+    """
+
+    lister: FolderLister
+    sample_size: int
+    random_source: random.Random
+
+    def __init__(self, lister: FolderLister, sample_size: int, seed: int | None = None) -> None:
+        """Create the estimator.
+
+        :param lister: The lister to get the contents of each folder from
+        :param sample_size: The most sub-folders of each folder to walk, which must be at least
+                            2, so that the spread between them can be measured
+        :param seed: The seed for picking sub-folders, for the same sample each time, if any
+        """
+
+        if sample_size < 2:
+            raise ValueError(f"The sample size must be at least 2: {sample_size}")
+
+        self.lister = lister
+        self.sample_size = sample_size
+        self.random_source = random.Random(seed)
+
+    def _sample(self, folders: list[FolderEntry], depth: int) -> list[FolderEntry]:
+        if depth == 0 or len(folders) <= self.sample_size:
+            return folders
+
+        return self.random_source.sample(folders, self.sample_size)
+
+    def estimate(self, folder_path: str) -> tuple[FolderEstimate, list[FolderEstimate]]:
+        """Estimate the totals of a folder tree.
+
+        :param folder_path: The path of the folder
+
+        :returns: The estimate for the whole tree, and one for each folder directly in it
+        """
+
+        stats: ScanStats = self.lister.stats
+        root = stat_root(folder_path, stats)
+
+        if root is None:
+            return FolderEstimate(folder_path, [0.0] * 3, [0.0] * 3, [0] * 3), []
+
+        top_level: list[FolderEstimate] = []
+
+        # Each open folder has its path, its own counts, the sampled sub-folders still to walk,
+        # how many sub-folders it has in all, and the estimates of the ones walked so far
+        stack: list[tuple[str, list[int], list[FolderEntry], int, list[FolderEstimate]]] = []
+        next_folder: FolderEntry | None = root
+
+        while True:
+            if next_folder is not None:
+                path = next_folder[1]
+                folders, files = self.lister.list_folder(path)
+                size = sum(file[1] for file in files)
+
+                stats.folders += 1
+                stats.files += len(files)
+                stats.bytes_seen += size
+
+                # Reversed, so that popping from the end walks them in the order they were listed
+                to_walk = list(reversed(self._sample(folders, len(stack))))
+                stack.append((path, [len(files), 1, size], to_walk, len(folders), []))
+                stats.depth = len(stack)
+
+            path, own, to_walk, sub_folder_count, walked = stack[-1]
+
+            if to_walk:
+                next_folder = to_walk.pop()
+                continue
+
+            next_folder = None
+            estimate = combine(path, own, walked, sub_folder_count)
+            stack.pop()
+            stats.depth = len(stack)
+
+            if not stack:
+                return estimate, top_level
+
+            if len(stack) == 1:
+                top_level.append(estimate)
+
+            stack[-1][4].append(estimate)
+
+
+# pylint: disable=too-many-arguments
+def estimate_report(
+    root_path: str,
+    disk_usage_total: int,
+    disk_usage_used: int,
+    disk_usage_free: int,
+    total: FolderEstimate,
+    top_level: list[FolderEstimate],
+    confidence: float,
+    sample_size: int,
+    folders_listed: int,
+) -> dict[str, Any]:
+    """Put together the report of an estimate, largest folders first.
+
+    The used space on the disk is an upper bound on every size, so no estimate goes over it, and
+    a warning is logged if the estimate of the whole tree had to be cut down to it.
+
+    :param root_path: The path of the folder which was estimated
+    :param disk_usage_total: The size of the disk
+    :param disk_usage_used: The used space on the disk
+    :param disk_usage_free: The free space on the disk
+    :param total: The estimate for the whole tree
+    :param top_level: The estimates for each folder directly in the root
+    :param confidence: How likely the real totals are to be inside the intervals, such as 0.95
+    :param sample_size: The most sub-folders of each folder which were walked
+    :param folders_listed: How many folders were walked
+
+    :returns: The report, which can be written as JSON
+    """
+
+    if total.totals[SIZE] > disk_usage_used:
+        logging.warning(
+            f"The estimated size {total.totals[SIZE]:.0f} is more than the used space on the "
+            + f"disk {disk_usage_used}, so it has been cut down to it"
+        )
+
+    z = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+    total_document = total.to_json(z, disk_usage_used)
+    del total_document["path"]
+
+    return {
+        "root_path": root_path,
+        "volume_size": disk_usage_total,
+        "free_space": disk_usage_free,
+        "used_space": disk_usage_used,
+        "confidence": confidence,
+        "sample_size": sample_size,
+        "folders_listed": folders_listed,
+        "total": total_document,
+        "folders": [
+            estimate.to_json(z, disk_usage_used)
+            for estimate in sorted(top_level, key=lambda estimate: -estimate.totals[SIZE])
+        ],
+    }
+
+
+# pylint: enable=too-many-arguments
@@ -0,0 +1,228 @@
+"""Rules for which parts of a tree a scan skips."""
+
+import os
+import re
+from typing import Iterable
+
+GLOB_SPECIAL_CHARACTERS = "*?["
+
+
+def glob_to_regex(pattern: str) -> str:
+    """Translate a glob into a regular expression which matches the same paths.
+
+    `*` and `?` don't match `/`, `**` matches anything including `/`, and `[...]` matches one of
+    a set of characters, or any character not in it if it starts with `!`.
+
+    :param pattern: The glob to translate
+
+    :returns: The regular expression, which must match the whole path
+    """
+
+    parts = []
+    index = 0
+
+    while index < len(pattern):
+        character = pattern[index]
+        index += 1
+
+        if character == "*":
+            if pattern.startswith("*", index):
+                parts.append(".*")
+                index += 1
+            else:
+                parts.append("[^/]*")
+        elif character == "?":
+            parts.append("[^/]")
+        elif character == "[":
+            negated = pattern.startswith("!", index)
+            start = index + 1 if negated else index
+
+            # A `]` straight after the opening of a set is part of it
+            end = pattern.find("]", start + 1 if pattern.startswith("]", start) else start)
+
+            # An unterminated set is matched as it is, as fnmatch does
+            if end == -1:
+                parts.append(re.escape(character))
+                continue
+
+            characters = re.sub(r"([\\\[\]^&~|])", r"\\\1", pattern[start:end])
+            parts.append(("[^" if negated else "[") + characters + "]")
+            index = end + 1
+        else:
+            parts.append(re.escape(character))
+
+    return "".join(parts)
+
+
+def _has_special_characters(glob: str) -> bool:
+    return any(character in glob for character in GLOB_SPECIAL_CHARACTERS)
+
+
+def _combine(regexes: list[str], template: str = "{}") -> re.Pattern | None:
+    if not regexes:
+        return None
+
+    return re.compile(template.format("|".join(regexes)))
+
+
+class ScanFilter:
+    """Decides which entries a scan skips, before they are looked at.
+
+    Globs without a `/` are matched against the names of entries, and globs with one against
+    their paths. A glob starting with `/` has to match the whole path, and any other has to match
+    the end of it, so `.cache/*` matches every entry in any folder named `.cache`. Regular
+    expressions are searched for anywhere in the path.
+
+    All of the rules are checked at once for each entry. Most globs in practice are plain names
+    or paths, which are looked up in sets, or names with a single `*` at the start or end, such
+    as `*.log`, which are checked with one `str.endswith` or `str.startswith` call for all of
+    them. The rest are compiled into a combined regular expression for each kind of rule, so the
+    cost of checking an entry grows slowly with the number of rules. The kinds are kept apart
+    because the regular expression engine can only skip quickly over the places a combined
+    expression can't match when its alternatives start in similar ways.
+
+    With `one_file_system`, folders on a different device to the root of the scan are skipped,
+    along with everything in them.
+    """
+
+    exclude_globs: tuple[str, ...]
+    exclude_regexes: tuple[str, ...]
+    one_file_system: bool
+    root_device: int | None
+    excluded_names: frozenset[str]
+    excluded_prefixes: tuple[str, ...]
+    excluded_suffixes: tuple[str, ...]
+    excluded_paths: frozenset[str]
+    name_pattern: re.Pattern | None
+    path_pattern: re.Pattern | None
+    path_end_pattern: re.Pattern | None
+    regex_pattern: re.Pattern | None
+
+    def __init__(
+        self,
+        exclude_globs: Iterable[str] = (),
+        exclude_regexes: Iterable[str] = (),
+        one_file_system: bool = False,
+    ) -> None:
+        """Compile the rules.
+
+        :param exclude_globs: Globs matching the entries to skip
+        :param exclude_regexes: Regular expressions matching the paths of the entries to skip
+        :param one_file_system: Whether to skip folders on other devices to the root
+
+        :raises ValueError: If a regular expression is invalid
+        """
+
+        self.exclude_globs = tuple(exclude_globs)
+        self.exclude_regexes = tuple(exclude_regexes)
+        self.one_file_system = one_file_system
+        self.root_device = None
+
+        excluded_names = set()
+        excluded_prefixes = set()
+        excluded_suffixes = set()
+        excluded_paths = set()
+        name_regexes = []
+        path_regexes = []
+        path_end_regexes = []
+        regexes = []
+
+        for glob in self.exclude_globs:
+            # A trailing `/` only says that it is meant to match a folder
+            glob = glob.rstrip("/") or glob
+
+            if "/" not in glob:
+                if not _has_special_characters(glob):
+                    excluded_names.add(glob)
+                elif glob.startswith("*") and not _has_special_characters(glob[1:]):
+                    excluded_suffixes.add(glob[1:])
+                elif glob.endswith("*") and not _has_special_characters(glob[:-1]):
+                    excluded_prefixes.add(glob[:-1])
+                else:
+                    name_regexes.append(glob_to_regex(glob))
+            elif glob.startswith("/"):
+                if _has_special_characters(glob):
+                    path_regexes.append(glob_to_regex(glob))
+                else:
+                    excluded_paths.add(os.path.normpath(glob))
+            else:
+                path_end_regexes.append(glob_to_regex(glob))
+
+        for regex in self.exclude_regexes:
+            try:
+                re.compile(regex)
+            except re.error as e:
+                raise ValueError(f"Invalid exclude regular expression {regex!r}: {e}") from e
+
+            regexes.append(f"(?:{regex})")
+
+        self.excluded_names = frozenset(excluded_names)
+        self.excluded_prefixes = tuple(sorted(excluded_prefixes))
+        self.excluded_suffixes = tuple(sorted(excluded_suffixes))
+        self.excluded_paths = frozenset(excluded_paths)
+        self.name_pattern = _combine(name_regexes)
+        self.path_pattern = _combine(path_regexes)
+
+        # Searched for in the path with a `/` in front, so they can match from its start
+        self.path_end_pattern = _combine(path_end_regexes, "/(?:{})\\Z")
+
+        self.regex_pattern = _combine(regexes)
+
+    def __repr__(self) -> str:
+        return (
+            f"ScanFilter(exclude_globs={list(self.exclude_globs)}, "
+            + f"exclude_regexes={list(self.exclude_regexes)}, "
+            + f"one_file_system={self.one_file_system})"
+        )
+
+    def set_root(self, root_path: str) -> None:
+        """Set the folder the scan starts from, whose device is the only one scanned with
+        `one_file_system`.
+
+        :param root_path: The path of the folder the scan starts from
+        """
+
+        if not self.one_file_system:
+            return
+
+        try:
+            self.root_device = os.lstat(root_path).st_dev
+        except OSError:
+            # The scan won't find anything to skip
+            self.root_device = None
+
+    def excludes(self, name: str, path: str) -> bool:
+        """Check whether an entry should be skipped.
+
+        :param name: The name of the entry
+        :param path: The path of the entry
+
+        :returns: True if the entry should be skipped
+        """
+
+        if name in self.excluded_names or path in self.excluded_paths:
+            return True
+
+        # Empty tuples never match
+        if name.endswith(self.excluded_suffixes) or name.startswith(self.excluded_prefixes):
+            return True
+
+        if self.name_pattern is not None and self.name_pattern.fullmatch(name):
+            return True
+
+        if self.path_pattern is not None and self.path_pattern.fullmatch(path):
+            return True
+
+        if self.path_end_pattern is not None and self.path_end_pattern.search("/" + path):
+            return True
+
+        return self.regex_pattern is not None and self.regex_pattern.search(path) is not None
+
+    def excludes_device(self, device: int) -> bool:
+        """Check whether a folder should be skipped because of the device it is on.
+
+        :param device: The device the folder is on
+
+        :returns: True if the folder should be skipped
+        """
+        return self.root_device is not None and device != self.root_device
@@ -0,0 +1,65 @@
+"""Statistics gathered while scanning."""
+
+
+class ScanStats:
+    """Counters gathered while scanning a folder tree.
+
+    `syscalls` counts the calls to `os.scandir` and `os.lstat` made by the scanner. Filesystems
+    which don't report the entry type in their directory listings cost the kernel one extra
+    `lstat` per entry inside `os.scandir`, which isn't counted here. `reused_folders` counts the
+    folders whose listing was taken from an index instead of listing them again.
+
+    `bytes_seen` is the total size of the files walked so far, and `depth` how many folders deep
+    the walk is. `skipped` counts the entries which couldn't be looked at by the number of the
+    error which stopped them, such as `errno.EACCES`, including folders which couldn't be listed.
+
+    The counters are only ever updated by the thread walking the tree, and can be read from
+    another thread while the scan goes, as `ScanReporter` does.
+    """
+
+    syscalls: int
+    folders: int
+    files: int
+    reused_folders: int
+    bytes_seen: int
+    depth: int
+    skipped: dict[int, int]
+
+    def __init__(self) -> None:
+        self.syscalls = 0
+        self.folders = 0
+        self.files = 0
+        self.reused_folders = 0
+        self.bytes_seen = 0
+        self.depth = 0
+        self.skipped = {}
+
+    def count_skipped(self, error_number: int) -> None:
+        """Count an entry which was skipped because of an error.
+
+        :param error_number: The number of the error
+        """
+        self.skipped[error_number] = self.skipped.get(error_number, 0) + 1
+
+    def merge(self, other: "ScanStats") -> None:
+        """Add the counts from another scan to these.
+
+        The depth is left as it is, as the other scan is finished or in another thread.
+
+        :param other: The statistics to add
+        """
+        self.syscalls += other.syscalls
+        self.folders += other.folders
+        self.files += other.files
+        self.reused_folders += other.reused_folders
+        self.bytes_seen += other.bytes_seen
+
+        for error_number, count in other.skipped.items():
+            self.skipped[error_number] = self.skipped.get(error_number, 0) + count
+
+    def __repr__(self) -> str:
+        return (
+            f"ScanStats(syscalls={self.syscalls}, folders={self.folders}, files={self.files}, "
+            + f"reused_folders={self.reused_folders}, bytes_seen={self.bytes_seen}, "
+            + f"skipped={self.skipped})"
+        )
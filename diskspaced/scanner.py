@@ -0,0 +1,333 @@
+"""Walk a folder tree and feed the results to a writer."""
+
+import errno
+import functools
+import os
+from operator import itemgetter
+import stat
+import time
+from typing import Callable, Generator, Iterator
+
+from diskspaced.constants import ACCEPTABLE_OS_ERRORS
+from diskspaced.events import FILES, FOLDER_END_EVENT, FOLDER_START, FileEntry, ScanEvent
+from diskspaced.scan_filter import ScanFilter
+from diskspaced.scan_stats import ScanStats
+from diskspaced.writer import Writer
+
+# A folder is listed as (name, path, accessed_time, modified_time, created_time), and a file as
+# the writer takes it.
+FolderEntry = tuple[str, str, int, int, int]
+Listing = tuple[list[FolderEntry], list[FileEntry]]
+
+# Yielded by `walk_steps` when it needs a folder listed
+LIST_FOLDER = -1
+
+
+# pylint: disable=too-many-branches
+def list_folder(
+    folder_path: str,
+    process_in_order: bool,
+    stats: ScanStats,
+    scan_filter: ScanFilter | None = None,
+    phase_ns: dict[str, int] | None = None,
+) -> Listing:
+    """List the contents of a folder.
+
+    Symbolic links are skipped using the entry type cached by `os.scandir`, and everything else
+    costs a single `lstat`. Entries excluded by the filter are skipped before they are looked at,
+    and folders on other devices before they are listed.
+
+    :param folder_path: The path of the folder to list
+    :param process_in_order: Whether to sort the contents by name
+    :param stats: The statistics to update
+    :param scan_filter: The rules for which entries to skip, if any
+    :param phase_ns: The times of each phase of a profiled scan, which the time spent in `lstat`
+                     is added to as `stat`, if any
+
+    :returns: The sub-folders and the files in the folder
+    """
+
+    folders: list[FolderEntry] = []
+    files: list[FileEntry] = []
+    syscalls = 1
+
+    try:
+        with os.scandir(folder_path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_symlink():
+                        continue
+
+                    if scan_filter is not None and scan_filter.excludes(entry.name, entry.path):
+                        continue
+
+                    syscalls += 1
+
+                    if phase_ns is None:
+                        details = entry.stat(follow_symlinks=False)
+                    else:
+                        start = time.perf_counter_ns()
+                        details = entry.stat(follow_symlinks=False)
+                        phase_ns["stat"] += time.perf_counter_ns() - start
+                except FileNotFoundError:
+                    # It could have been deleted in between listing and processing
+                    stats.count_skipped(errno.ENOENT)
+                    continue
+                except OSError as e:
+                    if e.errno in ACCEPTABLE_OS_ERRORS:
+                        stats.count_skipped(e.errno)
+                        continue
+                    raise
+
+                if stat.S_ISDIR(details.st_mode):
+                    if scan_filter is not None and scan_filter.excludes_device(details.st_dev):
+                        continue
+
+                    folders.append(
+                        (
+                            entry.name,
+                            entry.path,
+                            int(details.st_atime),
+                            int(details.st_mtime),
+                            int(details.st_ctime),
+                        )
+                    )
+                else:
+                    files.append(
+                        (
+                            entry.name,
+                            details.st_size,
+                            int(details.st_atime),
+                            int(details.st_mtime),
+                            int(details.st_ctime),
+                        )
+                    )
+    except FileNotFoundError:
+        stats.count_skipped(errno.ENOENT)
+    except OSError as e:
+        if e.errno not in ACCEPTABLE_OS_ERRORS:
+            raise
+        stats.count_skipped(e.errno)
+    finally:
+        stats.syscalls += syscalls
+
+    if process_in_order:
+        # Names are unique within a folder, so this orders by name alone
+        folders.sort()
+        files.sort()
+
+    return folders, files
+
+
+# pylint: enable=too-many-branches
+
+
+def lstat_folder(
+    folder_path: str, stats: ScanStats, phase_ns: dict[str, int] | None = None
+) -> os.stat_result | None:
+    """Get the details of a folder, without following it if it is a link.
+
+    :param folder_path: The path of the folder
+    :param stats: The statistics to update
+    :param phase_ns: The times of each phase of a profiled scan, which the time spent in `lstat`
+                     is added to as `stat`, if any
+
+    :returns: The details of the folder, or None if it has gone or can't be read
+    """
+
+    stats.syscalls += 1
+    start = time.perf_counter_ns() if phase_ns is not None else 0
+
+    try:
+        return os.lstat(folder_path)
+    except FileNotFoundError:
+        stats.count_skipped(errno.ENOENT)
+        return None
+    except OSError as e:
+        if e.errno in ACCEPTABLE_OS_ERRORS:
+            stats.count_skipped(e.errno)
+            return None
+        raise
+    finally:
+        if phase_ns is not None:
+            phase_ns["stat"] += time.perf_counter_ns() - start
+
+
+def stat_root(folder_path: str, stats: ScanStats) -> FolderEntry | None:
+    """Get the entry for the folder a scan starts from.
+
+    :param folder_path: The path of the folder
+    :param stats: The statistics to update
+
+    :returns: The entry for the folder, or None if it can't be scanned
+    """
+
+    folder_details = lstat_folder(folder_path, stats)
+
+    if folder_details is None or stat.S_ISLNK(folder_details.st_mode):
+        return None
+
+    return (
+        os.path.basename(folder_path),
+        folder_path,
+        int(folder_details.st_atime),
+        int(folder_details.st_mtime),
+        int(folder_details.st_ctime),
+    )
+
+
+class FolderLister:
+    """Lists folders one at a time as the walk reaches them.
+
+    When the scan is profiled, `phase_ns` has the times of each phase, and the time spent in
+    `lstat` by the walk's own thread is added to it.
+    """
+
+    process_in_order: bool
+    stats: ScanStats
+    scan_filter: ScanFilter | None
+    phase_ns: dict[str, int] | None
+
+    def __init__(
+        self, process_in_order: bool, stats: ScanStats, scan_filter: ScanFilter | None = None
+    ) -> None:
+        self.process_in_order = process_in_order
+        self.stats = stats
+        self.scan_filter = scan_filter
+        self.phase_ns = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def list_folder(self, folder_path: str) -> Listing:
+        """List a folder the walk has just entered.
+
+        Folders are always requested in the order the walk visits them.
+
+        :param folder_path: The path of the folder to list
+
+        :returns: The sub-folders and the files in the folder
+        """
+        return list_folder(
+            folder_path, self.process_in_order, self.stats, self.scan_filter, self.phase_ns
+        )
+
+    def write_folder(self, folder: FolderEntry, writer: Writer) -> bool:
+        """Write a sub-folder and everything in it without the walk visiting it.
+
+        :param folder: The sub-folder the walk has reached
+        :param writer: The writer to send the results to
+
+        :returns: True if the folder was written, or False if the walk should visit it
+        """
+        return False
+
+    def close(self) -> None:
+        """Release anything held by the lister."""
+
+
+def walk_steps(
+    root: FolderEntry,
+    stats: ScanStats,
+    write_folder: Callable[[FolderEntry], bool] | None = None,
+) -> Generator[ScanEvent, Listing, None]:
+    """Walk a folder tree, without listing any folders itself.
+
+    This is the walk shared by `walk_tree` and `walk_tree_async`, which differ only in how they
+    list folders. It yields the events in the order they should be written. When it needs a
+    folder listed, it yields `(LIST_FOLDER, path)` instead, and the listing has to be sent back
+    to it.
+
+    Sub-folders are yielded before the files next to them. The walk keeps an explicit stack of
+    open folders rather than recursing, so the depth of the tree is only limited by memory.
+
+    :param root: The folder to walk
+    :param stats: The statistics to update
+    :param write_folder: Called with each sub-folder before it is walked, which can write the
+                         sub-folder itself and return True to skip it
+
+    :returns: A generator of the events
+    """
+
+    yield (FOLDER_START,) + root
+    stats.folders += 1
+
+    # Each open folder has an iterator over the sub-folders still to visit, and the files to
+    # write once they have all been visited.
+    stack: list[tuple[Iterator[FolderEntry], list[FileEntry]]] = []
+
+    folders, files = yield (LIST_FOLDER, root[1])
+    stack.append((iter(folders), files))
+    stats.depth = 1
+
+    while stack:
+        sub_folders, files = stack[-1]
+        sub_folder = next(sub_folders, None)
+
+        if sub_folder is not None:
+            if write_folder is not None and write_folder(sub_folder):
+                continue
+
+            yield (FOLDER_START,) + sub_folder
+            stats.folders += 1
+
+            folders, files = yield (LIST_FOLDER, sub_folder[1])
+            stack.append((iter(folders), files))
+            stats.depth = len(stack)
+            continue
+
+        if files:
+            stats.files += len(files)
+            stats.bytes_seen += sum(map(itemgetter(1), files))
+            yield (FILES, files)
+
+        stack.pop()
+        stats.depth = len(stack)
+        yield FOLDER_END_EVENT
+
+
+def walk_tree(
+    folder_path: str, lister: FolderLister, writer: Writer | None = None
+) -> Iterator[ScanEvent]:
+    """Walk the folder tree, yielding an event for each folder and each batch of files in it.
+
+    :param folder_path: The path of the folder to walk
+    :param lister: The lister to get the contents of each folder from
+    :param writer: The writer the events are going to, if any, which the lister can write
+                   sub-folders to itself instead of them being walked
+
+    :returns: An iterator over the events
+    """
+
+    root = stat_root(folder_path, lister.stats)
+
+    if root is None:
+        return
+
+    write_folder = None
+
+    if writer is not None:
+        write_folder = functools.partial(lister.write_folder, writer=writer)
+
+    steps = walk_steps(root, lister.stats, write_folder)
+    event = next(steps, None)
+
+    while event is not None:
+        if event[0] == LIST_FOLDER:
+            event = steps.send(lister.list_folder(event[1]))
+        else:
+            yield event
+            event = next(steps, None)
+
+
+def scan_tree(folder_path: str, writer: Writer, lister: FolderLister) -> None:
+    """Scan the folder tree, writing the folders and files in it to the writer.
+
+    :param folder_path: The path of the folder to scan
+    :param writer: The writer to send the results to
+    :param lister: The lister to get the contents of each folder from
+    """
+    writer.write_events(walk_tree(folder_path, lister, writer))
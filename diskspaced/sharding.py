@@ -0,0 +1,215 @@
+"""Scan subtrees in separate processes and merge the results into a single output."""
+
+from concurrent.futures import Future, ProcessPoolExecutor
+import heapq
+import itertools
+import os
+import tempfile
+
+from diskspaced.scan_filter import ScanFilter
+from diskspaced.scan_stats import ScanStats
+from diskspaced.scanner import FolderEntry, FolderLister, Listing, scan_tree, stat_root
+from diskspaced.threaded_lister import ThreadedFolderLister
+from diskspaced.writer import Writer
+
+SHARDS_PER_PROCESS = 8
+"""How many shards to aim for per process, so that idle processes have something to pick up."""
+
+MAX_PLANNING_LISTINGS_PER_PROCESS = 64
+"""The most folders the main process lists per worker process while splitting the tree."""
+
+
+class _Shard:
+    """A subtree to be scanned by a worker process."""
+
+    __slots__ = ("folder", "depth", "weight", "fragment_path", "future")
+
+    folder: FolderEntry
+    depth: int
+    weight: int
+    fragment_path: str
+    future: Future | None
+
+    def __init__(self, folder: FolderEntry, depth: int, weight: int) -> None:
+        self.folder = folder
+        self.depth = depth
+        self.weight = weight
+        self.fragment_path = ""
+        self.future = None
+
+
+class _MergeLister(FolderLister):
+    """Gives the walk the folders listed by the main process, copying in the shards between them."""
+
+    listings: dict[str, Listing]
+    shards: dict[str, _Shard]
+
+    def __init__(
+        self,
+        process_in_order: bool,
+        stats: ScanStats,
+        listings: dict[str, Listing],
+        shards: dict[str, _Shard],
+    ) -> None:
+        super().__init__(process_in_order, stats)
+        self.listings = listings
+        self.shards = shards
+
+    def list_folder(self, folder_path: str) -> Listing:
+        return self.listings.pop(folder_path)
+
+    def write_folder(self, folder: FolderEntry, writer: Writer) -> bool:
+        shard = self.shards.get(folder[1])
+
+        if shard is None:
+            return False
+
+        assert shard.future is not None
+        self.stats.merge(shard.future.result())
+        writer.append_fragment(shard.fragment_path)
+        os.remove(shard.fragment_path)
+
+        return True
+
+
+def _scan_shard(
+    writer: Writer,
+    shard_path: str,
+    depth: int,
+    block_size: int,
+    process_in_order: bool,
+    workers: int,
+    lookahead: int,
+    scan_filter: ScanFilter | None,
+) -> ScanStats:
+    writer.write_fragment_start(os.path.dirname(shard_path), depth, block_size)
+
+    stats = ScanStats()
+    lister: FolderLister
+
+    if workers > 1:
+        lister = ThreadedFolderLister(process_in_order, stats, workers, lookahead, scan_filter)
+    else:
+        lister = FolderLister(process_in_order, stats, scan_filter)
+
+    with lister:
+        scan_tree(shard_path, writer, lister)
+
+    writer.write_fragment_end()
+
+    return stats
+
+
+def _plan_shards(
+    root_path: str, lister: FolderLister, target_shards: int, max_listings: int
+) -> tuple[dict[str, Listing], dict[str, _Shard]]:
+    """Split the tree into shards.
+
+    The folder with the most entries is split into its sub-folders until there are enough
+    shards. Folders without sub-folders aren't worth sending to another process, so they are
+    written out by the main process along with every folder that was split.
+
+    :returns: The listings of the folders written by the main process, and the shards by path
+    """
+
+    listings = {root_path: lister.list_folder(root_path)}
+    candidates: list[tuple[int, int, str, FolderEntry, int, Listing]] = []
+    order = itertools.count()
+
+    def add_candidates(folders: list[FolderEntry], depth: int) -> None:
+        for folder in folders:
+            listing = lister.list_folder(folder[1])
+            sub_folders, files = listing
+
+            if not sub_folders:
+                listings[folder[1]] = listing
+                continue
+
+            weight = len(sub_folders) + len(files)
+            heapq.heappush(candidates, (-weight, next(order), folder[1], folder, depth, listing))
+
+    add_candidates(listings[root_path][0], 1)
+
+    while (
+        candidates
+        and len(candidates) < target_shards
+        and len(listings) + len(candidates) < max_listings
+    ):
+        _, _, folder_path, _, depth, listing = heapq.heappop(candidates)
+        listings[folder_path] = listing
+        add_candidates(listing[0], depth + 1)
+
+    shards = {
+        folder_path: _Shard(folder, depth, -negative_weight)
+        for negative_weight, _, folder_path, folder, depth, _ in candidates
+    }
+
+    return listings, shards
+
+
+def sharded_scan(
+    folder_path: str,
+    writer: Writer,
+    stats: ScanStats,
+    process_in_order: bool,
+    processes: int,
+    workers: int = 1,
+    lookahead: int = 256,
+    scan_filter: ScanFilter | None = None,
+) -> None:
+    """Scan the folder tree on several processes, writing the results to the writer.
+
+    The tree is split into subtrees, each of which is scanned by a worker process with its own
+    writer into a fragment of the output. There are several subtrees per process, the ones with
+    the most entries at the top are handed out first, and each process picks up the next one as
+    soon as it is done with its last, so no process sits idle while others have work queued. The
+    fragments are then copied into the output as they are, in the order they would have been
+    written by a single process, so the result is byte for byte the same as a scan with one
+    process.
+
+    :param folder_path: The path of the folder to scan
+    :param writer: The writer to send the results to, which must have been started
+    :param stats: The statistics to update
+    :param process_in_order: Whether to process the contents of each folder by name
+    :param processes: The number of processes to scan on
+    :param workers: The number of threads to list folders on in each process
+    :param lookahead: The most folders to list ahead of the output when using several workers
+    :param scan_filter: The rules for which entries to skip, if any
+    """
+
+    if processes < 1:
+        raise ValueError(f"The number of processes must be at least 1: {processes}")
+
+    if stat_root(folder_path, stats) is None:
+        return
+
+    with FolderLister(process_in_order, stats, scan_filter) as lister:
+        listings, shards = _plan_shards(
+            folder_path,
+            lister,
+            processes * SHARDS_PER_PROCESS,
+            processes * MAX_PLANNING_LISTINGS_PER_PROCESS,
+        )
+
+    with tempfile.TemporaryDirectory(prefix="diskspaced-") as fragment_folder:
+        with ProcessPoolExecutor(processes) as executor:
+            try:
+                for index, shard in enumerate(sorted(shards.values(), key=lambda s: -s.weight)):
+                    shard.fragment_path = os.path.join(fragment_folder, f"{index}.fragment")
+                    shard.future = executor.submit(
+                        _scan_shard,
+                        writer.fragment_writer(shard.fragment_path),
+                        shard.folder[1],
+                        shard.depth,
+                        writer.block_size,
+                        process_in_order,
+                        workers,
+                        lookahead,
+                        scan_filter,
+                    )
+
+                with _MergeLister(process_in_order, stats, listings, shards) as merge_lister:
+                    scan_tree(folder_path, writer, merge_lister)
+            except BaseException:
+                executor.shutdown(wait=True, cancel_futures=True)
+                raise
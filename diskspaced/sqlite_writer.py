@@ -0,0 +1,402 @@
+"""Write results to a SQLite database, to be queried with SQL."""
+
+import os
+import sqlite3
+
+from diskspaced import writer
+from diskspaced.output import STDOUT_PATH, Compression
+
+# Example:
+# SELECT e.name, s.total_size FROM entries e JOIN subtree_sizes s ON s.id = e.id
+# WHERE e.parent_id = 1 ORDER BY s.total_size DESC LIMIT 10
+
+SCHEMA = """
+CREATE TABLE scan (
+    root_path TEXT NOT NULL,
+    volume_size INTEGER NOT NULL,
+    free_space INTEGER NOT NULL,
+    used_space INTEGER NOT NULL,
+    block_size INTEGER NOT NULL
+);
+CREATE TABLE entries (
+    id INTEGER PRIMARY KEY,
+    parent_id INTEGER,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    atime INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    ctime INTEGER NOT NULL,
+    is_dir INTEGER NOT NULL
+);
+"""
+
+# Built once everything has been loaded, as keeping them up to date slows down every insert
+INDEXES = """
+CREATE TABLE subtree_sizes (id INTEGER PRIMARY KEY, total_size INTEGER NOT NULL);
+CREATE INDEX entries_parent_id_name ON entries (parent_id, name);
+"""
+
+INSERT_ENTRY = "INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+
+# How many entries to insert with each `executemany`
+BATCH_SIZE = 50000
+
+# How many entries to insert in each transaction
+TRANSACTION_SIZE = 1000000
+
+# A row of the entries table
+EntryRow = tuple[int, int | None, str | bytes, int, int, int, int, int]
+
+
+def _encode_names(rows: list[EntryRow]) -> list[EntryRow]:
+    """Store names which aren't valid UTF-8 as the bytes they were on disk, as SQLite can't
+    store them as text."""
+
+    encoded_rows = []
+
+    for row in rows:
+        name = row[2]
+
+        if isinstance(name, str):
+            try:
+                name.encode("utf-8")
+            except UnicodeEncodeError:
+                row = row[:2] + (name.encode("utf-8", "surrogateescape"),) + row[3:]
+
+        encoded_rows.append(row)
+
+    return encoded_rows
+
+
+class SQLiteWriter(writer.Writer):
+    """Writes every folder and file as a row of the `entries` table of a SQLite database.
+
+    Each row has an `id`, the `parent_id` of the folder it is in (null for the root folder), its
+    `name`, `size`, times, and whether it `is_dir`. Ids are given in the order entries are
+    written, so a folder always comes before everything in it. The `scan` table has a single row
+    with the details of the disk.
+
+    Rows are gathered into large batches for `executemany`, in transactions of a million rows,
+    with the write-ahead log and `synchronous=OFF` while they are loaded, so that loading keeps
+    up with the scan. Nothing is indexed until the scan is finished, when the index of entries by
+    parent is built, and the `subtree_sizes` table is filled in with the total size of the files
+    under each folder, in a single pass backwards through the entries, as children always come
+    after their parents. The database is then switched back to a rollback journal, so it is a
+    single file.
+
+    Names which aren't valid UTF-8 are stored as blobs of the bytes they were on disk. A database
+    can't be written to stdout or compressed, and pretty printing doesn't apply.
+    """
+
+    connection: sqlite3.Connection | None
+    next_id: int
+    parent_ids: list[int]
+    rows: list[EntryRow]
+    rows_in_transaction: int
+
+    def __init__(
+        self,
+        output_path: str,
+        file_print_count: int,
+        pretty: bool = False,
+        compression: Compression | None = None,
+    ) -> None:
+        """Create the writer.
+
+        :param output_path: The path of the database to write, which is replaced if it exists
+        :param file_print_count: The number of files to print after. Zero disables printing.
+        :param pretty: Ignored, as there is no text to format
+        :param compression: Must be None, as the database has to be written to a file as it is
+        """
+
+        super().__init__(output_path, file_print_count, pretty, compression)
+
+        if output_path == STDOUT_PATH:
+            raise ValueError("A SQLite database can't be written to stdout")
+
+        if compression is not None:
+            raise ValueError("A SQLite database can't be compressed")
+
+        self.connection = None
+        self.next_id = 1
+
+        # The ids of the open folders, with the one new rows are in at the end
+        self.parent_ids = []
+
+        self.rows = []
+        self.rows_in_transaction = 0
+
+    def _connect(self, database_path: str) -> sqlite3.Connection:
+        """Create an empty database, set up for loading as quickly as possible.
+
+        :param database_path: The path of the database, which is replaced if it exists
+
+        :returns: The connection to it, with a transaction started
+        """
+
+        for path in [database_path, database_path + "-wal", database_path + "-shm"]:
+            if os.path.exists(path):
+                os.remove(path)
+
+        # Transactions are started and committed explicitly
+        connection = sqlite3.connect(database_path, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=OFF")
+        connection.execute("PRAGMA cache_size=-65536")
+        connection.executescript(SCHEMA)
+        connection.execute("BEGIN")
+
+        self.next_id = 1
+        self.rows = []
+        self.rows_in_transaction = 0
+        self.closed_output_size = None
+
+        return connection
+
+    def _database(self) -> sqlite3.Connection:
+        if self.connection is None:
+            raise ValueError("The writer hasn't been started")
+
+        return self.connection
+
+    def write_start(
+        self,
+        root_path: str,
+        disk_usage_total: int,
+        disk_usage_used: int,
+        disk_usage_free: int,
+        block_size: int,
+    ) -> None:
+        """Create the database, and write the details of the scan."""
+
+        self.file_count = 0
+        self.current_folder_path = root_path
+        self.block_size = block_size
+        self.parent_ids = []
+        self.connection = self._connect(self.output_path)
+        self.connection.execute(
+            "INSERT INTO scan VALUES (?, ?, ?, ?, ?)",
+            (root_path, disk_usage_total, disk_usage_free, disk_usage_used, block_size),
+        )
+
+    def write_end(self) -> None:
+        """Load what is left, then build the indexes and the size of each subtree."""
+
+        super().write_end()
+
+        connection = self._database()
+        self._flush()
+        connection.execute("COMMIT")
+
+        connection.executescript(INDEXES)
+        connection.execute("BEGIN")
+        self._add_subtree_sizes(connection)
+        connection.execute("COMMIT")
+
+        connection.execute("PRAGMA journal_mode=DELETE")
+        self.close_output()
+
+    def _add_subtree_sizes(self, connection: sqlite3.Connection) -> None:
+        """Fill in the total size of the files under each folder.
+
+        Going backwards, everything in a folder is seen before it, so only the totals of the
+        folders which are part of the way through being added up are held.
+        """
+
+        # The totals so far of the folders which have had something in them seen
+        totals: dict[int, int] = {}
+        sizes: list[tuple[int, int]] = []
+
+        for entry_id, parent_id, size, is_dir in connection.execute(
+            "SELECT id, parent_id, size, is_dir FROM entries ORDER BY id DESC"
+        ):
+            if is_dir:
+                size = totals.pop(entry_id, 0)
+                sizes.append((entry_id, size))
+
+                if len(sizes) >= BATCH_SIZE:
+                    connection.executemany("INSERT INTO subtree_sizes VALUES (?, ?)", sizes)
+                    sizes = []
+
+            if parent_id is not None:
+                totals[parent_id] = totals.get(parent_id, 0) + size
+
+        connection.executemany("INSERT INTO subtree_sizes VALUES (?, ?)", sizes)
+
+    def close_output(self) -> None:
+        """Close the database, once everything has been written to it."""
+
+        self.closed_output_size = self.bytes_written()
+
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def bytes_written(self) -> int | None:
+        """Get how big the database and its write-ahead log are so far."""
+
+        if self.closed_output_size is not None:
+            return self.closed_output_size
+
+        size = 0
+
+        for path in [self.output_path, self.output_path + "-wal"]:
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                pass
+
+        return size
+
+    def _flush(self) -> None:
+        """Insert the rows gathered so far, committing the transaction if it is big enough."""
+
+        if not self.rows:
+            return
+
+        connection = self._database()
+        rows = self.rows
+        self.rows = []
+
+        try:
+            connection.executemany(INSERT_ENTRY, rows)
+        except UnicodeEncodeError:
+            # The rows before the one which failed were inserted, so the batch is inserted again
+            connection.execute("DELETE FROM entries WHERE id >= ?", (rows[0][0],))
+            connection.executemany(INSERT_ENTRY, _encode_names(rows))
+
+        self.rows_in_transaction += len(rows)
+
+        if self.rows_in_transaction >= TRANSACTION_SIZE:
+            connection.execute("COMMIT")
+            connection.execute("BEGIN")
+            self.rows_in_transaction = 0
+
+    def fragment_writer(self, fragment_path: str) -> "SQLiteWriter":
+        """Create a writer with the same settings as this one to write a fragment with.
+
+        Fragments are databases of their own, which are copied in with SQL when they are added.
+        """
+        return SQLiteWriter(fragment_path, self.file_print_count)
+
+    def write_fragment_start(self, parent_path: str, depth: int, block_size: int) -> None:
+        """Start writing a fragment of the output, numbering its rows from 1.
+
+        The folder the fragment will be added to has an id of 0 in it, until it is added.
+        """
+
+        self.block_size = block_size
+        self.depth = depth
+        self.current_folder_path = parent_path
+        self.connection = self._connect(self.output_path)
+        self.parent_ids = [0]
+
+    def write_fragment_end(self) -> None:
+        """Load what is left of the fragment, without indexing it."""
+
+        self._flush()
+        self._database().execute("COMMIT")
+        self.close_output()
+
+    def append_fragment(self, fragment_path: str) -> None:
+        """Copy the rows of a fragment written by another writer into the database, renumbering
+        them to follow on from the rows written so far.
+
+        :param fragment_path: The path of the fragment to add
+        """
+
+        connection = self._database()
+        self._flush()
+
+        # A database can only be attached outside of a transaction
+        connection.execute("COMMIT")
+        connection.execute("ATTACH DATABASE ? AS fragment", (fragment_path,))
+
+        try:
+            offset = self.next_id - 1
+            last_id = connection.execute("SELECT COALESCE(MAX(id), 0) FROM fragment.entries")
+            last_id = last_id.fetchone()[0]
+            connection.execute(
+                "INSERT INTO entries SELECT id + ?1, "
+                + "CASE parent_id WHEN 0 THEN ?2 ELSE parent_id + ?1 END, "
+                + "name, size, atime, mtime, ctime, is_dir FROM fragment.entries",
+                (offset, self.parent_ids[-1]),
+            )
+        finally:
+            connection.execute("DETACH DATABASE fragment")
+
+        connection.execute("BEGIN")
+        self.rows_in_transaction = 0
+        self.next_id += last_id
+
+    def write_folder_start(
+        self, folder_name: str, accessed_time: int, modified_time: int, created_time: int
+    ) -> None:
+        """Add the row for a folder."""
+
+        super().write_folder_start(folder_name, accessed_time, modified_time, created_time)
+
+        folder_id = self.next_id
+        self.next_id += 1
+
+        self.rows.append(
+            (
+                folder_id,
+                self.parent_ids[-1] if self.parent_ids else None,
+                folder_name,
+                0,
+                accessed_time,
+                modified_time,
+                created_time,
+                1,
+            )
+        )
+        self.parent_ids.append(folder_id)
+
+        if len(self.rows) >= BATCH_SIZE:
+            self._flush()
+
+    def write_folder_end(self) -> None:
+        """End a folder, which doesn't write anything."""
+
+        self.parent_ids.pop()
+        super().write_folder_end()
+
+    def write_file(
+        self, file_name: str, size: int, accessed_time: int, modified_time: int, created_time: int
+    ) -> None:
+        """Add the row for a file."""
+        self.write_files([(file_name, size, accessed_time, modified_time, created_time)])
+
+    def write_files(self, files: list[writer.FileEntry]) -> None:
+        """Add the rows for a batch of files in the current folder."""
+
+        self.count_files(files)
+
+        first_id = self.next_id
+        self.next_id += len(files)
+        parent_id = self.parent_ids[-1]
+        block_size = self.block_size
+
+        self.rows += [
+            (
+                row_id,
+                parent_id,
+                file_name,
+                max(block_size, size),
+                accessed_time,
+                modified_time,
+                created_time,
+                0,
+            )
+            for row_id, (
+                file_name,
+                size,
+                accessed_time,
+                modified_time,
+                created_time,
+            ) in enumerate(files, first_id)
+        ]
+
+        if len(self.rows) >= BATCH_SIZE:
+            self._flush()
@@ -0,0 +1,225 @@
+"""Report the largest files and folders instead of writing every entry."""
+
+import heapq
+import json
+import marshal
+import os
+
+from diskspaced import writer
+from diskspaced.output import Compression
+
+# Example:
+# {
+#    "root_path": "/Users/dalemyers/Downloads",
+#    "volume_size": 494384795648,
+#    "free_space": 36101632000,
+#    "used_space": 458283163648,
+#    "total_size": 1234567,
+#    "file_count": 12,
+#    "folder_count": 3,
+#    "files": [{"path": "/Users/dalemyers/Downloads/foo/bar", "size": 1234}],
+#    "folders": [{"path": "/Users/dalemyers/Downloads", "size": 1234567}],
+# }
+
+# A largest entry is kept as (size, path), so the heaps order by size
+SizedPath = tuple[int, str]
+
+
+class TopWriter(writer.Writer):
+    """Keeps only the largest files and folders, and writes a small report of them at the end.
+
+    Two min-heaps of at most `count` entries are kept, one of files and one of folders, with the
+    smallest of each on top to be replaced when something bigger comes along. Each open folder
+    adds up the size of everything in it, and passes its total on to its parent when it ends. The
+    memory used depends on the count and the depth of the tree, not the number of entries in it.
+
+    The size of a folder is the total size of the files in it and in its sub-folders. Entries of
+    the same size are ordered by path, with later paths counting as larger.
+    """
+
+    count: int
+    root_path: str
+    disk_usage: tuple[int, int, int]
+    largest_files: list[SizedPath]
+    largest_folders: list[SizedPath]
+    open_folders: list[list]
+    total_size: int
+    folder_count: int
+
+    def __init__(
+        self,
+        output_path: str,
+        file_print_count: int,
+        pretty: bool = False,
+        compression: Compression | None = None,
+        count: int = 100,
+    ) -> None:
+        super().__init__(output_path, file_print_count, pretty, compression)
+
+        if count < 1:
+            raise ValueError(f"The number of entries to report must be at least 1: {count}")
+
+        self.count = count
+        self.root_path = ""
+        self.disk_usage = (0, 0, 0)
+        self._reset([])
+
+    def _reset(self, open_folders: list[list]) -> None:
+        self.largest_files = []
+        self.largest_folders = []
+
+        # Each open folder is a [path, total size so far] pair
+        self.open_folders = open_folders
+        self.total_size = 0
+        self.folder_count = 0
+
+    def _keep(self, largest: list[SizedPath], entry: SizedPath) -> None:
+        if len(largest) < self.count:
+            heapq.heappush(largest, entry)
+        elif entry > largest[0]:
+            heapq.heapreplace(largest, entry)
+
+    def write_start(
+        self,
+        root_path: str,
+        disk_usage_total: int,
+        disk_usage_used: int,
+        disk_usage_free: int,
+        block_size: int,
+    ) -> None:
+        """Start the report."""
+
+        super().write_start(
+            root_path, disk_usage_total, disk_usage_used, disk_usage_free, block_size
+        )
+
+        self.root_path = root_path
+        self.disk_usage = (disk_usage_total, disk_usage_used, disk_usage_free)
+        self._reset([])
+
+    def write_end(self) -> None:
+        """Write the report."""
+
+        super().write_end()
+
+        disk_usage_total, disk_usage_used, disk_usage_free = self.disk_usage
+
+        report = {
+            "root_path": self.root_path,
+            "volume_size": disk_usage_total,
+            "free_space": disk_usage_free,
+            "used_space": disk_usage_used,
+            "total_size": self.total_size,
+            "file_count": self.file_count,
+            "folder_count": self.folder_count,
+            "files": self._report_entries(self.largest_files),
+            "folders": self._report_entries(self.largest_folders),
+        }
+
+        # Names which aren't valid UTF-8 are escaped, as the report is ASCII
+        self.file.write(json.dumps(report, indent=4 if self.pretty else None).encode("ascii"))
+        self.close_output()
+
+    @staticmethod
+    def _report_entries(largest: list[SizedPath]) -> list[dict]:
+        return [{"path": path, "size": size} for size, path in sorted(largest, reverse=True)]
+
+    def fragment_writer(self, fragment_path: str) -> "TopWriter":
+        """Create a writer with the same settings as this one to write a fragment with."""
+        return TopWriter(fragment_path, self.file_print_count, self.pretty, count=self.count)
+
+    def write_fragment_start(self, parent_path: str, depth: int, block_size: int) -> None:
+        """Start keeping the largest entries in a fragment of the tree.
+
+        The folder the fragment will be added to is kept open, to add up its total.
+        """
+
+        super().write_fragment_start(parent_path, depth, block_size)
+        self._reset([[parent_path, 0]])
+
+    def write_fragment_end(self) -> None:
+        """Write what was kept for the fragment, to be merged in by `append_fragment`."""
+
+        self.file.write(
+            marshal.dumps(
+                (
+                    self.largest_files,
+                    self.largest_folders,
+                    self.open_folders[0][1],
+                    self.folder_count,
+                    self.file_count,
+                )
+            )
+        )
+        super().write_fragment_end()
+
+    def append_fragment(self, fragment_path: str) -> None:
+        """Merge the largest entries of a fragment into those kept so far.
+
+        :param fragment_path: The path of the fragment to merge
+        """
+
+        with open(fragment_path, "rb") as fragment:
+            largest_files, largest_folders, total_size, folder_count, file_count = marshal.load(
+                fragment
+            )
+
+        for entry in largest_files:
+            self._keep(self.largest_files, tuple(entry))
+
+        for entry in largest_folders:
+            self._keep(self.largest_folders, tuple(entry))
+
+        self.open_folders[-1][1] += total_size
+        self.folder_count += folder_count
+        self.file_count += file_count
+
+    def write_folder_start(
+        self, folder_name: str, accessed_time: int, modified_time: int, created_time: int
+    ) -> None:
+        """Open a folder to add up the size of."""
+
+        super().write_folder_start(folder_name, accessed_time, modified_time, created_time)
+
+        if self.open_folders:
+            folder_path = os.path.join(self.open_folders[-1][0], folder_name)
+        else:
+            folder_path = self.root_path
+
+        self.open_folders.append([folder_path, 0])
+        self.folder_count += 1
+
+    def write_folder_end(self) -> None:
+        """Close a folder, keeping it if it is one of the largest."""
+
+        folder_path, total_size = self.open_folders.pop()
+        self._keep(self.largest_folders, (total_size, folder_path))
+
+        if self.open_folders:
+            self.open_folders[-1][1] += total_size
+        else:
+            self.total_size = total_size
+
+        super().write_folder_end()
+
+    def write_file(
+        self, file_name: str, size: int, accessed_time: int, modified_time: int, created_time: int
+    ) -> None:
+        """Keep a file if it is one of the largest."""
+        self.write_files([(file_name, size, accessed_time, modified_time, created_time)])
+
+    def write_files(self, files: list[writer.FileEntry]) -> None:
+        """Keep the files in a batch which are among the largest."""
+
+        self.count_files(files)
+
+        folder = self.open_folders[-1]
+        folder_path = folder[0]
+        largest = self.largest_files
+
+        for file_name, size, _, _, _ in files:
+            folder[1] += size
+
+            # Most files are smaller than the smallest kept, so their paths are never built
+            if len(largest) < self.count or size >= largest[0][0]:
+                self._keep(largest, (size, os.path.join(folder_path, file_name)))
@@ -0,0 +1,292 @@
+"""A compact in-memory tree of the results of a scan."""
+
+from array import array
+import os
+from typing import Iterator
+
+from diskspaced.writer import FileEntry, Writer
+
+NAME_ENCODING = "utf-8"
+NAME_ERRORS = "surrogateescape"
+
+INDEXED_CHILDREN = 64
+"""Folders with more children than this get a dictionary of them by name when first looked in."""
+
+MAX_INDEXED_FOLDERS = 4096
+"""The most folders to keep a dictionary of children for, to bound the memory they use."""
+
+
+class ScanTree:
+    """The folders and files from a scan, held in parallel arrays rather than an object each.
+
+    Entries are numbered in the order the scan wrote them, starting with the root at 0, so every
+    folder is followed by everything in it. Each entry has its parent's number, its size, its
+    times and where its name is in a buffer shared by all of the names. `subtree_ends` has the
+    number after the last entry in each entry's subtree, which is how the children of a folder are
+    found, and `total_sizes` the size of everything in each subtree, which is worked out in a
+    single pass once the scan is finished. An entry costs around 60 bytes plus its name.
+    """
+
+    root_path: str
+    parents: array
+    sizes: array
+    accessed_times: array
+    modified_times: array
+    created_times: array
+    is_folder: bytearray
+    name_offsets: array
+    names: bytearray
+    subtree_ends: array
+    total_sizes: array
+    child_indexes: dict[int, dict[bytes, int]]
+
+    def __init__(self, root_path: str) -> None:
+        self.root_path = root_path
+        self.parents = array("i")
+        self.sizes = array("q")
+        self.accessed_times = array("q")
+        self.modified_times = array("q")
+        self.created_times = array("q")
+        self.is_folder = bytearray()
+
+        # Each name runs from its offset to the next one, so there is always one offset extra
+        self.name_offsets = array("Q", [0])
+        self.names = bytearray()
+
+        self.subtree_ends = array("I")
+        self.total_sizes = array("q")
+        self.child_indexes = {}
+
+    def __len__(self) -> int:
+        return len(self.parents)
+
+    def add(
+        self,
+        parent: int,
+        name: str,
+        is_folder: bool,
+        size: int,
+        accessed_time: int,
+        modified_time: int,
+        created_time: int,
+    ) -> int:
+        """Add an entry after everything added so far.
+
+        :param parent: The number of the entry's parent, or -1 for the root
+        :param name: The name of the entry
+        :param is_folder: Whether the entry is a folder
+        :param size: The size of the entry
+        :param accessed_time: When the entry was last accessed
+        :param modified_time: When the entry was last modified
+        :param created_time: When the entry was created
+
+        :returns: The number of the new entry
+        """
+
+        index = len(self.parents)
+        self.parents.append(parent)
+        self.sizes.append(size)
+        self.accessed_times.append(accessed_time)
+        self.modified_times.append(modified_time)
+        self.created_times.append(created_time)
+        self.is_folder.append(is_folder)
+        self.names += name.encode(NAME_ENCODING, NAME_ERRORS)
+        self.name_offsets.append(len(self.names))
+
+        # Folders are finished by `end_folder`
+        self.subtree_ends.append(index + 1)
+
+        return index
+
+    def end_folder(self, index: int) -> None:
+        """Mark a folder as finished, once everything in it has been added.
+
+        :param index: The number of the folder
+        """
+        self.subtree_ends[index] = len(self.parents)
+
+    def finish(self) -> None:
+        """Work out the total size of each subtree, once everything has been added."""
+
+        total_sizes = array("q", self.sizes)
+        parents = self.parents
+
+        # Everything in a subtree comes after its root, so going backwards visits children first
+        for index in range(len(total_sizes) - 1, 0, -1):
+            total_sizes[parents[index]] += total_sizes[index]
+
+        self.total_sizes = total_sizes
+
+    def name(self, index: int) -> str:
+        """Get the name of an entry.
+
+        :param index: The number of the entry
+
+        :returns: The name
+        """
+        return self._name_bytes(index).decode(NAME_ENCODING, NAME_ERRORS)
+
+    def _name_bytes(self, index: int) -> bytes:
+        return bytes(self.names[self.name_offsets[index] : self.name_offsets[index + 1]])
+
+    def path(self, index: int) -> str:
+        """Get the path of an entry.
+
+        :param index: The number of the entry
+
+        :returns: The path, starting with the path of the root
+        """
+
+        names = []
+
+        while index > 0:
+            names.append(self.name(index))
+            index = self.parents[index]
+
+        return os.path.join(self.root_path, *reversed(names))
+
+    def children(self, index: int) -> Iterator[int]:
+        """Get the children of an entry, in the order they were added.
+
+        :param index: The number of the entry
+
+        :returns: An iterator over the numbers of the children
+        """
+
+        end = self.subtree_ends[index]
+        child = index + 1
+
+        while child < end:
+            yield child
+            child = self.subtree_ends[child]
+
+    def find(self, path: str) -> int | None:
+        """Find an entry by its path.
+
+        :param path: The path of the entry, either starting with the path of the root or relative
+                     to it
+
+        :returns: The number of the entry, or None if it isn't in the tree
+        """
+
+        if not self.parents:
+            return None
+
+        relative_path = os.path.relpath(path, self.root_path) if os.path.isabs(path) else path
+
+        if relative_path == ".." or relative_path.startswith(".." + os.sep):
+            return None
+
+        index = 0
+
+        for name in relative_path.split(os.sep):
+            if name in ("", "."):
+                continue
+
+            if not self.is_folder[index]:
+                return None
+
+            found = self._find_child(index, name.encode(NAME_ENCODING, NAME_ERRORS))
+
+            if found is None:
+                return None
+
+            index = found
+
+        return index
+
+    def _find_child(self, index: int, name: bytes) -> int | None:
+        child_index = self.child_indexes.get(index)
+
+        if child_index is not None:
+            return child_index.get(name)
+
+        children = list(self.children(index))
+
+        if len(children) <= INDEXED_CHILDREN:
+            for child in children:
+                if self._name_bytes(child) == name:
+                    return child
+
+            return None
+
+        if len(self.child_indexes) >= MAX_INDEXED_FOLDERS:
+            self.child_indexes.clear()
+
+        child_index = {self._name_bytes(child): child for child in children}
+        self.child_indexes[index] = child_index
+
+        return child_index.get(name)
+
+
+class TreeWriter(Writer):
+    """Builds a `ScanTree` from a scan, instead of writing it anywhere."""
+
+    tree: ScanTree
+    open_folders: list[int]
+
+    def __init__(self) -> None:
+        super().__init__("", 0)
+        self.tree = ScanTree("")
+        self.open_folders = [-1]
+
+    def write_start(
+        self,
+        root_path: str,
+        disk_usage_total: int,
+        disk_usage_used: int,
+        disk_usage_free: int,
+        block_size: int,
+    ) -> None:
+        """Start a new tree. Nothing is opened, as the tree is only kept in memory."""
+
+        self.file_count = 0
+        self.current_folder_path = root_path
+        self.block_size = block_size
+        self.tree = ScanTree(root_path)
+        self.open_folders = [-1]
+
+    def write_end(self) -> None:
+        """Finish the tree."""
+        self.tree.finish()
+
+    def write_folder_start(
+        self, folder_name: str, accessed_time: int, modified_time: int, created_time: int
+    ) -> None:
+        """Add a folder to the tree."""
+
+        super().write_folder_start(folder_name, accessed_time, modified_time, created_time)
+        self.open_folders.append(
+            self.tree.add(
+                self.open_folders[-1],
+                folder_name,
+                True,
+                0,
+                accessed_time,
+                modified_time,
+                created_time,
+            )
+        )
+
+    def write_folder_end(self) -> None:
+        """Finish a folder in the tree."""
+
+        self.tree.end_folder(self.open_folders.pop())
+        super().write_folder_end()
+
+    def write_file(
+        self, file_name: str, size: int, accessed_time: int, modified_time: int, created_time: int
+    ) -> None:
+        """Add a file to the current folder."""
+        self.write_files([(file_name, size, accessed_time, modified_time, created_time)])
+
+    def write_files(self, files: list[FileEntry]) -> None:
+        """Add a batch of files to the current folder."""
+
+        self.count_files(files)
+
+        add = self.tree.add
+        parent = self.open_folders[-1]
+
+        for file_name, size, accessed_time, modified_time, created_time in files:
+            add(parent, file_name, False, size, accessed_time, modified_time, created_time)
@@ -0,0 +1,494 @@
+"""Keep a tree of a folder's contents current by watching it for changes."""
+
+import logging
+import os
+import select
+import stat
+import time
+from typing import Iterator
+
+from diskspaced import inotify
+from diskspaced.scan_stats import ScanStats
+from diskspaced.scanner import FolderLister, Listing, scan_tree
+from diskspaced.writer import FileEntry, Writer
+
+WATCH_MASK = (
+    inotify.IN_MODIFY
+    | inotify.IN_ATTRIB
+    | inotify.IN_CLOSE_WRITE
+    | inotify.IN_MOVED_FROM
+    | inotify.IN_MOVED_TO
+    | inotify.IN_CREATE
+    | inotify.IN_DELETE
+    | inotify.IN_DELETE_SELF
+    | inotify.IN_MOVE_SELF
+    | inotify.IN_ONLYDIR
+    | inotify.IN_DONT_FOLLOW
+    | inotify.IN_EXCL_UNLINK
+)
+
+# Events which mean that the contents of the folder they happened in have changed
+CONTENTS_CHANGED = (
+    inotify.IN_MOVED_FROM | inotify.IN_MOVED_TO | inotify.IN_CREATE | inotify.IN_DELETE
+)
+
+
+class WatchedFolder:
+    """A folder in the tree, with its sub-folders and files."""
+
+    __slots__ = (
+        "name",
+        "parent",
+        "folders",
+        "files",
+        "accessed_time",
+        "modified_time",
+        "created_time",
+        "watch_descriptor",
+        "removed",
+    )
+
+    name: str
+    parent: "WatchedFolder | None"
+    folders: dict[str, "WatchedFolder"]
+
+    # Each file is kept as (size, accessed_time, modified_time, created_time)
+    files: dict[str, tuple[int, int, int, int]]
+
+    accessed_time: int
+    modified_time: int
+    created_time: int
+    watch_descriptor: int | None
+    removed: bool
+
+    def __init__(
+        self,
+        name: str,
+        parent: "WatchedFolder | None",
+        accessed_time: int,
+        modified_time: int,
+        created_time: int,
+    ) -> None:
+        self.name = name
+        self.parent = parent
+        self.folders = {}
+        self.files = {}
+        self.accessed_time = accessed_time
+        self.modified_time = modified_time
+        self.created_time = created_time
+        self.watch_descriptor = None
+        self.removed = False
+
+    def path(self, root_path: str) -> str:
+        """Get the path of the folder.
+
+        :param root_path: The path of the root of the tree
+
+        :returns: The path of the folder
+        """
+
+        names = []
+        folder: WatchedFolder | None = self
+
+        while folder is not None and folder.parent is not None:
+            names.append(folder.name)
+            folder = folder.parent
+
+        return os.path.join(root_path, *reversed(names))
+
+
+class _TreeBuilder(Writer):
+    """Adds the folders and files a scan writes to the tree."""
+
+    current: WatchedFolder | None
+    root: WatchedFolder | None
+
+    def __init__(self, parent: WatchedFolder | None) -> None:
+        super().__init__("", 0)
+        self.current = parent
+        self.root = None
+
+    def write_folder_start(
+        self, folder_name: str, accessed_time: int, modified_time: int, created_time: int
+    ) -> None:
+        super().write_folder_start(folder_name, accessed_time, modified_time, created_time)
+
+        folder = WatchedFolder(
+            folder_name, self.current, accessed_time, modified_time, created_time
+        )
+
+        if self.current is not None:
+            self.current.folders[folder_name] = folder
+
+        if self.root is None:
+            self.root = folder
+
+        self.current = folder
+
+    def write_folder_end(self) -> None:
+        assert self.current is not None
+        self.current = self.current.parent
+        super().write_folder_end()
+
+    def write_file(
+        self, file_name: str, size: int, accessed_time: int, modified_time: int, created_time: int
+    ) -> None:
+        self.write_files([(file_name, size, accessed_time, modified_time, created_time)])
+
+    def write_files(self, files: list[FileEntry]) -> None:
+        assert self.current is not None
+        self.count_files(files)
+
+        for file_name, size, accessed_time, modified_time, created_time in files:
+            self.current.files[file_name] = (size, accessed_time, modified_time, created_time)
+
+
+class _WatchingLister(FolderLister):
+    """Watches each folder just before it is listed, so that no change in it can be missed."""
+
+    watcher: "TreeWatcher"
+    builder: _TreeBuilder
+
+    def __init__(self, watcher: "TreeWatcher", builder: _TreeBuilder) -> None:
+        super().__init__(watcher.process_in_order, watcher.stats)
+        self.watcher = watcher
+        self.builder = builder
+
+    def list_folder(self, folder_path: str) -> Listing:
+        # The walk always lists a folder straight after writing its start
+        assert self.builder.current is not None
+        self.watcher.watch_folder(self.builder.current, folder_path)
+        return super().list_folder(folder_path)
+
+
+class TreeWatcher:
+    """Keeps a tree of a folder's contents current by watching it with inotify.
+
+    The folder is scanned once, watching each folder just before it is listed. After that,
+    events are gathered for `coalesce_delay` seconds after the first one arrives, and then each
+    entry they were about is looked at once, however many events there were for it. Files are
+    updated in place, folders which have gone are removed along with their watches, and new
+    folders are scanned and watched. If the kernel drops events, the whole tree is scanned again.
+
+    Each watch uses a little kernel memory, and the kernel limits how many there can be, so
+    there are never more than `max_watches`. Folders past that aren't watched, and only change
+    in the tree when their parent sees them change.
+    """
+
+    root_path: str
+    process_in_order: bool
+    max_watches: int
+    coalesce_delay: float
+    stats: ScanStats
+    root: WatchedFolder | None
+    folders_by_watch: dict[int, WatchedFolder]
+    unwatched_folders: int
+    pending_entries: dict[tuple[WatchedFolder, str], None]
+    pending_folders: dict[WatchedFolder, None]
+    pending_since: float | None
+    root_gone: bool
+    notifier: inotify.Inotify
+
+    def __init__(
+        self,
+        root_path: str,
+        process_in_order: bool = False,
+        max_watches: int = 65_536,
+        coalesce_delay: float = 1.0,
+    ) -> None:
+        """Create a new watcher, which doesn't start watching until `start` is called.
+
+        :param root_path: The path of the folder to watch
+        :param process_in_order: Whether to process the contents of each folder by name
+        :param max_watches: The most folders to watch
+        :param coalesce_delay: How many seconds to gather events for before applying them
+        """
+
+        if max_watches < 1:
+            raise ValueError(f"The most watches must be at least 1: {max_watches}")
+
+        self.root_path = root_path
+        self.process_in_order = process_in_order
+        self.max_watches = max_watches
+        self.coalesce_delay = coalesce_delay
+        self.stats = ScanStats()
+        self.root = None
+        self.folders_by_watch = {}
+        self.unwatched_folders = 0
+        self.pending_entries = {}
+        self.pending_folders = {}
+        self.pending_since = None
+        self.root_gone = False
+        self.notifier = inotify.Inotify()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def fileno(self) -> int:
+        """Get the file descriptor to wait on for events."""
+        return self.notifier.fileno()
+
+    def start(self) -> None:
+        """Scan the folder, watching everything in it."""
+
+        self.root = self._scan(self.root_path, None)
+
+        if self.root is None:
+            raise FileNotFoundError(f"Unable to scan {self.root_path}")
+
+    def close(self) -> None:
+        """Stop watching."""
+        self.notifier.close()
+
+    def _scan(self, folder_path: str, parent: WatchedFolder | None) -> WatchedFolder | None:
+        builder = _TreeBuilder(parent)
+
+        with _WatchingLister(self, builder) as lister:
+            scan_tree(folder_path, builder, lister)
+
+        return builder.root
+
+    def watch_folder(self, folder: WatchedFolder, folder_path: str) -> None:
+        """Start watching a folder which has just been added to the tree.
+
+        :param folder: The folder
+        :param folder_path: The path of the folder
+        """
+
+        if len(self.folders_by_watch) >= self.max_watches:
+            self._skip_watch(folder_path)
+            return
+
+        try:
+            watch_descriptor = self.notifier.add_watch(folder_path, WATCH_MASK)
+        except inotify.WatchLimitReached:
+            self._skip_watch(folder_path)
+            return
+
+        if watch_descriptor is None:
+            return
+
+        # Watching a folder which is already watched, such as after a move, gives the same watch
+        previous = self.folders_by_watch.get(watch_descriptor)
+
+        if previous is not None:
+            previous.watch_descriptor = None
+
+        folder.watch_descriptor = watch_descriptor
+        self.folders_by_watch[watch_descriptor] = folder
+
+    def _skip_watch(self, folder_path: str) -> None:
+        if self.unwatched_folders == 0:
+            logging.warning(
+                f"Not watching {folder_path} or any further folders, as the most watches has "
+                + "been reached"
+            )
+
+        self.unwatched_folders += 1
+
+    def process_events(self, timeout: float) -> None:
+        """Wait for events, and apply them once they have been gathered for long enough.
+
+        :param timeout: The most seconds to wait for
+        """
+
+        if self.pending_since is not None:
+            remaining = self.pending_since + self.coalesce_delay - time.monotonic()
+            timeout = max(0.0, min(timeout, remaining))
+
+        readable, _, _ = select.select([self.notifier], [], [], timeout)
+
+        if readable:
+            self._gather(self.notifier.read_events())
+
+        if (
+            self.pending_since is not None
+            and time.monotonic() >= self.pending_since + self.coalesce_delay
+        ):
+            self.apply_pending()
+
+    def _gather(self, events: list[inotify.Event]) -> None:
+        for watch_descriptor, mask, _, name in events:
+            if mask & inotify.IN_Q_OVERFLOW:
+                logging.warning("Events were dropped, so everything will be scanned again")
+                self._rescan()
+                return
+
+            folder = self.folders_by_watch.get(watch_descriptor)
+
+            if folder is None:
+                continue
+
+            if mask & inotify.IN_IGNORED:
+                # The watch has gone, along with whatever it was watching
+                del self.folders_by_watch[watch_descriptor]
+                folder.watch_descriptor = None
+                continue
+
+            if mask & (inotify.IN_DELETE_SELF | inotify.IN_MOVE_SELF | inotify.IN_UNMOUNT):
+                # The parent hears about this too, unless this is the root
+                if folder is self.root:
+                    logging.error(f"{self.root_path} has been removed or moved")
+                    self.root_gone = True
+                continue
+
+            if self.pending_since is None:
+                self.pending_since = time.monotonic()
+
+            if name:
+                self.pending_entries[(folder, name)] = None
+
+            if not name or mask & CONTENTS_CHANGED:
+                self.pending_folders[folder] = None
+
+    def _rescan(self) -> None:
+        self.notifier.close()
+        self.notifier = inotify.Inotify()
+        self.folders_by_watch = {}
+        self.unwatched_folders = 0
+        self.pending_entries = {}
+        self.pending_folders = {}
+        self.pending_since = None
+        self.start()
+
+    def apply_pending(self) -> None:
+        """Apply the events gathered so far to the tree."""
+
+        pending_entries = self.pending_entries
+        pending_folders = self.pending_folders
+        self.pending_entries = {}
+        self.pending_folders = {}
+        self.pending_since = None
+
+        self._apply_entries(pending_entries)
+
+        for folder in pending_folders:
+            if folder.removed:
+                continue
+
+            details = self._lstat(folder.path(self.root_path))
+
+            if details is not None:
+                self._update_times(folder, details)
+
+    def _apply_entries(self, pending_entries: dict[tuple[WatchedFolder, str], None]) -> None:
+        present = []
+
+        # Everything which has gone is removed first, so that a folder which was moved within
+        # the tree is unwatched at its old place before it is watched at its new one
+        for folder, name in pending_entries:
+            if folder.removed:
+                continue
+
+            entry_path = os.path.join(folder.path(self.root_path), name)
+            details = self._lstat(entry_path)
+
+            if details is None or stat.S_ISLNK(details.st_mode):
+                self._remove_entry(folder, name)
+            elif stat.S_ISDIR(details.st_mode) != (name in folder.folders):
+                self._remove_entry(folder, name)
+                present.append((folder, name, entry_path, details))
+            else:
+                present.append((folder, name, entry_path, details))
+
+        for folder, name, entry_path, details in present:
+            if folder.removed:
+                continue
+
+            if not stat.S_ISDIR(details.st_mode):
+                folder.files[name] = (
+                    details.st_size,
+                    int(details.st_atime),
+                    int(details.st_mtime),
+                    int(details.st_ctime),
+                )
+            elif name in folder.folders:
+                self._update_times(folder.folders[name], details)
+            else:
+                self._scan(entry_path, folder)
+
+    def _lstat(self, path: str) -> os.stat_result | None:
+        self.stats.syscalls += 1
+
+        try:
+            return os.lstat(path)
+        except OSError:
+            return None
+
+    @staticmethod
+    def _update_times(folder: WatchedFolder, details: os.stat_result) -> None:
+        folder.accessed_time = int(details.st_atime)
+        folder.modified_time = int(details.st_mtime)
+        folder.created_time = int(details.st_ctime)
+
+    def _remove_entry(self, folder: WatchedFolder, name: str) -> None:
+        folder.files.pop(name, None)
+        removed = folder.folders.pop(name, None)
+
+        if removed is None:
+            return
+
+        stack = [removed]
+
+        while stack:
+            sub_folder = stack.pop()
+            sub_folder.removed = True
+            stack.extend(sub_folder.folders.values())
+
+            if sub_folder.watch_descriptor is not None:
+                self.notifier.remove_watch(sub_folder.watch_descriptor)
+                del self.folders_by_watch[sub_folder.watch_descriptor]
+                sub_folder.watch_descriptor = None
+
+    def write_tree(self, writer: Writer) -> None:
+        """Write the folders and files in the tree to a writer, in the order a scan would.
+
+        Any events gathered so far are applied first.
+
+        :param writer: The writer to write the tree to, which must have been started
+        """
+
+        self.apply_pending()
+
+        if self.root is None:
+            return
+
+        self._write_folder_start(self.root, writer)
+
+        # Each open folder has an iterator over the sub-folders still to write
+        stack = [(self.root, self._sub_folders(self.root))]
+
+        while stack:
+            folder, sub_folders = stack[-1]
+            sub_folder = next(sub_folders, None)
+
+            if sub_folder is not None:
+                self._write_folder_start(sub_folder, writer)
+                stack.append((sub_folder, self._sub_folders(sub_folder)))
+                continue
+
+            files = [(name, *details) for name, details in folder.files.items()]
+
+            if files:
+                if self.process_in_order:
+                    files.sort()
+
+                writer.write_files(files)
+
+            stack.pop()
+            writer.write_folder_end()
+
+    def _sub_folders(self, folder: WatchedFolder) -> Iterator[WatchedFolder]:
+        if self.process_in_order:
+            return iter([folder.folders[name] for name in sorted(folder.folders)])
+
+        return iter(folder.folders.values())
+
+    @staticmethod
+    def _write_folder_start(folder: WatchedFolder, writer: Writer) -> None:
+        writer.write_folder_start(
+            folder.name, folder.accessed_time, folder.modified_time, folder.created_time
+        )
@@ -4,8 +4,11 @@ import abc
 from io import IOBase
 import logging
 import os
+import shutil
+from typing import AsyncIterable, Iterable
 
-from diskspaced.constants import MAX_RECURSION_LIMIT
+from diskspaced.events import FILES, FOLDER_START, FileEntry, ScanEvent
+from diskspaced.output import Compression, open_output
 
 
 class Writer(abc.ABC):
@@ -16,18 +19,30 @@ class Writer(abc.ABC):
     file: IOBase
     file_print_count: int
     current_folder_path: str
+    flush_after_writes: bool
+    pretty: bool
+    compression: Compression | None
     depth = 0
+    closed_output_size: int | None = None
 
-    def __init__(self, output_path: str, file_print_count: int) -> None:
+    def __init__(
+        self,
+        output_path: str,
+        file_print_count: int,
+        pretty: bool = False,
+        compression: Compression | None = None,
+    ) -> None:
         self.output_path = output_path
         self.block_size = 0
         self.file_print_count = file_print_count
+        self.pretty = pretty
+        self.compression = compression
         self.file_count = 0
         self.depth = 0
         self.current_folder_path = ""
 
-        if MAX_RECURSION_LIMIT < 100:
-            raise ValueError("MAX_RECURSION_LIMIT must be at least 100")
+        # Flushing after every write makes partial output visible when a test fails
+        self.flush_after_writes = bool(os.environ.get("PYTEST_CURRENT_TEST"))
 
     def write_start(
         self,
@@ -37,13 +52,107 @@ class Writer(abc.ABC):
         disk_usage_free: int,
         block_size: int,
     ) -> None:
-        """Write the start of the output file."""
+        """Write the start of the output file.
+
+        The output is opened here, and is only ever written forwards, so it can be stdout or a
+        pipe as well as a regular file.
+        """
         self.file_count = 0
         self.current_folder_path = root_path
+        self.block_size = block_size
+        self.file = self.open_output()
+        self.closed_output_size = None
+
+    def open_output(self) -> IOBase:
+        """Open the output the results are written to.
+
+        :returns: The opened output
+        """
+        return open_output(self.output_path, self.compression)
 
     def write_end(self) -> None:
         """Write the end of the output file."""
 
+    def close_output(self) -> None:
+        """Close the output, once everything has been written to it."""
+
+        # Kept so that the size can still be reported once the output is closed
+        self.closed_output_size = self.bytes_written()
+        self.file.close()
+
+    def bytes_written(self) -> int | None:
+        """Get how many bytes have been written to the output so far, before any compression.
+
+        This can be called from another thread while the scan goes.
+
+        :returns: The number of bytes, or None if the output can't tell, such as when it is a pipe
+        """
+
+        output = getattr(self, "file", None)
+
+        if output is None or self.closed_output_size is not None:
+            return self.closed_output_size
+
+        try:
+            return output.tell()
+        except (OSError, ValueError):
+            # Pipes can't tell, and the output could have been closed
+            return None
+
+    def fragment_writer(self, fragment_path: str) -> "Writer":
+        """Create a writer with the same settings as this one to write a fragment with.
+
+        Fragments are never compressed, as they are copied into the output as they are.
+
+        :param fragment_path: The path to write the fragment to
+
+        :returns: The new writer, which hasn't been started yet
+        """
+        return type(self)(fragment_path, self.file_print_count, self.pretty)
+
+    def write_fragment_start(self, parent_path: str, depth: int, block_size: int) -> None:
+        """Start writing a fragment of the output, to be added to it later with `append_fragment`.
+
+        A fragment has no header or footer, only the entries for the folders written to it.
+
+        :param parent_path: The path of the folder the fragment will be added to
+        :param depth: The depth of the folder the fragment will be added to
+        :param block_size: The block size of the disk being scanned
+        """
+        self.block_size = block_size
+        self.depth = depth
+        self.current_folder_path = parent_path
+        self.file = open_output(self.output_path)
+        self.closed_output_size = None
+
+    def write_fragment_end(self) -> None:
+        """Finish writing a fragment of the output."""
+        self.close_output()
+
+    def append_fragment(self, fragment_path: str) -> None:
+        """Copy a fragment written by another writer into the output as it is.
+
+        :param fragment_path: The path of the fragment to copy
+        """
+
+        # The folder of a shard can go between planning the scan and scanning it, which leaves
+        # nothing in its fragment, so there is no entry to separate from the others either
+        if os.path.getsize(fragment_path) == 0:
+            return
+
+        self.start_entry()
+
+        with open(fragment_path, "rb") as fragment:
+            shutil.copyfileobj(fragment, self.file, 1024 * 1024)
+
+    def start_entry(self) -> None:
+        """Prepare the output for another entry in the current folder.
+
+        Writers which need to separate entries, or know whether a folder is empty, do it here.
+        It is called before a fragment is copied in, which is written without anything before
+        its first entry.
+        """
+
     def write_folder_start(
         self, folder_name: str, accessed_time: int, modified_time: int, created_time: int
     ) -> None:
@@ -51,17 +160,6 @@ class Writer(abc.ABC):
         self.current_folder_path = os.path.join(self.current_folder_path, folder_name)
         self.depth += 1
 
-        if float(self.depth) / MAX_RECURSION_LIMIT > 0.9:
-            logging.warning(f"Nearing recursion limit of {MAX_RECURSION_LIMIT}")
-
-        if float(self.depth) > MAX_RECURSION_LIMIT - 100:
-            logging.error(
-                f"Reached recursion limit of {MAX_RECURSION_LIMIT} at {self.current_folder_path}"
-            )
-            raise RecursionError(
-                f"Reached recursion limit of {MAX_RECURSION_LIMIT} at {self.current_folder_path}"
-            )
-
     def write_folder_end(self) -> None:
         """Write the end of a folder entry."""
         self.current_folder_path = os.path.dirname(self.current_folder_path)
@@ -76,5 +174,90 @@ class Writer(abc.ABC):
         if self.file_print_count != 0 and self.file_count % self.file_print_count == 0:
             logging.info(f"Processing {os.path.join(self.current_folder_path, file_name)}")
 
-    def pretty_print(self) -> None:
-        """Pretty print the output."""
+    def write_files(self, files: list[FileEntry]) -> None:
+        """Write the entries for a batch of files in the current folder.
+
+        The scanner writes all of the files in a folder with a single call to this. By default
+        each file is passed on to `write_file`, but writers can encode the whole batch at once.
+
+        :param files: The files to write
+        """
+        for file_entry in files:
+            self.write_file(*file_entry)
+
+    def write_event(self, event: ScanEvent) -> None:
+        """Write a single event from a scan.
+
+        :param event: The event to write
+        """
+
+        kind = event[0]
+
+        if kind == FILES:
+            self.write_files(event[1])
+        elif kind == FOLDER_START:
+            self.write_folder_start(event[1], event[3], event[4], event[5])
+        else:
+            self.write_folder_end()
+
+    def write_events(self, events: Iterable[ScanEvent]) -> None:
+        """Write the events from a scan, such as those from `diskspaced.iter_scan`.
+
+        If the events stop part way through because of an error, the folders which were left
+        open are ended, so the output is still well formed.
+
+        :param events: The events to write
+        """
+
+        depth = self.depth
+
+        try:
+            for event in events:
+                self.write_event(event)
+        finally:
+            self.end_folders(depth)
+
+    async def write_events_async(self, events: AsyncIterable[ScanEvent]) -> None:
+        """Write the events from an asynchronous scan, such as those from
+        `diskspaced.aiter_scan`.
+
+        If the events stop part way through because of an error or the task being cancelled,
+        the folders which were left open are ended, so the output is still well formed.
+
+        :param events: The events to write
+        """
+
+        depth = self.depth
+
+        try:
+            async for event in events:
+                self.write_event(event)
+        finally:
+            self.end_folders(depth)
+
+    def end_folders(self, depth: int) -> None:
+        """End every folder which is open deeper than a depth.
+
+        :param depth: The depth to end folders down to
+        """
+
+        while self.depth > depth:
+            self.write_folder_end()
+
+    def count_files(self, files: list[FileEntry]) -> None:
+        """Count a batch of files written without `write_file`, logging progress as it would.
+
+        :param files: The files which were written
+        """
+
+        previous_count = self.file_count
+        self.file_count += len(files)
+
+        if self.file_print_count == 0:
+            return
+
+        next_print = previous_count - previous_count % self.file_print_count + self.file_print_count
+
+        for print_count in range(next_print, self.file_count + 1, self.file_print_count):
+            file_name = files[print_count - previous_count - 1][0]
+            logging.info(f"Processing {os.path.join(self.current_folder_path, file_name)}")
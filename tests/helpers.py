@@ -0,0 +1,18 @@
+"""Helpers shared by the tests."""
+
+import re
+
+
+def read(path: str) -> bytes:
+    """Read a whole file."""
+
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def without_usage(output: bytes) -> bytes:
+    """Remove the disk usage, block size and scan time from the header of an output, which
+    change between scans and aren't in every format."""
+    return re.sub(
+        rb'(scanTime|freeSpace|"free_space"|"used_space"|"block_size")(="|: ?)[^",]*', b"", output
+    )
@@ -0,0 +1,142 @@
+"""Test the reports worked out on NumPy columns."""
+
+import os
+import subprocess
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import diskspaced
+from diskspaced import analytics
+from diskspaced.events import FILES, FOLDER_END, FOLDER_START
+from tests.test_scanner import make_tree
+
+# pylint: enable=wrong-import-position
+
+np = pytest.importorskip("numpy")
+
+NOW = 1_700_000_000
+DAY = analytics.SECONDS_PER_DAY
+
+# root/
+#   logs/
+#     old/
+#       a.LOG (1000 bytes, accessed 400 days ago)
+#     b.log (3 bytes, accessed 40 days ago)
+#   c.txt (0 bytes, accessed now)
+#   README (5 bytes, accessed 2 days ago)
+EVENTS = [
+    (FOLDER_START, "root", "/data/root", NOW, NOW, NOW),
+    (FOLDER_START, "logs", "/data/root/logs", NOW, NOW, NOW),
+    (FOLDER_START, "old", "/data/root/logs/old", NOW, NOW, NOW),
+    (FILES, [("a.LOG", 1000, NOW - 400 * DAY, NOW, NOW)]),
+    (FOLDER_END,),
+    (FILES, [("b.log", 3, NOW - 40 * DAY, NOW, NOW)]),
+    (FOLDER_END,),
+    (FILES, [("c.txt", 0, NOW, NOW, NOW), ("README", 5, NOW - 2 * DAY, NOW, NOW)]),
+    (FOLDER_END,),
+]
+
+
+def test_reports():
+    """Test each of the reports over a small scan."""
+
+    columns = analytics.ScanColumns.from_events(EVENTS)
+
+    assert len(columns) == 7
+    assert columns.root_path == "/data/root"
+    assert columns.parents.tolist() == [-1, 0, 1, 2, 1, 0, 0]
+    assert columns.depths.tolist() == [0, 1, 2, 3, 2, 1, 1]
+    assert columns.path(3) == "/data/root/logs/old/a.LOG"
+
+    assert columns.folder_sizes().tolist() == [5, 3, 1000, 0, 0, 0, 0]
+    assert columns.subtree_sizes().tolist() == [1008, 1003, 1000, 1000, 3, 0, 5]
+
+    assert columns.size_histogram() == [
+        (0, 1, 0),
+        (1, 0, 0),
+        (2, 1, 3),
+        (4, 1, 5),
+        (8, 0, 0),
+        (16, 0, 0),
+        (32, 0, 0),
+        (64, 0, 0),
+        (128, 0, 0),
+        (256, 0, 0),
+        (512, 1, 1000),
+    ]
+
+    assert columns.stale_files(365, NOW) == (1, 1000)
+    assert columns.stale_files(30, NOW) == (2, 1003)
+    assert columns.stale_files(30, NOW, "modified") == (0, 0)
+    assert columns.stale_sizes(30, NOW).tolist() == [1003, 1003, 1000, 1000, 3, 0, 0]
+
+    assert columns.age_buckets([30, 365], NOW) == [(0.0, 2, 5), (30, 1, 3), (365, 1, 1000)]
+
+    assert columns.top_extensions(2) == [(".log", 2, 1003), ("", 1, 5)]
+    assert columns.largest_folders(2) == [("/data/root", 1008), ("/data/root/logs", 1003)]
+
+    report = columns.report(365, 1, NOW)
+    assert report["total_size"] == 1008
+    assert report["stale"] == {"days": 365, "count": 1, "size": 1000}
+
+    with pytest.raises(ValueError):
+        columns.stale_files(30, NOW, "changed")
+
+
+def test_from_tree_matches_scan():
+    """Test that columns loaded from a tree, from a scan file and from a scan are the same."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_tree(root)
+
+        output_path = os.path.join(tempdir, "scan.bin")
+        diskspaced.scan(root, output_path, diskspaced.OutputFormat.BINARY, 0, True)
+
+        loaded = [
+            analytics.ScanColumns.from_tree(diskspaced.build_tree(root, True)),
+            analytics.ScanColumns.from_events(diskspaced.iter_scan(root, True)),
+            diskspaced.analyze(output_path),
+        ]
+
+    for columns in loaded:
+        assert columns.names == loaded[0].names
+        assert columns.extensions == loaded[0].extensions
+
+        for name in ["parents", "depths", "is_folder", "sizes", "extension_codes"]:
+            assert np.array_equal(getattr(columns, name), getattr(loaded[0], name)), name
+
+    assert loaded[0].subtree_sizes()[0] == 26
+    assert loaded[0].top_extensions(5) == [(".txt", 4, 26)]
+
+
+def test_empty_and_missing_numpy(monkeypatch):
+    """Test reports over a scan with nothing in it, and that numpy is asked for if missing."""
+
+    columns = analytics.ScanColumns.from_events([])
+
+    assert columns.subtree_sizes().tolist() == []
+    assert columns.size_histogram() == []
+    assert columns.top_extensions(5) == []
+
+    monkeypatch.setattr(analytics, "np", None)
+    monkeypatch.setitem(sys.modules, "numpy", None)
+
+    with pytest.raises(ValueError, match="numpy"):
+        analytics.ScanColumns.from_events(EVENTS)
+
+
+def test_numpy_is_imported_lazily():
+    """Test that importing the package doesn't import numpy, which only reports need."""
+
+    package_folder = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    check = "import sys, diskspaced; print('numpy' in sys.modules)"
+    result = subprocess.run(
+        [sys.executable, "-c", check], cwd=package_folder, capture_output=True, check=True
+    )
+
+    assert result.stdout.strip() == b"False"
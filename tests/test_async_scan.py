@@ -0,0 +1,112 @@
+"""Test scanning from asyncio."""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import diskspaced
+from tests.test_sharding import make_wide_tree, read_body
+
+# pylint: enable=wrong-import-position
+
+
+class SlowExecutor(ThreadPoolExecutor):
+    """An executor which takes a while over everything, so that scans can be caught part way."""
+
+    def submit(self, fn, /, *args, **kwargs):
+        def slowly():
+            time.sleep(0.01)
+            return fn(*args, **kwargs)
+
+        return super().submit(slowly)
+
+
+async def collect_events(root: str, lookahead: int) -> list:
+    """Collect the events from scanning the folder from asyncio."""
+    return [event async for event in diskspaced.aiter_scan(root, True, 2, lookahead)]
+
+
+def test_aiter_scan_matches_iter_scan():
+    """Test that scanning from asyncio yields the same events as scanning directly."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_wide_tree(root)
+
+        expected_events = list(diskspaced.iter_scan(root, True))
+
+        for lookahead in [1, 3, 100]:
+            assert asyncio.run(collect_events(root, lookahead)) == expected_events
+
+
+def test_concurrent_scans():
+    """Test that several scans can share a loop, and write the same output as a scan."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        roots = [os.path.join(tempdir, f"root_{index}") for index in range(3)]
+
+        for root in roots:
+            make_wide_tree(root)
+
+        async def scan_all() -> list[diskspaced.ScanStats]:
+            return await asyncio.gather(
+                *[
+                    diskspaced.scan_async(
+                        root, f"{root}.json", diskspaced.OutputFormat.JSON, alphabetical=True
+                    )
+                    for root in roots
+                ]
+            )
+
+        for stats in asyncio.run(scan_all()):
+            assert stats.folders == 81
+            assert stats.files == 140
+
+        for root in roots:
+            diskspaced.scan(root, f"{root}.expected", diskspaced.OutputFormat.JSON, 0, True)
+            assert read_body(f"{root}.json", 1) == read_body(f"{root}.expected", 1)
+
+
+def test_cancelled_scan_is_well_formed():
+    """Test that cancelling a scan leaves the output finished."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_wide_tree(root)
+        output_path = os.path.join(tempdir, "output.json")
+
+        async def scan_and_cancel() -> None:
+            with SlowExecutor(2) as executor:
+                task = asyncio.create_task(
+                    diskspaced.scan_async(
+                        root,
+                        output_path,
+                        diskspaced.OutputFormat.JSON,
+                        alphabetical=True,
+                        max_in_flight=1,
+                        executor=executor,
+                    )
+                )
+                await asyncio.sleep(0.2)
+                task.cancel()
+
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+
+                assert task.cancelled()
+
+        asyncio.run(scan_and_cancel())
+
+        with open(output_path, "rb") as f:
+            output = json.load(f)
+
+        assert output["root_path"] == root
+        assert 0 < len(output["contents"][0]["contents"]) < 20
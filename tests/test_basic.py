@@ -4,6 +4,8 @@ import json
 import os
 import sys
 import tempfile
+from typing import Callable
+from xml.etree import ElementTree
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 # pylint: disable=wrong-import-position
@@ -23,6 +25,65 @@ def get_test_data(test_name: str) -> tuple[str, str]:
     return test_data, expected_result
 
 
+def checkout_size(path: str, rounding: Callable[[int, int], int] = max) -> int:
+    """Get the size a scan gives the checked out file at the given path.
+
+    The expected results hold the sizes they were recorded with, which depend on the block size
+    of the disk the test data was checked out to, so they are worked out again here.
+
+    :param path: The path to the file
+    :param rounding: How the writer combines the block size with the size of the file
+    :returns: The size of the file as it's written
+    """
+
+    return rounding(os.statvfs(path).f_bsize, os.lstat(path).st_size)
+
+
+def normalise_json(folder: dict, path: str | None = None) -> dict:
+    """Keep only what doesn't depend on where and when the test data was checked out.
+
+    :param folder: The folder to normalise
+    :param path: The path the folder was checked out to, to take file sizes from
+    :returns: The names and types of everything in the folder, and the sizes of files
+    """
+
+    contents: list = []
+
+    for entry in folder["contents"]:
+        entry_path = None if path is None else os.path.join(path, entry["name"])
+
+        if entry["type"] == "folder":
+            contents.append(normalise_json(entry, entry_path))
+        else:
+            size = entry["size"] if entry_path is None else checkout_size(entry_path)
+            contents.append((entry["name"], size))
+
+    return {"type": folder["type"], "name": folder["name"], "contents": contents}
+
+
+def normalise_xml(element: ElementTree.Element, path: str | None = None) -> tuple:
+    """Keep only what doesn't depend on where and when the test data was checked out.
+
+    :param element: The element to normalise
+    :param path: The path the element was checked out to, to take file sizes from
+    :returns: The tag and name of the element, its size if it's a file, and its children
+    """
+
+    size = element.get("size")
+
+    # The GrandPerspective writer caps sizes at the block size rather than rounding up to it
+    if size is not None:
+        size = int(size) if path is None else checkout_size(path, min)
+
+    children = []
+
+    for child in element:
+        child_path = None if path is None else os.path.join(path, child.get("name", ""))
+        children.append(normalise_xml(child, child_path))
+
+    return (element.tag, element.get("name"), size, children)
+
+
 def test_scan_downloads_json():
     """Test scanning the downloads folder and writing the results to a JSON file."""
 
@@ -47,40 +108,38 @@ def test_scan_downloads_json():
         with open(expected_data_path, "rb") as f:
             expected_result = json.load(f)
 
-        # These will change test to test
-        del result["free_space"]
-        del result["used_space"]
-        del expected_result["free_space"]
-        del expected_result["used_space"]
+        assert result["root_path"] == test_input
+        assert result["free_space"] + result["used_space"] <= result["volume_size"]
 
-        assert result == expected_result
+        assert [normalise_json(folder) for folder in result["contents"]] == [
+            normalise_json(folder, os.path.join(os.path.dirname(test_input), folder["name"]))
+            for folder in expected_result["contents"]
+        ]
 
 
 def test_scan_downloads_grand_perspective():
     """Test scanning the downloads folder and writing the results to a GP file."""
 
-    # with tempfile.TemporaryDirectory() as tempdir:
-    tempdir = "/Users/dalemyers/Projects/diskspaced/tests"
-    output_file = os.path.join(tempdir, "output.xml")
-    test_input, expected_data_path = get_test_data("test_scan_downloads_gp")
+    with tempfile.TemporaryDirectory() as tempdir:
+        output_file = os.path.join(tempdir, "output.xml")
+        test_input, expected_data_path = get_test_data("test_scan_downloads_gp")
 
-    diskspaced.scan(
-        test_input, output_file, diskspaced.OutputFormat.GRAND_PERSPECTIVE, 1, True, True
-    )
+        diskspaced.scan(
+            test_input, output_file, diskspaced.OutputFormat.GRAND_PERSPECTIVE, 1, True, True
+        )
 
-    with open(
-        output_file,
-        "rb",
-    ) as f:
-        result = json.load(f)
+        result = ElementTree.parse(output_file).getroot()
+        expected_result = ElementTree.parse(expected_data_path).getroot()
 
-    with open(expected_data_path, "rb") as f:
-        expected_result = json.load(f)
+        assert result.attrib == expected_result.attrib
 
-    # These will change test to test
-    del result["free_space"]
-    del result["used_space"]
-    del expected_result["free_space"]
-    del expected_result["used_space"]
+        scan_info = result.find("ScanInfo")
+        assert scan_info is not None
+        assert scan_info.get("volumePath", "").rstrip("/") == test_input
 
-    assert result == expected_result
+        # The root folder is named after the scanned path, so the checkout starts next to it
+        expected_scan_info = expected_result.find("ScanInfo")
+        assert expected_scan_info is not None
+        assert normalise_xml(scan_info) == normalise_xml(
+            expected_scan_info, os.path.dirname(test_input)
+        )
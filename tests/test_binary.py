@@ -0,0 +1,131 @@
+"""Test the binary scan format."""
+
+import itertools
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import diskspaced
+from diskspaced import binary_format
+from tests.helpers import read, without_usage
+from tests.test_sharding import make_wide_tree, settle_access_times
+from tests.test_writers import FILES, write_output
+
+# pylint: enable=wrong-import-position
+
+
+def test_varints():
+    """Test that varints are read back as they were written."""
+
+    values = [0, 1, 127, 128, 300, 16383, 16384, 2**32, 2**63 - 1]
+    encoded = bytearray()
+    binary_format.encode_varints(encoded, values)
+
+    assert encoded[:5] == bytes([0, 1, 127, 0x80, 1])
+    assert binary_format.decode_varints(encoded, 0, len(values)) == (values, len(encoded))
+
+
+def test_time_column_width():
+    """Test that the narrowest width is picked for a column of times."""
+
+    assert binary_format.time_column_width(100, 355) == 1
+    assert binary_format.time_column_width(100, 356) == 2
+    assert binary_format.time_column_width(-(2**20), 2**20) == 4
+    assert binary_format.time_column_width(0, 2**40) == 8
+
+
+def test_convert_matches_scan():
+    """Test that converting a binary scan gives the same output as scanning to that format."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_wide_tree(root)
+        os.makedirs(os.path.join(root, "empty", "also_empty"))
+        settle_access_times(root)
+
+        binary_path = os.path.join(tempdir, "scan.bin")
+        diskspaced.scan(root, binary_path, diskspaced.OutputFormat.BINARY, 0, True)
+
+        for output_format, pretty in itertools.product(
+            [diskspaced.OutputFormat.JSON, diskspaced.OutputFormat.GRAND_PERSPECTIVE], [False, True]
+        ):
+            expected_path = os.path.join(tempdir, "expected")
+            diskspaced.scan(root, expected_path, output_format, 0, True, pretty)
+
+            output_path = os.path.join(tempdir, "output")
+            diskspaced.convert(binary_path, output_path, output_format, pretty)
+
+            assert without_usage(read(output_path)) == without_usage(read(expected_path))
+
+
+def test_sharded_scan_matches_single_process():
+    """Test that fragments are merged into a binary scan as if it was scanned by one process."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_wide_tree(root)
+
+        expected_path = os.path.join(tempdir, "expected")
+        diskspaced.scan(root, expected_path, diskspaced.OutputFormat.BINARY, 0, True)
+
+        output_path = os.path.join(tempdir, "output")
+        diskspaced.scan(root, output_path, diskspaced.OutputFormat.BINARY, 0, True, processes=2)
+
+        with diskspaced.BinaryReader(output_path) as reader:
+            entries = list(reader.entries())
+
+        with diskspaced.BinaryReader(expected_path) as reader:
+            assert entries == list(reader.entries())
+
+
+def test_blocks_and_string_table_resets(monkeypatch):
+    """Test entries which span several blocks and string tables."""
+
+    monkeypatch.setattr(binary_format, "ENTRIES_PER_BLOCK", 3)
+    monkeypatch.setattr(binary_format, "MAX_STRINGS", 4)
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        output_path = os.path.join(tempdir, "output")
+        write_output(diskspaced.BinaryWriter, output_path, True)
+
+        with diskspaced.BinaryReader(output_path) as reader:
+            assert reader.root_path == "/root"
+            assert (reader.disk_usage_total, reader.disk_usage_free, reader.block_size) == (
+                100,
+                40,
+                4096,
+            )
+
+            entries = list(reader.entries())
+
+    assert entries == (
+        [(1, 0, "root", 0, 1, 2, 3), (2, 1, "sub", 0, 4, 5, 6)]
+        + [(0, 2, *file_entry) for file_entry in FILES]
+        + [(3, 1, "empty", 0, 7, 8, 9), (0, 1, *FILES[0])]
+    )
+
+
+def test_names_and_times_round_trip():
+    """Test names which aren't valid UTF-8, and sizes and times which need the widest columns."""
+
+    files = [("\udcff invalid utf-8", 2**40, -5, 0, 2**33), ("plain", 0, 2**33, 0, -5)]
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        output_path = os.path.join(tempdir, "output")
+
+        writer = diskspaced.BinaryWriter(output_path, 0)
+        writer.write_start("/root", 100, 60, 40, 4096)
+        writer.write_folder_start("root", 1, 2, 3)
+        writer.write_files(files)
+        writer.write_folder_end()
+        writer.write_end()
+
+        with diskspaced.BinaryReader(output_path) as reader:
+            assert list(reader.entries())[1:] == [(0, 1, *file_entry) for file_entry in files]
+
+        with pytest.raises(ValueError):
+            diskspaced.BinaryWriter(output_path, 0, compression=diskspaced.Compression.GZIP)
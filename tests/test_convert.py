@@ -0,0 +1,155 @@
+"""Test converting scans between formats."""
+
+import io
+import itertools
+import json
+import os
+import sys
+import tempfile
+from typing import Any, Iterator
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import diskspaced
+from diskspaced import json_events
+from diskspaced.json_events import JSONEventParser
+from tests.helpers import read, without_usage
+from tests.test_sharding import make_wide_tree, settle_access_times
+
+# pylint: enable=wrong-import-position
+
+FORMATS = [
+    diskspaced.OutputFormat.JSON,
+    diskspaced.OutputFormat.GRAND_PERSPECTIVE,
+    diskspaced.OutputFormat.NDJSON,
+]
+
+
+def test_convert_round_trip():
+    """Test that converting a scan to the same format, or to JSON and back, gives the same
+    output as the scan, however it was written."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_wide_tree(root)
+        os.makedirs(os.path.join(root, "empty", "also_empty"))
+        settle_access_times(root)
+
+        for output_format, pretty, compression in itertools.product(
+            FORMATS, [False, True], [None, diskspaced.Compression.GZIP]
+        ):
+            scan_path = os.path.join(tempdir, "scan")
+            diskspaced.scan(
+                root,
+                scan_path,
+                output_format,
+                0,
+                True,
+                pretty_print=pretty,
+                compression=compression,
+            )
+
+            assert diskspaced.detect_format(scan_path) == output_format
+
+            expected_path = os.path.join(tempdir, "expected")
+            diskspaced.scan(root, expected_path, output_format, 0, True, pretty_print=pretty)
+
+            for other_format in [output_format, diskspaced.OutputFormat.JSON]:
+                other_path = os.path.join(tempdir, "other")
+                diskspaced.convert(scan_path, other_path, other_format)
+
+                output_path = os.path.join(tempdir, "output")
+                diskspaced.convert(other_path, output_path, output_format, pretty)
+
+                assert without_usage(read(output_path)) == without_usage(read(expected_path))
+
+
+def test_convert_matches_scan():
+    """Test that converting JSON to newline delimited JSON matches scanning to it, as both have
+    the sizes after they were rounded up."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_wide_tree(root)
+        settle_access_times(root)
+
+        json_path = os.path.join(tempdir, "scan.json")
+        diskspaced.scan(root, json_path, diskspaced.OutputFormat.JSON, 0, True)
+
+        ndjson_path = os.path.join(tempdir, "scan.ndjson")
+        diskspaced.scan(root, ndjson_path, diskspaced.OutputFormat.NDJSON, 0, True)
+
+        converted_path = os.path.join(tempdir, "converted.ndjson")
+        diskspaced.convert(json_path, converted_path, diskspaced.OutputFormat.NDJSON)
+
+        assert without_usage(read(converted_path)) == without_usage(read(ndjson_path))
+
+
+def test_convert_unknown_format():
+    """Test that a file which isn't a scan can't be converted."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        input_path = os.path.join(tempdir, "input.txt")
+
+        with open(input_path, "w", encoding="utf-8") as f:
+            f.write("Not a scan")
+
+        with pytest.raises(ValueError):
+            diskspaced.convert(
+                input_path, os.path.join(tempdir, "output.json"), diskspaced.OutputFormat.JSON
+            )
+
+
+def build_value(events: Iterator[json_events.JSONEvent]) -> Any:
+    """Put the value the events start with back together."""
+
+    event = next(events)
+
+    if event[0] == json_events.VALUE:
+        return event[1]
+
+    if event[0] == json_events.START_MAP:
+        result: dict[str, Any] = {}
+
+        for key_event in events:
+            if key_event[0] == json_events.END_MAP:
+                return result
+
+            result[key_event[1]] = build_value(events)
+
+    assert event[0] == json_events.START_ARRAY
+    values: list[Any] = []
+
+    for value_event in events:
+        if value_event[0] == json_events.END_ARRAY:
+            return values
+
+        if value_event[0] == json_events.VALUES:
+            values += value_event[1]
+        else:
+            values.append(build_value(itertools.chain([value_event], events)))
+
+    raise AssertionError("The events end part of the way through an array")
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1024])
+def test_json_events(chunk_size: int, monkeypatch: pytest.MonkeyPatch):
+    """Test that the events describe the document, wherever the chunks end."""
+
+    monkeypatch.setattr(json_events, "CHUNK_SIZE", chunk_size)
+    monkeypatch.setattr(json_events, "LOOKAHEAD", 0)
+
+    document = (
+        '{"a": [{"b": 1, "c": "}]"}, {"d": -2.5e3}, 3, {"e": {"f": [true, null]}}, {"g": {}}], '
+        + '"h": "i\\"[", "j": [], "k": {}, "l": 12345678901234567890, "m": [[{"n": "\\u00e9"}]]}'
+    )
+    events = JSONEventParser(io.StringIO(document)).events()
+
+    assert build_value(events) == json.loads(document)
+    assert next(events, None) is None
+
+    for truncated in [document[:-1], document[:20], '{"a": [{"b": 1}, {"c"']:
+        with pytest.raises(ValueError):
+            list(JSONEventParser(io.StringIO(truncated)).events())
@@ -0,0 +1,125 @@
+"""Test estimating a folder tree from a random sample of it."""
+
+import contextlib
+import json
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import diskspaced
+from diskspaced import scan_estimate
+from tests.test_sharding import make_wide_tree
+
+# pylint: enable=wrong-import-position
+
+
+def make_even_tree(root: str) -> None:
+    """Create a tree where every folder below the top level holds the same."""
+
+    for i in range(3):
+        for j in range(20):
+            folder = os.path.join(root, f"folder_{i}", f"sub_folder_{j}")
+            os.makedirs(folder)
+
+            for k in range(2):
+                with open(os.path.join(folder, f"file_{k}.txt"), "wb") as f:
+                    f.write(b"x" * (i + 1))
+
+
+def test_exact_when_everything_is_walked():
+    """Test that walking every folder gives the exact totals, with nothing either side."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_wide_tree(root)
+
+        output_path = os.path.join(tempdir, "estimate.json")
+        report = diskspaced.estimate(root, output_path, sample_size=3, seed=1)
+
+        with open(output_path, encoding="utf-8") as f:
+            assert json.load(f) == report
+
+    assert report["folders_listed"] == 81
+    assert report["total"] == {
+        "file_count": {"estimate": 140, "low": 140, "high": 140},
+        "folder_count": {"estimate": 81, "low": 81, "high": 81},
+        "size": {"estimate": 1510, "low": 1510, "high": 1510},
+    }
+
+    # The largest folders come first
+    assert report["folders"][0] == {
+        "path": os.path.join(root, "folder_19"),
+        "file_count": {"estimate": 7, "low": 7, "high": 7},
+        "folder_count": {"estimate": 4, "low": 4, "high": 4},
+        "size": {"estimate": 142, "low": 142, "high": 142},
+    }
+    assert len(report["folders"]) == 20
+
+
+def test_sampled_estimates():
+    """Test that a sample of folders which all hold the same scales up to the exact totals, and
+    that the same seed picks the same sample."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_even_tree(root)
+
+        output_path = os.path.join(tempdir, "estimate.json")
+        report = diskspaced.estimate(root, output_path, sample_size=4, seed=1)
+        again = diskspaced.estimate(root, output_path, sample_size=4, seed=1)
+        assert (again["total"], again["folders"]) == (report["total"], report["folders"])
+
+    assert report["folders_listed"] == 1 + 3 + 3 * 4
+    assert report["total"]["file_count"] == {"estimate": 120, "low": 120, "high": 120}
+    assert report["total"]["size"] == {"estimate": 240, "low": 240, "high": 240}
+    assert [folder["size"]["estimate"] for folder in report["folders"]] == [120, 80, 40]
+
+
+def test_seed_picks_the_same_sample_in_any_listing_order(monkeypatch):
+    """Test that the same seed picks the same sub-folders whatever order they are listed in."""
+
+    scandir = os.scandir
+
+    @contextlib.contextmanager
+    def reversed_scandir(path):
+        with scandir(path) as entries:
+            yield reversed(list(entries))
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_wide_tree(root)
+
+        output_path = os.path.join(tempdir, "estimate.json")
+        report = diskspaced.estimate(root, output_path, sample_size=2, seed=3)
+
+        monkeypatch.setattr(os, "scandir", reversed_scandir)
+        again = diskspaced.estimate(root, output_path, sample_size=2, seed=3)
+
+    assert (again["total"], again["folders"]) == (report["total"], report["folders"])
+
+
+def test_combine_and_bounds():
+    """Test the estimator and its variance, and that intervals keep within what is known."""
+
+    sampled = [
+        scan_estimate.FolderEstimate("a", [1.0, 1.0, 10.0], [0.0, 0.0, 4.0], [1, 1, 10]),
+        scan_estimate.FolderEstimate("b", [3.0, 1.0, 30.0], [0.0, 0.0, 0.0], [3, 1, 30]),
+    ]
+    combined = scan_estimate.combine("root", [0, 1, 0], sampled, 4)
+
+    assert combined.totals == [8.0, 5.0, 80.0]
+    assert combined.seen == [4, 3, 40]
+
+    # 4 ** 2 * (1 - 2 / 4) * variance / 2, plus 4 / 2 times the variances of the sample
+    assert combined.variances == [8.0, 0.0, 800.0 + 8.0]
+
+    assert combined.interval(scan_estimate.FILE_COUNT, 2.0) == (8.0, 4.0, 8.0 + 2.0 * 8.0**0.5)
+    assert combined.interval(scan_estimate.SIZE, 2.0, 100.0) == (80.0, 40.0, 100.0)
+    assert combined.interval(scan_estimate.SIZE, 0.0, 50.0) == (50.0, 50.0, 50.0)
+
+    with pytest.raises(ValueError):
+        scan_estimate.ScanEstimator(diskspaced.FolderLister(False, diskspaced.ScanStats()), 1)
@@ -0,0 +1,69 @@
+"""Test the GrandPerspective encoder."""
+
+import datetime
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+from diskspaced.grand_perspective_encoder import GrandPerspectiveEncoder
+
+# pylint: enable=wrong-import-position
+
+TIME_ZONES = [
+    "UTC",
+    "America/New_York",
+    "Europe/London",
+    "Asia/Kolkata",
+    "Australia/Lord_Howe",
+    "Pacific/Chatham",
+]
+
+
+def reference_format(timestamp: int) -> str:
+    """Format the timestamp the way the GrandPerspective writer used to."""
+    return datetime.datetime.fromtimestamp(timestamp).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def test_format_time_matches_datetime():
+    """Test that timestamps are formatted exactly as datetime formats them."""
+
+    generator = random.Random(1234)
+    timestamps = [generator.randint(-(2**31), 2**33) for _ in range(5000)]
+
+    # Either side of the daylight saving changes in 2024 for the zones above
+    for change in [1710054000, 1711846800, 1712415600, 1727532000, 1728136800, 1730613600]:
+        timestamps.extend(range(change - 7200, change + 7200, 599))
+
+    timestamps.extend([0, -1, 86399, 86400, 951782400, 1724420371])
+
+    previous_time_zone = os.environ.get("TZ")
+
+    try:
+        for time_zone in TIME_ZONES:
+            os.environ["TZ"] = time_zone
+            time.tzset()
+
+            encoder = GrandPerspectiveEncoder(cache_size=100)
+
+            for timestamp in timestamps + timestamps[:200]:
+                assert encoder.format_time(timestamp) == reference_format(timestamp), (
+                    time_zone,
+                    timestamp,
+                )
+    finally:
+        if previous_time_zone is None:
+            del os.environ["TZ"]
+        else:
+            os.environ["TZ"] = previous_time_zone
+        time.tzset()
+
+
+def test_escape():
+    """Test that names are escaped the same way as before."""
+
+    for value in ["plain.txt", 'a "quoted" name', "this & that", "<tag>", "ü & <ö>"]:
+        expected = value.replace("&", "&amp;").replace("<", "&lt;").replace('"', "&quot;")
+        assert GrandPerspectiveEncoder.escape(value) == expected
@@ -0,0 +1,172 @@
+"""Test reusing folder listings from an index."""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import diskspaced
+from diskspaced.indexed_lister import IndexedFolderLister
+from diskspaced.scanner import FolderLister, scan_tree
+from tests.test_scanner import RecordingWriter, make_tree
+
+# pylint: enable=wrong-import-position
+
+
+class TimedRecordingWriter(RecordingWriter):
+    """Record the events sent to the writer, with the modified time of each folder."""
+
+    def write_folder_start(
+        self, folder_name: str, accessed_time: int, modified_time: int, created_time: int
+    ) -> None:
+        super().write_folder_start(folder_name, accessed_time, modified_time, created_time)
+        self.events[-1] = ("start", folder_name, modified_time)
+
+
+def age_folders(root: str) -> None:
+    """Move the modified time of every folder back, so that none of them are too new to trust."""
+
+    old_time = time.time() - 3600
+
+    for folder_path, _, _ in os.walk(root):
+        os.utime(folder_path, (old_time, old_time))
+
+
+def scan_with_index(
+    root: str, index_path: str, scan_filter: diskspaced.ScanFilter | None = None
+) -> tuple[list, diskspaced.ScanStats]:
+    """Scan the tree using the index, returning the events and the statistics."""
+
+    writer = TimedRecordingWriter()
+    stats = diskspaced.ScanStats()
+
+    with IndexedFolderLister(True, stats, index_path, root, scan_filter) as lister:
+        scan_tree(root, writer, lister)
+
+    return writer.events, stats
+
+
+def scan_without_index(root: str) -> list:
+    """Scan the tree as usual, returning the events."""
+
+    writer = TimedRecordingWriter()
+    scan_tree(root, writer, FolderLister(True, diskspaced.ScanStats()))
+    return writer.events
+
+
+def test_unchanged_folders_are_reused():
+    """Test that only the folders which changed are listed again."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        index_path = os.path.join(tempdir, "index.sqlite")
+        make_tree(root)
+        age_folders(root)
+
+        events, stats = scan_with_index(root, index_path)
+        assert events == scan_without_index(root)
+        assert stats.reused_folders == 0
+
+        events, stats = scan_with_index(root, index_path)
+        assert events == scan_without_index(root)
+        assert stats.reused_folders == stats.folders == 4
+
+        # Adding a file changes its folder, and its parent has to notice its new time
+        with open(os.path.join(root, "b", "c", "new.txt"), "wb") as f:
+            f.write(b"x" * 13)
+
+        events, stats = scan_with_index(root, index_path)
+        assert events == scan_without_index(root)
+        assert ("file", "new.txt", 13) in events
+        assert stats.reused_folders == 3
+
+
+def test_changing_the_filter_empties_the_index():
+    """Test that listings made with different rules aren't reused."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_tree(root)
+        age_folders(root)
+        index_path = os.path.join(tempdir, "index.sqlite")
+
+        scan_with_index(root, index_path, diskspaced.ScanFilter(["*.txt"]))
+        events, stats = scan_with_index(root, index_path, diskspaced.ScanFilter(["*.txt"]))
+        assert stats.reused_folders == 4
+        assert not [event for event in events if event[0] == "file"]
+
+        events, stats = scan_with_index(root, index_path)
+        assert stats.reused_folders == 0
+        assert events == scan_without_index(root)
+
+
+def test_recently_changed_folders_are_listed_again():
+    """Test that folders which changed just before being listed aren't trusted."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        index_path = os.path.join(tempdir, "index.sqlite")
+        make_tree(root)
+
+        scan_with_index(root, index_path)
+        _, stats = scan_with_index(root, index_path)
+
+    assert stats.reused_folders == 0
+
+
+def test_removed_folders_leave_the_index():
+    """Test that folders which are no longer in the tree are removed from the index."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        index_path = os.path.join(tempdir, "index.sqlite")
+        make_tree(root)
+        os.makedirs(os.path.join(tempdir, "root_sibling"))
+        age_folders(tempdir)
+
+        scan_with_index(os.path.join(tempdir, "root_sibling"), index_path)
+        scan_with_index(root, index_path)
+
+        os.rmdir(os.path.join(root, "a"))
+        events, _ = scan_with_index(root, index_path)
+        assert events == scan_without_index(root)
+
+        with IndexedFolderLister(True, diskspaced.ScanStats(), index_path, root) as lister:
+            paths = sorted(
+                os.fsdecode(row[0])
+                for row in lister.connection.execute("SELECT path FROM folders").fetchall()
+            )
+
+    assert paths == [
+        os.path.join(tempdir, name) for name in ["root", "root/b", "root/b/c", "root_sibling"]
+    ]
+
+
+def test_scan_with_index():
+    """Test that a scan with an index gives the same output as one without."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_tree(root)
+        age_folders(root)
+
+        expected_path = os.path.join(tempdir, "expected")
+        diskspaced.scan(root, expected_path, diskspaced.OutputFormat.BINARY, 0, True)
+
+        output_path = os.path.join(tempdir, "output")
+        index_path = os.path.join(tempdir, "index.sqlite")
+
+        for _ in range(2):
+            stats = diskspaced.scan(
+                root, output_path, diskspaced.OutputFormat.BINARY, 0, True, index_path=index_path
+            )
+
+            with diskspaced.BinaryReader(output_path) as reader:
+                entries = [entry[:4] + entry[5:] for entry in reader.entries()]
+
+            with diskspaced.BinaryReader(expected_path) as reader:
+                assert entries == [entry[:4] + entry[5:] for entry in reader.entries()]
+
+    assert stats.reused_folders == 4
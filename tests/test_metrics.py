@@ -0,0 +1,143 @@
+"""Test reporting the progress of a scan."""
+
+import errno
+import io
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import diskspaced
+from diskspaced.scanner import list_folder
+from tests.test_sharding import make_wide_tree
+
+# pylint: enable=wrong-import-position
+
+
+def test_reports_match_scan():
+    """Test that the final reports have the counts from the scan."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_wide_tree(root)
+
+        total_size = 0
+
+        for folder_path, _, file_names in os.walk(root):
+            for file_name in file_names:
+                total_size += os.lstat(os.path.join(folder_path, file_name)).st_size
+
+        output_path = os.path.join(tempdir, "output.json.gz")
+        metrics_path = os.path.join(tempdir, "metrics.prom")
+        status_path = os.path.join(tempdir, "status.json")
+        stream = io.StringIO()
+
+        for workers in [1, 3]:
+            reporter = diskspaced.ScanReporter(0.001, stream, metrics_path, status_path)
+            stats = diskspaced.scan(
+                root,
+                output_path,
+                diskspaced.OutputFormat.JSON,
+                0,
+                True,
+                workers=workers,
+                compression=diskspaced.Compression.GZIP,
+                reporter=reporter,
+            )
+
+            with open(status_path, "rb") as f:
+                status = json.load(f)
+
+            assert status["finished"]
+            assert status["folders"] == stats.folders == 81
+            assert status["files"] == stats.files == 140
+            assert status["bytes_seen"] == stats.bytes_seen == total_size
+            assert status["syscalls"] == stats.syscalls
+            assert status["depth"] == 0
+            assert status["skipped"] == {}
+            assert status["eta_seconds"] == 0
+
+            # The output is measured before it is compressed
+            assert status["bytes_written"] > os.path.getsize(output_path)
+
+            with open(metrics_path, "r", encoding="utf-8") as f:
+                metrics = f.read()
+
+            assert "diskspaced_files_total 140\n" in metrics
+            assert f"diskspaced_file_bytes_total {total_size}\n" in metrics
+            assert "diskspaced_finished 1\n" in metrics
+
+            last_line = stream.getvalue().splitlines()[-1]
+            assert last_line.startswith("Scanned 140 files (")
+            assert "finished in" in last_line
+
+
+def test_skipped_by_error():
+    """Test that entries which can't be looked at are counted by the error."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        stats = diskspaced.ScanStats()
+        list_folder(os.path.join(tempdir, "missing"), False, stats)
+        list_folder(os.path.join(tempdir, "missing"), False, stats)
+
+        assert stats.skipped == {errno.ENOENT: 2}
+
+        other_stats = diskspaced.ScanStats()
+        other_stats.count_skipped(errno.EACCES)
+        other_stats.count_skipped(errno.ENOENT)
+        stats.merge(other_stats)
+
+        assert stats.skipped == {errno.ENOENT: 3, errno.EACCES: 1}
+
+        reporter = diskspaced.ScanReporter()
+        reporter.stats = stats
+        metrics = reporter.snapshot()
+
+        assert metrics["skipped"] == {"ENOENT": 3, "EACCES": 1}
+        assert "skipped 3 ENOENT, 1 EACCES" in reporter.format_line(metrics)
+        assert 'diskspaced_skipped_entries_total{errno="EACCES"} 1\n' in (
+            reporter.format_prometheus(metrics)
+        )
+
+
+def test_time_left():
+    """Test that the time left is estimated from the size of the files still to scan."""
+
+    reporter = diskspaced.ScanReporter()
+    reporter.expected_bytes = 4000
+    reporter.start_time -= 10
+
+    assert reporter.snapshot()["eta_seconds"] is None
+
+    reporter.stats.bytes_seen = 1000
+    eta_seconds = reporter.snapshot()["eta_seconds"]
+
+    # A quarter was scanned in ten seconds, so the rest should take thirty
+    assert 30 <= eta_seconds < 31
+
+    reporter.stats.bytes_seen = 5000
+    assert reporter.snapshot()["eta_seconds"] == 0
+
+
+def test_unwritable_status_file():
+    """Test that a status file which can't be written doesn't fail a scan."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_wide_tree(root)
+
+        status_path = os.path.join(tempdir, "missing", "status.json")
+        reporter = diskspaced.ScanReporter(60, None, None, status_path)
+        stats = diskspaced.scan(
+            root,
+            os.path.join(tempdir, "output.json"),
+            diskspaced.OutputFormat.JSON,
+            0,
+            True,
+            reporter=reporter,
+        )
+
+        assert stats.files == 140
+        assert not os.path.exists(status_path)
@@ -0,0 +1,169 @@
+"""Test writing results as newline delimited JSON."""
+
+import gzip
+import json
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import diskspaced
+from diskspaced.ndjson_writer import chunk_path
+from tests.test_sharding import make_wide_tree, read_body
+
+# pylint: enable=wrong-import-position
+
+
+def read_paths(output_paths: list[str]) -> dict[str, int | None]:
+    """Put the tree back together from the records, as the size of each path, or None for a
+    folder, checking that every record is in a folder written before it."""
+
+    folder_paths: dict[int, str] = {}
+    paths: dict[str, int | None] = {}
+    next_id = 1
+
+    for output_path in output_paths:
+        with open(output_path, "rb") as f:
+            contents = f.read()
+
+        if output_path.endswith(".gz"):
+            contents = gzip.decompress(contents)
+
+        for line in contents.splitlines():
+            record = json.loads(line)
+
+            if record["type"] == "scan":
+                continue
+
+            assert record["id"] == next_id
+            next_id += 1
+
+            if record["parent"] is None:
+                path = record["name"]
+            else:
+                path = folder_paths[record["parent"]] + "/" + record["name"]
+
+            if record["type"] == "folder":
+                folder_paths[record["id"]] = path
+                paths[path] = None
+            else:
+                paths[path] = record["size"]
+
+    return paths
+
+
+def test_records_match_tree():
+    """Test that the records describe the tree, however the output is written."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_wide_tree(root)
+
+        block_size = os.statvfs(root).f_bsize
+        expected_paths: dict[str, int | None] = {}
+
+        for folder_path, _, file_names in os.walk(root):
+            relative_path = os.path.relpath(folder_path, tempdir)
+            expected_paths[relative_path] = None
+
+            for file_name in file_names:
+                size = os.lstat(os.path.join(folder_path, file_name)).st_size
+                expected_paths[relative_path + "/" + file_name] = max(block_size, size)
+
+        expected_path = os.path.join(tempdir, "expected.ndjson")
+        diskspaced.scan(root, expected_path, diskspaced.OutputFormat.NDJSON, 0, True)
+
+        assert read_paths([expected_path]) == expected_paths
+
+        # Several processes renumber their records, which should come out the same
+        output_path = os.path.join(tempdir, "output.ndjson")
+        diskspaced.scan(root, output_path, diskspaced.OutputFormat.NDJSON, 0, True, processes=3)
+
+        assert read_body(output_path, 1) == read_body(expected_path, 1)
+
+        for processes in [1, 3]:
+            rotated_path = os.path.join(tempdir, f"rotated_{processes}.ndjson.gz")
+            diskspaced.scan(
+                root,
+                rotated_path,
+                diskspaced.OutputFormat.NDJSON,
+                0,
+                True,
+                processes=processes,
+                compression=diskspaced.Compression.GZIP,
+                records_per_file=50,
+            )
+
+            # There are 81 folders and 140 files
+            chunk_paths = [chunk_path(rotated_path, index) for index in range(1, 6)]
+            assert not os.path.exists(chunk_path(rotated_path, 6))
+            assert read_paths(chunk_paths) == expected_paths
+
+
+def test_chunk_path():
+    """Test that chunk numbers go before the extensions."""
+
+    assert chunk_path("/a/scan.ndjson", 1) == "/a/scan.000001.ndjson"
+    assert chunk_path("/a.b/scan.ndjson.gz", 12) == "/a.b/scan.000012.ndjson.gz"
+    assert chunk_path("scan", 3) == "scan.000003"
+
+
+def test_flush_interval():
+    """Test that records are flushed to the output as they are written with a flush interval."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        output_path = os.path.join(tempdir, "output.ndjson")
+        writer = diskspaced.NDJSONWriter(output_path, 0, flush_interval=0.001)
+
+        # Tests flush after every write otherwise
+        writer.flush_after_writes = False
+
+        writer.write_start(tempdir, 0, 0, 0, 0)
+        writer.write_folder_start("root", 1, 2, 3)
+        writer.last_flush -= 1
+        writer.write_files([("file", 10, 1, 2, 3)])
+
+        with open(output_path, "rb") as f:
+            assert len(f.read().splitlines()) == 3
+
+        writer.write_folder_end()
+        writer.write_end()
+
+    with pytest.raises(ValueError):
+        diskspaced.NDJSONWriter(diskspaced.STDOUT_PATH, 0, records_per_file=10)
+
+
+def test_names_which_are_not_utf8():
+    """Test that names which aren't valid UTF-8 are written as the bytes they were, and read back,
+    on one process or several."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_wide_tree(root)
+
+        with open(os.path.join(os.fsencode(root), b"folder_3", b"caf\xe9.txt"), "wb") as f:
+            f.write(b"x")
+
+        name = b"caf\xe9.txt".decode("utf-8", "surrogateescape")
+        output_path = os.path.join(tempdir, "output.ndjson")
+
+        for processes in [1, 3]:
+            diskspaced.scan(
+                root, output_path, diskspaced.OutputFormat.NDJSON, 0, True, processes=processes
+            )
+
+            with open(output_path, "rb") as f:
+                assert b'"name":"caf\xe9.txt"' in f.read()
+
+            with diskspaced.NDJSONReader(output_path) as reader:
+                names = [
+                    file_entry[0]
+                    for event in reader.events()
+                    if event[0] == diskspaced.FILES
+                    for file_entry in event[1]
+                ]
+
+            assert name in names
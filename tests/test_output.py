@@ -0,0 +1,142 @@
+"""Test writing the output to streams."""
+
+import gzip
+import json
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import diskspaced
+from diskspaced.output import BackgroundCompressor, open_output
+from tests.helpers import without_usage
+from tests.test_sharding import make_wide_tree
+
+# pylint: enable=wrong-import-position
+
+
+class NotSeekable(Exception):
+    """Raised when something tries to seek on the output."""
+
+
+def test_compression_from_path():
+    """Test that the compression is picked from the extension."""
+
+    assert diskspaced.Compression.from_path("scan.json.gz") == diskspaced.Compression.GZIP
+    assert diskspaced.Compression.from_path("scan.xml.zst") == diskspaced.Compression.ZSTD
+    assert diskspaced.Compression.from_path("scan.json") is None
+
+
+def test_gzip_output_matches_uncompressed():
+    """Test that compressed output is the same as uncompressed output once decompressed."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_wide_tree(root)
+
+        for output_format in [
+            diskspaced.OutputFormat.JSON,
+            diskspaced.OutputFormat.GRAND_PERSPECTIVE,
+        ]:
+            for pretty in [False, True]:
+                expected_path = os.path.join(tempdir, "expected")
+                diskspaced.scan(root, expected_path, output_format, 0, True, pretty)
+
+                output_path = os.path.join(tempdir, "output.gz")
+                diskspaced.scan(
+                    root,
+                    output_path,
+                    output_format,
+                    0,
+                    True,
+                    pretty,
+                    compression=diskspaced.Compression.GZIP,
+                )
+
+                with open(expected_path, "rb") as f:
+                    expected = f.read()
+
+                with gzip.open(output_path, "rb") as f:
+                    output = f.read()
+
+                assert without_usage(output) == without_usage(expected)
+
+
+def test_background_compressor_large_output():
+    """Test that output larger than a chunk is compressed in full."""
+
+    data = bytes(range(256)) * 20_000
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        output_path = os.path.join(tempdir, "output.gz")
+
+        with open_output(output_path, diskspaced.Compression.GZIP) as output:
+            assert isinstance(output, BackgroundCompressor)
+
+            for offset in range(0, len(data), 1000):
+                output.write(data[offset : offset + 1000])
+
+        with gzip.open(output_path, "rb") as f:
+            assert f.read() == data
+
+
+def test_json_writer_never_seeks(monkeypatch):
+    """Test that the JSON writer only writes forwards, so it can write to a pipe."""
+
+    def seek(*_):
+        raise NotSeekable()
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_wide_tree(root)
+        os.makedirs(os.path.join(root, "empty"))
+
+        for pretty in [False, True]:
+            output_path = os.path.join(tempdir, "output.json")
+
+            with monkeypatch.context() as context:
+                context.setattr(diskspaced.writer, "open_output", no_seek_output(seek))
+                diskspaced.scan(root, output_path, diskspaced.OutputFormat.JSON, 0, True, pretty)
+
+            with open(output_path, "rb") as f:
+                result = json.load(f)
+
+            assert len(result["contents"][0]["contents"]) == 21
+
+
+def no_seek_output(seek):
+    """Wrap `open_output` so that the files it opens can't be seeked on."""
+
+    def wrapper(*args, **kwargs):
+        output = open_output(*args, **kwargs)
+        output.seek = seek
+        return output
+
+    return wrapper
+
+
+def test_stdout_output(capfdbinary):
+    """Test that the output can be written to stdout."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_wide_tree(root)
+
+        diskspaced.scan(root, "-", diskspaced.OutputFormat.JSON, 0, True)
+
+    result = json.loads(capfdbinary.readouterr().out)
+
+    assert len(result["contents"][0]["contents"]) == 20
+
+
+def test_missing_zstandard(monkeypatch):
+    """Test that asking for zstd without the package installed gives a clear error."""
+
+    monkeypatch.setattr(diskspaced.output, "zstandard", None)
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        with pytest.raises(ValueError, match="zstandard"):
+            open_output(os.path.join(tempdir, "output.zst"), diskspaced.Compression.ZSTD)
@@ -0,0 +1,115 @@
+"""Test profiling scans."""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import diskspaced
+from diskspaced.profiling import PHASES, LatencyHistogram, _ProfilingOutput
+from tests.test_sharding import make_wide_tree, read_body, settle_access_times
+
+# pylint: enable=wrong-import-position
+
+
+def test_profiled_scan_matches():
+    """Test that a profiled scan writes the same output, and accounts for all of its time."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_wide_tree(root)
+        settle_access_times(root)
+
+        expected_path = os.path.join(tempdir, "expected.json")
+        diskspaced.scan(root, expected_path, diskspaced.OutputFormat.JSON, 0, True)
+
+        for workers, use_cprofile, use_tracemalloc in [(1, False, False), (3, True, True)]:
+            profiled_path = os.path.join(tempdir, "profiled.json")
+            profiler = diskspaced.ScanProfiler(use_cprofile, use_tracemalloc)
+            stats = diskspaced.scan(
+                root,
+                profiled_path,
+                diskspaced.OutputFormat.JSON,
+                0,
+                True,
+                workers=workers,
+                profiler=profiler,
+            )
+
+            assert read_body(profiled_path, 1) == read_body(expected_path, 1)
+
+            assert profiler.listing_latency.count == stats.folders
+
+            # With several workers, the pool's lstat calls are part of waiting for it
+            assert profiler.phase_ns["stat"] > 0 or workers > 1
+            assert all(profiler.phase_ns[phase] >= 0 for phase in PHASES)
+            assert sum(profiler.phase_ns.values()) == profiler.total_ns
+
+            report_path = os.path.join(tempdir, "profile.txt")
+            profiler.write_report(report_path)
+
+            with open(report_path, "r", encoding="utf-8") as f:
+                report = f.read()
+
+            assert "listing folders" in report
+            assert ("cProfile" in report) == use_cprofile
+            assert ("Peak traced memory" in report) == use_tracemalloc
+            assert os.path.exists(report_path + ".pstats") == use_cprofile
+
+
+def test_rotated_outputs_are_timed():
+    """Test that outputs a writer opens part way through are timed as well."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        profiler = diskspaced.ScanProfiler()
+        writer = diskspaced.NDJSONWriter(
+            os.path.join(tempdir, "output.ndjson"), 0, records_per_file=2
+        )
+        profiler.wrap_output(writer)
+
+        writer.write_start(tempdir, 0, 0, 0, 0)
+        writer.write_folder_start("root", 1, 2, 3)
+        writer.write_files([(f"file_{index}", 10, 1, 2, 3) for index in range(5)])
+
+        assert len(writer.output_paths) == 3
+        assert isinstance(writer.file, _ProfilingOutput)
+
+        writer.write_folder_end()
+        writer.write_end()
+
+    assert profiler.phase_ns["output"] > 0
+
+
+def test_profiling_several_processes():
+    """Test that a scan on several processes can't be profiled."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        with pytest.raises(ValueError):
+            diskspaced.scan(
+                tempdir,
+                os.path.join(tempdir, "output.json"),
+                diskspaced.OutputFormat.JSON,
+                0,
+                True,
+                processes=2,
+                profiler=diskspaced.ScanProfiler(),
+            )
+
+
+def test_latency_histogram():
+    """Test that durations are counted in buckets which double in size."""
+
+    histogram = LatencyHistogram()
+
+    for duration_ns in [500, 1_000, 1_999, 3_000, 3_500, 1_000_000]:
+        histogram.add(duration_ns)
+
+    assert histogram.buckets[:4] == [1, 2, 2, 0]
+    assert histogram.buckets[10] == 1
+    assert histogram.count == 6
+    assert histogram.max_ns == 1_000_000
+    assert histogram.percentile(0.5) == 2
+    assert histogram.percentile(0.99) == 1024
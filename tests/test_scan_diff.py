@@ -0,0 +1,163 @@
+"""Test comparing two scans."""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import diskspaced
+from diskspaced.events import FILES, FOLDER_END_EVENT, FOLDER_START, ScanEvent
+from tests.test_sharding import make_wide_tree
+
+# pylint: enable=wrong-import-position
+
+
+def read_changes(output_path: str) -> list[tuple[str, str, str, int]]:
+    """Read the changes which were written, as the change, type, path and delta of each."""
+
+    with open(output_path, "r", encoding="utf-8", errors="surrogateescape") as f:
+        records = [json.loads(line) for line in f]
+
+    for record in records:
+        assert record["delta"] == record["new_size"] - record["old_size"]
+
+    return [
+        (record["change"], record["type"], record["path"], record["delta"]) for record in records
+    ]
+
+
+def test_diff_scans():
+    """Test that the changes to a tree are found, between scans in different formats."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_wide_tree(root)
+        block_size = os.statvfs(root).f_bsize
+
+        old_path = os.path.join(tempdir, "old.json.gz")
+        diskspaced.scan(root, old_path, diskspaced.OutputFormat.JSON, 0, True)
+
+        shutil.rmtree(os.path.join(root, "folder_1"))
+        os.makedirs(os.path.join(root, "folder_0", "new", "deeper"))
+
+        for path, size in [
+            (os.path.join(root, "folder_0", "new", "deeper", "big.bin"), 10 * block_size),
+            (os.path.join(root, "folder_0", "file.txt"), 3 * block_size),
+            (os.path.join(root, "folder_2", "aaa.txt"), 2 * block_size),
+        ]:
+            with open(path, "wb") as f:
+                f.write(b"x" * size)
+
+        new_path = os.path.join(tempdir, "new.bin")
+        diskspaced.scan(root, new_path, diskspaced.OutputFormat.BINARY, 0, True)
+
+        output_path = os.path.join(tempdir, "changes.ndjson")
+        stats = diskspaced.diff(old_path, new_path, output_path)
+
+        assert read_changes(output_path) == [
+            ("added", "folder", os.path.join(root, "folder_0", "new"), 10 * block_size),
+            ("resized", "file", os.path.join(root, "folder_0", "file.txt"), 2 * block_size),
+            ("resized", "folder", os.path.join(root, "folder_0"), 12 * block_size),
+            ("removed", "folder", os.path.join(root, "folder_1"), -7 * block_size),
+            ("added", "file", os.path.join(root, "folder_2", "aaa.txt"), 2 * block_size),
+            ("resized", "folder", os.path.join(root, "folder_2"), 2 * block_size),
+            ("resized", "folder", root, 7 * block_size),
+        ]
+
+        assert stats.changes["added", "folder"] == 2
+        assert stats.changes["removed", "folder"] == 4
+        assert stats.changes["removed", "file"] == 7
+        assert stats.new_size - stats.old_size == 7 * block_size
+
+        # Only the changes of at least the minimum are written
+        diskspaced.diff(old_path, new_path, output_path, min_change=7 * block_size)
+        assert [change[3] for change in read_changes(output_path)] == [
+            10 * block_size,
+            12 * block_size,
+            -7 * block_size,
+            7 * block_size,
+        ]
+
+        diskspaced.diff(new_path, new_path, output_path)
+        assert not read_changes(output_path)
+
+
+def test_diff_names_which_are_not_utf8():
+    """Test that changes to entries whose names aren't valid UTF-8 are written as their bytes."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_wide_tree(root)
+
+        old_path = os.path.join(tempdir, "old.bin")
+        diskspaced.scan(root, old_path, diskspaced.OutputFormat.BINARY, 0, True)
+
+        with open(os.path.join(os.fsencode(root), b"folder_3", b"bad\xff.txt"), "wb") as f:
+            f.write(b"x")
+
+        new_path = os.path.join(tempdir, "new.bin")
+        diskspaced.scan(root, new_path, diskspaced.OutputFormat.BINARY, 0, True)
+
+        output_path = os.path.join(tempdir, "changes.ndjson")
+        diskspaced.diff(old_path, new_path, output_path)
+
+        with open(output_path, "rb") as f:
+            assert b"bad\xff.txt" in f.read()
+
+        path = os.path.join(root, "folder_3", b"bad\xff.txt".decode("utf-8", "surrogateescape"))
+        assert ("added", "file", path, os.statvfs(root).f_bsize) in read_changes(output_path)
+
+
+def chain(depth: int, file_size: int) -> list[ScanEvent]:
+    """Make the events for a chain of folders with a file at the bottom."""
+
+    events: list[ScanEvent] = []
+
+    for index in range(depth):
+        events.append((FOLDER_START, f"folder_{index}", f"/chain/{index}", 1, 2, 3))
+
+    events.append((FILES, [("file", file_size, 1, 2, 3)]))
+    events += [FOLDER_END_EVENT] * depth
+
+    return events
+
+
+def test_diff_deep_tree():
+    """Test that the memory used depends on the depth of the tree, without running out of stack."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        output_path = os.path.join(tempdir, "changes.ndjson")
+        stats = diskspaced.ScanDiff(output_path).compare(chain(5000, 10), chain(5000, 25))
+
+        changes = read_changes(output_path)
+
+        assert len(changes) == 5001
+        assert all(change[0] == "resized" and change[3] == 15 for change in changes)
+        assert (stats.old_size, stats.new_size) == (10, 25)
+
+
+def test_diff_out_of_order():
+    """Test that scans which weren't written in alphabetical order can't be compared."""
+
+    root: ScanEvent = (FOLDER_START, "root", "/root", 1, 2, 3)
+    ordered = [root, (FILES, [("a", 1, 1, 2, 3), ("b", 1, 1, 2, 3)]), FOLDER_END_EVENT]
+    unordered = [root, (FILES, [("b", 1, 1, 2, 3), ("a", 1, 1, 2, 3)]), FOLDER_END_EVENT]
+    files_first = [
+        root,
+        (FILES, [("a", 1, 1, 2, 3)]),
+        (FOLDER_START, "sub", "/root/sub", 1, 2, 3),
+        FOLDER_END_EVENT,
+        FOLDER_END_EVENT,
+    ]
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        output_path = os.path.join(tempdir, "changes.ndjson")
+
+        for events in [unordered, files_first]:
+            with pytest.raises(ValueError):
+                diskspaced.ScanDiff(output_path).compare(ordered, events)
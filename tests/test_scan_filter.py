@@ -0,0 +1,86 @@
+"""Test skipping parts of the tree while scanning."""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import diskspaced
+from diskspaced.scanner import list_folder
+from tests.test_scanner import make_tree
+
+# pylint: enable=wrong-import-position
+
+
+@pytest.mark.parametrize(
+    "exclude_globs,exclude_regexes,path,excluded",
+    [
+        (["node_modules"], [], "/src/app/node_modules", True),
+        (["node_modules"], [], "/src/app/node_modules_old", False),
+        (["*.log"], [], "/var/log/syslog.log", True),
+        (["*.log"], [], "/var/log/syslog", False),
+        (["[!a]b?"], [], "/x/bbc", True),
+        (["[!a]b?"], [], "/x/abc", False),
+        (["/proc"], [], "/proc", True),
+        (["/proc/"], [], "/proc", True),
+        (["/proc"], [], "/srv/proc", False),
+        (["/home/*/.cache"], [], "/home/user/.cache", True),
+        (["/home/*/.cache"], [], "/home/user/deeper/.cache", False),
+        (["/home/**/.cache"], [], "/home/user/deeper/.cache", True),
+        ([".cache/*"], [], "/home/user/.cache/pip", True),
+        ([".cache/*"], [], "/home/user/.cache", False),
+        ([], [r"\.tmp$"], "/a/b.tmp", True),
+        ([], [r"^/var/lib/docker/overlay\d*/"], "/var/lib/docker/overlay2/abc", True),
+        ([], [r"^/var/lib/docker/overlay\d*/"], "/var/lib/docker/volumes", False),
+        (["*.log", "/proc", "cache"], [r"\.tmp$"], "/srv/data", False),
+    ],
+)
+def test_excludes(exclude_globs, exclude_regexes, path, excluded):
+    """Test which entries the rules match."""
+
+    scan_filter = diskspaced.ScanFilter(exclude_globs, exclude_regexes)
+
+    assert scan_filter.excludes(os.path.basename(path), path) == excluded
+
+
+def test_invalid_regex():
+    """Test that invalid regular expressions are reported."""
+
+    with pytest.raises(ValueError):
+        diskspaced.ScanFilter(exclude_regexes=["("])
+
+
+def test_scan_with_filter():
+    """Test that excluded entries and other devices are skipped by a scan."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_tree(root)
+
+        scan_filter = diskspaced.ScanFilter(["y.txt", os.path.join(root, "b", "c")])
+        tree = diskspaced.build_tree(root, True, scan_filter=scan_filter)
+
+        assert sorted(os.path.relpath(tree.path(index), root) for index in range(len(tree))) == [
+            ".",
+            "a",
+            "b",
+            os.path.join("b", "two.txt"),
+            "z.txt",
+        ]
+
+        # Pretend the root is on another device, so every folder in it is skipped
+        scan_filter = diskspaced.ScanFilter(one_file_system=True)
+        scan_filter.set_root(root)
+        assert scan_filter.root_device == os.lstat(root).st_dev
+
+        folders, files = list_folder(root, True, diskspaced.ScanStats(), scan_filter)
+        assert [folder[0] for folder in folders] == ["a", "b"]
+        assert [file[0] for file in files] == ["y.txt", "z.txt"]
+
+        scan_filter.root_device = -1
+        folders, files = list_folder(root, True, diskspaced.ScanStats(), scan_filter)
+        assert not folders
+        assert [file[0] for file in files] == ["y.txt", "z.txt"]
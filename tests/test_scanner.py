@@ -0,0 +1,177 @@
+"""Test the folder scanner."""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import diskspaced
+from diskspaced.scanner import FolderLister, scan_tree
+from diskspaced.threaded_lister import ThreadedFolderLister
+
+# pylint: enable=wrong-import-position
+
+
+class RecordingWriter(diskspaced.Writer):
+    """Record the events sent to the writer."""
+
+    def __init__(self) -> None:
+        super().__init__("", 0)
+        self.events: list[tuple] = []
+
+    def write_folder_start(
+        self, folder_name: str, accessed_time: int, modified_time: int, created_time: int
+    ) -> None:
+        super().write_folder_start(folder_name, accessed_time, modified_time, created_time)
+        self.events.append(("start", folder_name))
+
+    def write_folder_end(self) -> None:
+        super().write_folder_end()
+        self.events.append(("end",))
+
+    def write_file(
+        self, file_name: str, size: int, accessed_time: int, modified_time: int, created_time: int
+    ) -> None:
+        super().write_file(file_name, size, accessed_time, modified_time, created_time)
+        self.events.append(("file", file_name, size))
+
+
+def make_tree(root: str) -> None:
+    """Create a small tree with a few links in it."""
+
+    os.makedirs(os.path.join(root, "b", "c"))
+    os.makedirs(os.path.join(root, "a"))
+
+    for path, size in [("z.txt", 3), ("y.txt", 5), ("b/two.txt", 7), ("b/c/three.txt", 11)]:
+        with open(os.path.join(root, path), "wb") as f:
+            f.write(b"x" * size)
+
+    os.symlink(os.path.join(root, "b"), os.path.join(root, "link_to_folder"))
+    os.symlink(os.path.join(root, "z.txt"), os.path.join(root, "link_to_file"))
+    os.symlink(os.path.join(root, "missing"), os.path.join(root, "broken_link"))
+
+
+def test_scan_tree_order_and_links():
+    """Test that folders come before files, in order, and that links are skipped."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_tree(root)
+
+        writer = RecordingWriter()
+        scan_tree(root, writer, FolderLister(True, diskspaced.ScanStats()))
+
+    assert writer.events == [
+        ("start", "root"),
+        ("start", "a"),
+        ("end",),
+        ("start", "b"),
+        ("start", "c"),
+        ("file", "three.txt", 11),
+        ("end",),
+        ("file", "two.txt", 7),
+        ("end",),
+        ("file", "y.txt", 5),
+        ("file", "z.txt", 3),
+        ("end",),
+    ]
+
+
+def test_scan_tree_syscalls():
+    """Test that each entry costs a single syscall."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_tree(root)
+
+        stats = diskspaced.ScanStats()
+        scan_tree(root, RecordingWriter(), FolderLister(False, stats))
+
+    # The root lstat, one scandir per folder and one lstat per non-link entry
+    assert stats.folders == 4
+    assert stats.files == 4
+    assert stats.syscalls == 1 + 4 + (3 + 4)
+
+
+def test_scan_tree_deeper_than_recursion_limit():
+    """Test that trees deeper than the interpreter's recursion limit can be scanned."""
+
+    depth = sys.getrecursionlimit() + 100
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        # os.makedirs and shutil.rmtree both recurse, so build and remove the tree by hand
+        paths = [tempdir]
+        for _ in range(depth):
+            paths.append(os.path.join(paths[-1], "d"))
+            os.mkdir(paths[-1])
+
+        writer = RecordingWriter()
+
+        try:
+            scan_tree(tempdir, writer, FolderLister(False, diskspaced.ScanStats()))
+        finally:
+            for path in reversed(paths[1:]):
+                os.rmdir(path)
+
+    assert len(writer.events) == 2 * (depth + 1)
+    assert writer.depth == 0
+
+
+def test_scan_tree_threaded():
+    """Test that listing on several threads produces the same events and counts."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_tree(root)
+
+        for sub_folder in ["a", "b/c"]:
+            for i in range(5):
+                os.makedirs(os.path.join(root, sub_folder, f"extra_{i}", "inner"))
+
+        expected_writer = RecordingWriter()
+        expected_stats = diskspaced.ScanStats()
+        scan_tree(root, expected_writer, FolderLister(False, expected_stats))
+
+        for lookahead in [1, 3, 100]:
+            writer = RecordingWriter()
+            stats = diskspaced.ScanStats()
+
+            with ThreadedFolderLister(False, stats, 4, lookahead) as lister:
+                scan_tree(root, writer, lister)
+
+                assert not lister.futures
+
+            assert writer.events == expected_writer.events
+            assert repr(stats) == repr(expected_stats)
+
+
+def test_iter_scan():
+    """Test that the events from iterating over a scan can be written like a scan."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_tree(root)
+
+        expected_writer = RecordingWriter()
+        scan_tree(root, expected_writer, FolderLister(True, diskspaced.ScanStats()))
+
+        stats = diskspaced.ScanStats()
+        events = list(diskspaced.iter_scan(root, True, stats=stats))
+
+        assert events[0] == (diskspaced.FOLDER_START, "root", root) + events[0][3:]
+        assert events[-1] == (diskspaced.FOLDER_END,)
+        assert [event[1] for event in events if event[0] == diskspaced.FILES][0] == [
+            ("three.txt", 11) + os.lstat(os.path.join(root, "b", "c", "three.txt"))[7:10]
+        ]
+        assert stats.folders == 4
+
+        writer = RecordingWriter()
+        writer.write_events(events)
+        assert writer.events == expected_writer.events
+
+        # Folders left open when the events stop are ended
+        writer = RecordingWriter()
+        writer.write_events(events[:5])
+        assert writer.events == expected_writer.events[:5] + [("end",)] * 3
+        assert writer.depth == 0
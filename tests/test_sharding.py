@@ -0,0 +1,108 @@
+"""Test scanning on several processes."""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+from xml.etree import ElementTree
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import diskspaced
+from diskspaced import sharding
+
+# pylint: enable=wrong-import-position
+
+
+def make_wide_tree(root: str) -> None:
+    """Create a tree wide enough to be split into several shards."""
+
+    for i in range(20):
+        for j in range(3):
+            folder = os.path.join(root, f"folder_{i}", f"sub_folder_{j}")
+            os.makedirs(folder)
+
+            for k in range(2):
+                with open(os.path.join(folder, f"file_{k}.txt"), "wb") as f:
+                    f.write(b"x" * (i + j + k))
+
+        with open(os.path.join(root, f"folder_{i}", "file.txt"), "wb") as f:
+            f.write(b"x" * i)
+
+    settle_access_times(root)
+
+
+def settle_access_times(root: str) -> None:
+    """List every folder once, so that listing them in a scan doesn't move their accessed times.
+
+    With `relatime`, a folder's accessed time is only moved the first time it is read after it
+    was changed, which would otherwise happen during the first of the scans being compared.
+    """
+
+    for _ in os.walk(root):
+        pass
+
+
+def read_body(output_path: str, header_lines: int) -> bytes:
+    """Read the output, without the header which has the free space and time in it."""
+
+    with open(output_path, "rb") as f:
+        return b"\n".join(f.read().split(b"\n")[header_lines:])
+
+
+def test_sharded_scan_matches_single_process():
+    """Test that scanning on several processes gives the same output as a single process."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_wide_tree(root)
+
+        for output_format, header_lines in [
+            (diskspaced.OutputFormat.JSON, 1),
+            (diskspaced.OutputFormat.GRAND_PERSPECTIVE, 3),
+        ]:
+            expected_path = os.path.join(tempdir, "expected")
+            expected_stats = diskspaced.scan(root, expected_path, output_format, 0, True)
+
+            output_path = os.path.join(tempdir, "output")
+            stats = diskspaced.scan(root, output_path, output_format, 0, True, processes=2)
+
+            assert read_body(output_path, header_lines) == read_body(expected_path, header_lines)
+            assert stats.folders == expected_stats.folders == 81
+            assert stats.files == expected_stats.files == 140
+
+
+def test_shard_removed_after_planning(monkeypatch):
+    """Test that a shard whose folder goes before it is scanned is left out of valid output."""
+
+    plan_shards = sharding._plan_shards  # pylint: disable=protected-access
+
+    def plan_and_remove(*args, **kwargs):
+        listings, shards = plan_shards(*args, **kwargs)
+        shutil.rmtree(sorted(shards)[len(shards) // 2])
+        return listings, shards
+
+    monkeypatch.setattr(sharding, "_plan_shards", plan_and_remove)
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_wide_tree(root)
+
+        output_path = os.path.join(tempdir, "output.json")
+        stats = diskspaced.scan(
+            root, output_path, diskspaced.OutputFormat.JSON, 0, True, processes=2
+        )
+
+        with open(output_path, encoding="utf-8") as f:
+            names = [folder["name"] for folder in json.load(f)["contents"][0]["contents"]]
+
+        assert len(names) == 19
+        assert stats.folders == 77
+
+        output_path = os.path.join(tempdir, "output.xml")
+        diskspaced.scan(
+            root, output_path, diskspaced.OutputFormat.GRAND_PERSPECTIVE, 0, True, processes=2
+        )
+
+        assert len(ElementTree.parse(output_path).getroot().findall("ScanInfo/Folder/Folder")) == 18
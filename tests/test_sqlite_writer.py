@@ -0,0 +1,126 @@
+"""Test writing results to a SQLite database."""
+
+import os
+import sqlite3
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import diskspaced
+from diskspaced import sqlite_writer
+from tests.test_sharding import make_wide_tree
+
+# pylint: enable=wrong-import-position
+
+
+def read_entries(database_path: str) -> tuple[dict[str, int | None], dict[str, int]]:
+    """Put the tree back together from the rows, as the size of each path, or None for a folder,
+    along with the total size of each folder, checking that every row is in a folder before it."""
+
+    paths: dict[str, int | None] = {}
+    folder_paths: dict[int, str] = {}
+    next_id = 1
+
+    with sqlite3.connect(database_path) as connection:
+        rows = connection.execute(
+            "SELECT id, parent_id, name, size, is_dir FROM entries ORDER BY id"
+        ).fetchall()
+
+        for entry_id, parent_id, name, size, is_dir in rows:
+            assert entry_id == next_id
+            next_id += 1
+
+            if isinstance(name, bytes):
+                name = name.decode("utf-8", "surrogateescape")
+
+            path = name if parent_id is None else folder_paths[parent_id] + "/" + name
+
+            if is_dir:
+                folder_paths[entry_id] = path
+                paths[path] = None
+            else:
+                paths[path] = size
+
+        total_sizes = {
+            folder_paths[entry_id]: total_size
+            for entry_id, total_size in connection.execute("SELECT * FROM subtree_sizes")
+        }
+
+    return paths, total_sizes
+
+
+def test_entries_match_tree(monkeypatch: pytest.MonkeyPatch):
+    """Test that the rows describe the tree, in batches and transactions of any size and on
+    several processes."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_wide_tree(root)
+
+        block_size = os.statvfs(root).f_bsize
+        expected_paths: dict[str, int | None] = {}
+        expected_totals: dict[str, int] = {}
+
+        for folder_path, _, file_names in os.walk(root):
+            relative_path = os.path.relpath(folder_path, tempdir)
+            expected_paths[relative_path] = None
+            expected_totals[relative_path] = 0
+
+            for file_name in file_names:
+                size = max(block_size, os.lstat(os.path.join(folder_path, file_name)).st_size)
+                expected_paths[relative_path + "/" + file_name] = size
+
+                # Every folder the file is in counts it
+                parts = relative_path.split("/")
+
+                for depth in range(1, len(parts) + 1):
+                    expected_totals["/".join(parts[:depth])] += size
+
+        output_path = os.path.join(tempdir, "output.db")
+
+        for batch_size, processes in [(50000, 1), (7, 1), (7, 3)]:
+            monkeypatch.setattr(sqlite_writer, "BATCH_SIZE", batch_size)
+            monkeypatch.setattr(sqlite_writer, "TRANSACTION_SIZE", batch_size * 3)
+
+            diskspaced.scan(
+                root, output_path, diskspaced.OutputFormat.SQLITE, 0, True, processes=processes
+            )
+
+            assert read_entries(output_path) == (expected_paths, expected_totals)
+
+            # The database is a single file once it is finished
+            assert not os.path.exists(output_path + "-wal")
+
+            with sqlite3.connect(output_path) as connection:
+                assert connection.execute("SELECT root_path, block_size FROM scan").fetchall() == [
+                    (root, block_size)
+                ]
+
+
+def test_names_which_are_not_utf8():
+    """Test that names which aren't valid UTF-8 are kept as the bytes they were."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        output_path = os.path.join(tempdir, "output.db")
+        name = b"caf\xe9".decode("utf-8", "surrogateescape")
+
+        writer = diskspaced.SQLiteWriter(output_path, 0)
+        writer.write_start(tempdir, 0, 0, 0, 0)
+        writer.write_folder_start("root", 1, 2, 3)
+        writer.write_files([("before", 1, 1, 2, 3), (name, 2, 1, 2, 3), ("after", 4, 1, 2, 3)])
+        writer.write_folder_end()
+        writer.write_end()
+
+        assert read_entries(output_path) == (
+            {"root": None, "root/before": 1, "root/" + name: 2, "root/after": 4},
+            {"root": 7},
+        )
+
+    with pytest.raises(ValueError):
+        diskspaced.SQLiteWriter(diskspaced.STDOUT_PATH, 0)
+
+    with pytest.raises(ValueError):
+        diskspaced.SQLiteWriter("output.db.gz", 0, compression=diskspaced.Compression.GZIP)
@@ -0,0 +1,77 @@
+"""Test reporting the largest files and folders."""
+
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import diskspaced
+from tests.test_sharding import make_wide_tree
+
+# pylint: enable=wrong-import-position
+
+
+def scan_top(root: str, output_path: str, top_count: int, processes: int = 1) -> dict:
+    """Scan the folder and read the report."""
+
+    diskspaced.scan(
+        root,
+        output_path,
+        diskspaced.OutputFormat.TOP,
+        0,
+        True,
+        processes=processes,
+        top_count=top_count,
+    )
+
+    with open(output_path, "rb") as f:
+        return json.load(f)
+
+
+def test_top_matches_walk():
+    """Test that the report has the largest files and folders, largest first."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_wide_tree(root)
+
+        file_sizes = []
+        folder_sizes = []
+
+        for folder_path, _, file_names in os.walk(root):
+            for file_name in file_names:
+                file_path = os.path.join(folder_path, file_name)
+                file_sizes.append({"path": file_path, "size": os.lstat(file_path).st_size})
+
+            total_size = 0
+
+            for sub_folder_path, _, sub_file_names in os.walk(folder_path):
+                for file_name in sub_file_names:
+                    total_size += os.lstat(os.path.join(sub_folder_path, file_name)).st_size
+
+            folder_sizes.append({"path": folder_path, "size": total_size})
+
+        def largest(entries: list[dict]) -> list[dict]:
+            return sorted(entries, key=lambda entry: (entry["size"], entry["path"]), reverse=True)[
+                :5
+            ]
+
+        report = scan_top(root, os.path.join(tempdir, "top.json"), 5)
+
+        assert report["root_path"] == root
+        assert report["total_size"] == folder_sizes[0]["size"]
+        assert report["file_count"] == len(file_sizes)
+        assert report["folder_count"] == len(folder_sizes)
+        assert report["files"] == largest(file_sizes)
+        assert report["folders"] == largest(folder_sizes)
+
+        # Shards are merged into the same report, apart from the free space which moves about
+        sharded_report = scan_top(root, os.path.join(tempdir, "sharded.json"), 5, processes=2)
+
+        for key in ["free_space", "used_space"]:
+            del report[key]
+            del sharded_report[key]
+
+        assert sharded_report == report
@@ -0,0 +1,109 @@
+"""Test building a tree in memory from a scan."""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import diskspaced
+from diskspaced import tree
+from tests.test_scanner import make_tree
+
+# pylint: enable=wrong-import-position
+
+
+def test_build_tree():
+    """Test that the tree has every entry, with the total size of each folder."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_tree(root)
+
+        scan_tree = diskspaced.build_tree(root, True)
+
+        assert len(scan_tree) == 8
+        assert scan_tree.path(0) == root
+        assert [scan_tree.name(child) for child in scan_tree.children(0)] == [
+            "a",
+            "b",
+            "y.txt",
+            "z.txt",
+        ]
+
+        totals = {
+            os.path.relpath(scan_tree.path(index), root): scan_tree.total_sizes[index]
+            for index in range(len(scan_tree))
+            if scan_tree.is_folder[index]
+        }
+        assert totals == {".": 26, "a": 0, "b": 18, os.path.join("b", "c"): 11}
+
+        three = scan_tree.find(os.path.join(root, "b", "c", "three.txt"))
+        assert three is not None
+        assert scan_tree.sizes[three] == 11
+        assert scan_tree.path(three) == os.path.join(root, "b", "c", "three.txt")
+
+        assert scan_tree.find(os.path.join("b", "c")) == scan_tree.parents[three]
+        assert scan_tree.find(root) == 0
+        assert scan_tree.find(os.path.join("b", "missing")) is None
+        assert scan_tree.find(os.path.join("z.txt", "inside")) is None
+        assert scan_tree.find(os.path.join(tempdir, "elsewhere")) is None
+
+
+def test_find_in_wide_folder(monkeypatch):
+    """Test finding entries in folders which are big enough to be indexed by name."""
+
+    monkeypatch.setattr(tree, "INDEXED_CHILDREN", 4)
+    monkeypatch.setattr(tree, "MAX_INDEXED_FOLDERS", 1)
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        for folder_name in ["one", "two"]:
+            os.mkdir(os.path.join(tempdir, folder_name))
+
+            for index in range(10):
+                with open(os.path.join(tempdir, folder_name, f"{index}.txt"), "wb") as f:
+                    f.write(b"x" * index)
+
+        scan_tree = diskspaced.build_tree(tempdir)
+
+        for folder_name in ["one", "two", "one"]:
+            for index in range(10):
+                found = scan_tree.find(os.path.join(folder_name, f"{index}.txt"))
+                assert found is not None
+                assert scan_tree.sizes[found] == index
+
+            assert scan_tree.find(os.path.join(folder_name, "10.txt")) is None
+            assert len(scan_tree.child_indexes) == 1
+
+
+def test_find_names_starting_with_dots():
+    """Test that names starting with two dots are found, but paths outside the tree aren't."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        os.makedirs(os.path.join(root, "..cache"))
+
+        with open(os.path.join(root, "..."), "wb") as f:
+            f.write(b"x")
+
+        scan_tree = diskspaced.build_tree(root, True)
+
+        assert scan_tree.find(os.path.join(root, "..cache")) is not None
+        assert scan_tree.find("...") is not None
+        assert scan_tree.find(tempdir) is None
+        assert scan_tree.find(os.path.join("..", "root", "...")) is None
+
+
+def test_write_file():
+    """Test that files written one at a time are added to the tree."""
+
+    writer = tree.TreeWriter()
+    writer.write_start("/data", 0, 0, 0, 0)
+    writer.write_folder_start("data", 1, 2, 3)
+    writer.write_file("f", 10, 1, 2, 3)
+    writer.write_folder_end()
+    writer.write_end()
+
+    assert len(writer.tree) == 2
+    assert writer.tree.name(1) == "f"
+    assert writer.tree.total_sizes[0] == 10
@@ -0,0 +1,179 @@
+"""Test keeping a tree current by watching it."""
+
+import os
+import platform
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import diskspaced
+from diskspaced import watcher as watcher_module
+from diskspaced.scanner import FolderLister, scan_tree
+from tests.test_scanner import RecordingWriter, make_tree
+
+# pylint: enable=wrong-import-position
+
+pytestmark = pytest.mark.skipif(platform.system() != "Linux", reason="inotify is Linux only")
+
+
+def settle(watcher: diskspaced.TreeWatcher) -> None:
+    """Apply every event which has arrived."""
+
+    for _ in range(5):
+        watcher.process_events(0.05)
+
+    watcher.apply_pending()
+
+
+def assert_tree_matches_scan(watcher: diskspaced.TreeWatcher, root: str) -> None:
+    """Check that the watched tree is what a scan of the folder would give."""
+
+    settle(watcher)
+
+    expected = RecordingWriter()
+    scan_tree(root, expected, FolderLister(True, diskspaced.ScanStats()))
+
+    writer = RecordingWriter()
+    watcher.write_tree(writer)
+
+    assert writer.events == expected.events
+    assert writer.depth == 0
+
+
+def test_watch_follows_changes():
+    """Test that changes to the folder are reflected in the tree."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_tree(root)
+
+        with diskspaced.TreeWatcher(root, True, coalesce_delay=0) as watcher:
+            watcher.start()
+            assert_tree_matches_scan(watcher, root)
+
+            # New, changed, renamed and removed files
+            with open(os.path.join(root, "b", "c", "new.txt"), "wb") as f:
+                f.write(b"x" * 17)
+
+            with open(os.path.join(root, "z.txt"), "ab") as f:
+                f.write(b"more")
+
+            os.rename(os.path.join(root, "y.txt"), os.path.join(root, "a", "y.txt"))
+            os.remove(os.path.join(root, "b", "two.txt"))
+            assert_tree_matches_scan(watcher, root)
+
+            # A new tree of folders, which is watched as well
+            os.makedirs(os.path.join(root, "new", "deeper"))
+
+            with open(os.path.join(root, "new", "deeper", "file.txt"), "wb") as f:
+                f.write(b"x")
+
+            assert_tree_matches_scan(watcher, root)
+
+            with open(os.path.join(root, "new", "deeper", "later.txt"), "wb") as f:
+                f.write(b"xx")
+
+            assert_tree_matches_scan(watcher, root)
+
+            # Moved and removed folders
+            os.rename(os.path.join(root, "new"), os.path.join(root, "a", "moved"))
+            assert_tree_matches_scan(watcher, root)
+
+            with open(os.path.join(root, "a", "moved", "deeper", "after_move.txt"), "wb") as f:
+                f.write(b"xxx")
+
+            shutil.rmtree(os.path.join(root, "b"))
+            assert_tree_matches_scan(watcher, root)
+
+            # A file replaced with a folder
+            os.remove(os.path.join(root, "z.txt"))
+            os.mkdir(os.path.join(root, "z.txt"))
+            assert_tree_matches_scan(watcher, root)
+
+            assert len(watcher.folders_by_watch) == 5
+
+
+def test_max_watches():
+    """Test that no more than the most watches are used."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_tree(root)
+
+        with diskspaced.TreeWatcher(root, True, max_watches=2, coalesce_delay=0) as watcher:
+            watcher.start()
+
+            assert len(watcher.folders_by_watch) == 2
+            assert watcher.unwatched_folders == 2
+            assert_tree_matches_scan(watcher, root)
+
+
+def test_write_snapshot():
+    """Test that a snapshot of the watched tree is the same as a scan."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_tree(root)
+
+        expected_path = os.path.join(tempdir, "expected.bin")
+        diskspaced.scan(root, expected_path, diskspaced.OutputFormat.BINARY, 0, True)
+
+        with diskspaced.TreeWatcher(root, True) as watcher:
+            watcher.start()
+
+            output_path = os.path.join(tempdir, "output.bin")
+            diskspaced.write_snapshot(watcher, output_path, diskspaced.OutputFormat.BINARY)
+
+        assert sorted(os.listdir(tempdir)) == ["expected.bin", "output.bin", "root"]
+
+        with diskspaced.BinaryReader(output_path) as reader:
+            entries = [entry[:4] + entry[5:] for entry in reader.entries()]
+
+        with diskspaced.BinaryReader(expected_path) as reader:
+            assert entries == [entry[:4] + entry[5:] for entry in reader.entries()]
+
+
+def test_failed_snapshot(monkeypatch):
+    """Test that a snapshot which fails part way leaves the output as it was, and nothing else."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = os.path.join(tempdir, "root")
+        make_tree(root)
+
+        output_path = os.path.join(tempdir, "output.json")
+
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write("previous")
+
+        def fail(*_):
+            raise RuntimeError("Failed part way")
+
+        with diskspaced.TreeWatcher(root, True) as watcher:
+            watcher.start()
+            monkeypatch.setattr(diskspaced.JSONWriter, "write_files", fail)
+
+            with pytest.raises(RuntimeError, match="part way"):
+                diskspaced.write_snapshot(watcher, output_path, diskspaced.OutputFormat.JSON)
+
+        assert sorted(os.listdir(tempdir)) == ["output.json", "root"]
+
+        with open(output_path, encoding="utf-8") as f:
+            assert f.read() == "previous"
+
+
+def test_tree_builder_write_file():
+    """Test that files written one at a time are added to the watched tree."""
+
+    # pylint: disable=protected-access
+    builder = watcher_module._TreeBuilder(None)
+    # pylint: enable=protected-access
+    builder.write_folder_start("data", 1, 2, 3)
+    builder.write_file("f", 10, 1, 2, 3)
+    builder.write_folder_end()
+
+    assert builder.root is not None
+    assert builder.root.files == {"f": (10, 1, 2, 3)}
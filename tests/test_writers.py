@@ -0,0 +1,134 @@
+"""Test the output writers."""
+
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# pylint: disable=wrong-import-position
+import diskspaced
+
+# pylint: enable=wrong-import-position
+
+FILES = [
+    ("one.txt", 10, 1724420371, 1724420372, 1724420373),
+    ('quote " and \\ back & <angle>', 8192, 1724420381, 1724420382, 1724420383),
+    ("ünïcödé.txt", 0, 1724420391, 1724420392, 1724420393),
+]
+
+
+def write_output(
+    writer_class: type[diskspaced.Writer], output_path: str, batched: bool, pretty: bool = False
+) -> bytes:
+    """Write a small tree with the writer, returning what it wrote."""
+
+    writer = writer_class(output_path, 0, pretty)
+    writer.write_start("/root", 100, 60, 40, 4096)
+    writer.write_folder_start("root", 1, 2, 3)
+    writer.write_folder_start("sub", 4, 5, 6)
+
+    if batched:
+        writer.write_files(FILES)
+    else:
+        for file_entry in FILES:
+            writer.write_file(*file_entry)
+
+    writer.write_folder_end()
+    writer.write_folder_start("empty", 7, 8, 9)
+    writer.write_folder_end()
+    writer.write_files(FILES[:1])
+    writer.write_folder_end()
+    writer.write_end()
+
+    with open(output_path, "rb") as f:
+        return f.read()
+
+
+def test_write_files_matches_write_file():
+    """Test that writing a batch of files gives the same output as writing them one by one."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        output_path = os.path.join(tempdir, "output")
+
+        for writer_class in [diskspaced.JSONWriter, diskspaced.GrandPerspectiveWriter]:
+            for pretty in [False, True]:
+                batched = write_output(writer_class, output_path, True, pretty)
+                single = write_output(writer_class, output_path, False, pretty)
+
+                assert batched == single
+
+
+def test_json_names_are_escaped():
+    """Test that names which need escaping still give valid JSON."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        output = write_output(diskspaced.JSONWriter, os.path.join(tempdir, "output"), True)
+
+    result = json.loads(output)
+    files = result["contents"][0]["contents"][0]["contents"]
+
+    assert [f["name"] for f in files] == [f[0] for f in FILES]
+    assert [f["size"] for f in files] == [4096, 8192, 4096]
+
+
+def test_count_files_logs_every_n_files(caplog):
+    """Test that batches log progress at the same points as single files do."""
+
+    writer = diskspaced.Writer("", 2)
+    writer.current_folder_path = "/root"
+
+    with caplog.at_level("INFO"):
+        writer.count_files([("a", 0, 0, 0, 0)])
+        writer.count_files([("b", 0, 0, 0, 0), ("c", 0, 0, 0, 0), ("d", 0, 0, 0, 0)])
+        writer.count_files([("e", 0, 0, 0, 0)])
+
+    assert [record.getMessage() for record in caplog.records] == [
+        "Processing /root/b",
+        "Processing /root/d",
+    ]
+    assert writer.file_count == 5
+
+
+def test_json_pretty_print():
+    """Test that pretty printed JSON is laid out the same way as json.dumps lays it out."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        output_path = os.path.join(tempdir, "output")
+        compact = write_output(diskspaced.JSONWriter, output_path, True)
+        pretty = write_output(diskspaced.JSONWriter, output_path, True, True)
+
+    assert json.loads(compact) == json.loads(pretty)
+    assert pretty.decode("utf-8") == json.dumps(json.loads(compact), indent=4, ensure_ascii=False)
+
+
+def test_grand_perspective_pretty_print():
+    """Test that pretty printed GrandPerspective output is indented by depth."""
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        output = write_output(
+            diskspaced.GrandPerspectiveWriter, os.path.join(tempdir, "output"), True, True
+        )
+
+    lines = output.decode("utf-8").split("\n")
+    tags = [line.split(" name=")[0] for line in lines[3:]]
+
+    assert lines[0] == '<?xml version="1.0" encoding="UTF-8"?>'
+    assert lines[1] == '<GrandPerspectiveScanDump appVersion="4" formatVersion="7">'
+    assert lines[2].startswith('    <ScanInfo volumePath="/root/" volumeSize="100" freeSpace="40"')
+    assert tags == [
+        "        <Folder",
+        "            <Folder",
+        "                <File",
+        "                <File",
+        "                <File",
+        "            </Folder>",
+        "            <Folder",
+        "            <File",
+        "        </Folder>",
+        "    </ScanInfo>",
+        "</GrandPerspectiveScanDump>",
+        "",
+    ]
+    assert lines[9].endswith("></Folder>")
+    assert lines[10].endswith("></File>")